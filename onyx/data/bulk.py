@@ -0,0 +1,239 @@
+from __future__ import annotations
+import logging
+from typing import Any, Iterator
+from django.conf import settings
+from rest_framework import exceptions, status
+from accounts.models import Site
+from utils.fieldserializers import ChoiceField
+from utils.validators import OnyxUniqueTogetherValidator
+from .models import Project, Choice, Anonymiser
+from .serializers import BaseRecordSerializer, ProjectRecordSerializer, SerializerNode
+from .validators import get_choice_constraint_graph
+
+logger = logging.getLogger(__name__)
+
+
+def get_choice_fields(serializer_class: type[BaseRecordSerializer]) -> set[str]:
+    """
+    Get the choice fields of a `serializer_class`, and of all serializers nested within it.
+
+    Args:
+        serializer_class: The serializer class.
+
+    Returns:
+        The set of choice fields.
+    """
+
+    choice_fields = {
+        field.field
+        for field in serializer_class().fields.values()
+        if isinstance(field, ChoiceField)
+    }
+
+    for relation in serializer_class.OnyxMeta.relations.values():
+        choice_fields |= get_choice_fields(relation)
+
+    return choice_fields
+
+
+def build_bulk_context(
+    project: Project,
+    serializer_class: type[ProjectRecordSerializer],
+    request,
+) -> dict[str, Any]:
+    """
+    Build a serializer context for bulk validation, with its caches populated up front.
+
+    Choices, sites, choice constraints and the user's site are retrieved once, so that nodes are validated
+    against the context without making any queries of their own.
+
+    Args:
+        project: The project of the data.
+        serializer_class: The serializer class of the project.
+        request: The request (or any object with a `user`) that the data is validated for.
+
+    Returns:
+        The serializer context.
+    """
+
+    choices = {field: [] for field in get_choice_fields(serializer_class)}
+    for field, choice in Choice.objects.filter(
+        project=project,
+        field__in=choices.keys(),
+        is_active=True,
+    ).values_list("field", "choice"):
+        choices[field].append(choice)
+
+    # The compiled choice constraint graph is cached within the process
+    get_choice_constraint_graph(project.code)
+
+    # The site of the user is the default site of each item, so is retrieved (and cached on the user) here
+    request.user.site
+
+    return {
+        "project": project,
+        "request": request,
+        "bulk": True,
+        "choices": choices,
+        "sites": {site.code: site for site in Site.objects.all()},
+    }
+
+
+def validate_chunk(
+    serializer_class: type[ProjectRecordSerializer],
+    chunk: list[tuple[int, Any]],
+    context: dict[str, Any],
+) -> list[tuple[int, SerializerNode | None, dict]]:
+    """
+    Validate a `chunk` of `(index, data)` items against a shared `context`.
+
+    Args:
+        serializer_class: The serializer class of the project.
+        chunk: The list of `(index, data)` items.
+        context: The serializer context, shared by all chunks.
+
+    Returns:
+        The list of `(index, node, errors)` results. The node is `None` if the item is invalid.
+    """
+
+    results = []
+
+    for i, data in chunk:
+        try:
+            node = SerializerNode(serializer_class, data=data, context=context)
+        except exceptions.ValidationError as e:
+            results.append((i, None, e.args[0]))
+            continue
+
+        if node.is_valid():
+            results.append((i, node, {}))
+        else:
+            results.append((i, None, node.errors))
+
+    return results
+
+
+def get_unique_data(
+    project: Project,
+    nodes: dict[int, SerializerNode],
+) -> dict[int, dict[str, Any]]:
+    """
+    Get the validated data of `nodes` with their anonymised fields resolved, for checking uniqueness.
+
+    No identifiers are created. Values that do not have an identifier yet are replaced with a placeholder
+    that is derived from their hash, so cannot match any existing value but can match each other.
+
+    Args:
+        project: The project of the nodes.
+        nodes: Dictionary mapping indexes to valid nodes.
+
+    Returns:
+        Dictionary mapping indexes to validated data.
+    """
+
+    batch = {i: dict(node.serializer.validated_data) for i, node in nodes.items()}  # type: ignore
+    targets = []
+    entries = []
+
+    for i, node in nodes.items():
+        for field, entry in getattr(node.serializer, "anonymiser_entries", {}).items():
+            targets.append((i, field))
+            entries.append(entry)
+
+    if entries:
+        identifiers = Anonymiser.lookup(project=project, entries=entries)
+
+        for (i, field), entry, identifier in zip(targets, entries, identifiers):
+            batch[i][field] = identifier or f"?{entry[1]}:{entry[2]}"
+
+    return batch
+
+
+def validate_bulk(
+    project: Project,
+    serializer_class: type[ProjectRecordSerializer],
+    data: list,
+    request,
+    chunk_size: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Validate a list of items for creation, yielding a result for each item in order.
+
+    The items are validated in chunks of `chunk_size`, so that results are streamed as each chunk completes.
+    The uniqueness of each chunk is checked against the existing instances and all earlier chunks.
+
+    Args:
+        project: The project of the data.
+        serializer_class: The serializer class of the project.
+        data: The list of items.
+        request: The request (or any object with a `user`) that the data is validated for.
+        chunk_size: The number of items in each chunk. Defaults to the `BULK_VALIDATION` setting.
+
+    Returns:
+        An iterator of results, each with the `index`, `status` and `code` of an item, and any `messages`.
+        Items in a chunk that could not be validated are given an `error` status, rather than ending the iterator.
+    """
+
+    config = getattr(settings, "BULK_VALIDATION", {})
+    chunk_size = chunk_size or config.get("CHUNK_SIZE", 500)
+
+    context = build_bulk_context(project, serializer_class, request)
+    items = list(enumerate(data))
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    # Unique values seen in earlier chunks, for each unique together validator
+    validators = [
+        (validator, set())
+        for validator in getattr(serializer_class.Meta, "validators", [])
+        if isinstance(validator, OnyxUniqueTogetherValidator)
+    ]
+
+    for chunk in chunks:
+        # The results are streamed after the response has started, so a chunk that fails to validate
+        # cannot fail the response. Instead, each of its items is given an error result
+        try:
+            chunk_results = validate_chunk(serializer_class, chunk, context)
+            nodes = {i: node for i, node, _ in chunk_results if node}
+            errors = {i: errs for i, node, errs in chunk_results if not node}
+
+            # Check uniqueness across the chunk, against earlier chunks, and against existing instances
+            if nodes and validators:
+                batch = get_unique_data(project, nodes)
+
+                for validator, seen in validators:
+                    for i, error in validator.validate_batch(batch, seen=seen).items():
+                        errors.setdefault(i, {}).setdefault(
+                            "non_field_errors", []
+                        ).append(error)
+        except Exception:
+            logger.exception(
+                "Failed to validate chunk of %d items, starting at index %d.",
+                len(chunk),
+                chunk[0][0],
+            )
+
+            for i, _ in chunk:
+                yield {
+                    "index": i,
+                    "status": "error",
+                    "code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "messages": {
+                        "non_field_errors": ["This record could not be validated."]
+                    },
+                }
+            continue
+
+        for i, _, _ in chunk_results:
+            if i in errors:
+                yield {
+                    "index": i,
+                    "status": "fail",
+                    "code": status.HTTP_400_BAD_REQUEST,
+                    "messages": errors[i],
+                }
+            else:
+                yield {
+                    "index": i,
+                    "status": "success",
+                    "code": status.HTTP_200_OK,
+                }
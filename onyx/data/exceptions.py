@@ -1,5 +1,5 @@
 from django.utils.translation import gettext_lazy as _
-from rest_framework import exceptions
+from rest_framework import exceptions, status
 
 
 class ClimbIDNotFound(exceptions.NotFound):
@@ -8,3 +8,29 @@ class ClimbIDNotFound(exceptions.NotFound):
 
 class IdentifierNotFound(exceptions.NotFound):
     default_detail = _("Identifier not found.")
+
+
+class PreconditionFailed(exceptions.APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _("The record has been modified since it was retrieved.")
+    default_code = "precondition_failed"
+
+
+class IdempotencyKeyInUse(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("A request with this idempotency key is already in progress.")
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _("This idempotency key was used for a different request.")
+    default_code = "idempotency_key_reused"
+
+
+class UpsertConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _(
+        "A record with the same identifiers was created by another request. Please retry."
+    )
+    default_code = "upsert_conflict"
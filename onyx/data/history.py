@@ -0,0 +1,80 @@
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+from simple_history.utils import get_history_manager_for_model
+
+# Buffer of (model, history_type, instance) tuples, for saves made within a deferred_history block
+# If no block is active, the buffer is None
+_history_buffer: ContextVar[list | None] = ContextVar("history_buffer", default=None)
+
+
+class DeferredHistoricalRecords(HistoricalRecords):
+    """
+    Historical records that can be deferred, and written together with bulk inserts.
+
+    Outside of a `deferred_history` block, historical records are created on each save as usual.
+    """
+
+    def create_historical_record(self, instance, history_type, using=None):
+        buffer = _history_buffer.get()
+
+        # Deletions are not deferred, as bulk history creation only supports creates and updates
+        if buffer is None or history_type not in {"+", "~"}:
+            return super().create_historical_record(instance, history_type, using=using)
+
+        # Take a copy of the instance as it is now, so that later saves in the block do not change it
+        # The date and user of the change are recorded on the copy, as they would be on save
+        snapshot = copy.copy(instance)
+        snapshot._history_date = getattr(instance, "_history_date", timezone.now())
+        snapshot._history_user = self.get_history_user(instance)
+        buffer.append((type(instance), history_type, snapshot))
+
+
+@contextmanager
+def deferred_history(enabled: bool | None = None, batch_size: int | None = None):
+    """
+    Defer the historical records of any saves made within the block, and bulk insert them when the block exits.
+
+    This should be used within a `transaction.atomic` block, so that the historical records
+    are inserted in the same transaction as the changes they record.
+    If an exception is raised within the block, the deferred historical records are discarded.
+
+    Args:
+        enabled: Whether to defer historical records. Defaults to the `DEFERRED_HISTORY` setting.
+        batch_size: The number of historical records to insert in each query. Defaults to the `DEFERRED_HISTORY` setting.
+    """
+
+    config = getattr(settings, "DEFERRED_HISTORY", {})
+
+    if enabled is None:
+        enabled = config.get("ENABLED", False)
+
+    if batch_size is None:
+        batch_size = config.get("BATCH_SIZE", 500)
+
+    # If not enabled, or if an outer block is already deferring, there is nothing to do
+    if not enabled or _history_buffer.get() is not None:
+        yield
+        return
+
+    buffer = []
+    token = _history_buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _history_buffer.reset(token)
+
+    # Group the deferred historical records by model and type, preserving their order
+    groups = {}
+    for model, history_type, instance in buffer:
+        groups.setdefault((model, history_type), []).append(instance)
+
+    for (model, history_type), instances in groups.items():
+        get_history_manager_for_model(model).bulk_history_create(
+            instances,
+            batch_size=batch_size,
+            update=history_type == "~",
+        )
@@ -0,0 +1,144 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from .exceptions import IdempotencyKeyInUse, IdempotencyKeyReused
+from .models import IdempotencyKey
+
+
+def get_request_fingerprint(request: Request) -> str:
+    """
+    Get a fingerprint of the query parameters and body of a `request`.
+
+    This is used to detect an idempotency key that is reused for a different request.
+    """
+
+    hasher = hashlib.sha256()
+    hasher.update(request.get_full_path().encode("utf-8"))
+    hasher.update(json.dumps(request.data, sort_keys=True, default=str).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def claim_idempotency_key(
+    request: Request,
+    key: str,
+    fingerprint: str,
+    timeout: int,
+) -> tuple[IdempotencyKey, bool]:
+    """
+    Claim an idempotency `key` for a `request`, scoped to its user, method and path.
+
+    The claim is committed immediately, so that it applies to requests handled by any worker.
+    It expires after `timeout` seconds, in case the request never completes.
+
+    Returns:
+        The idempotency key, and whether it was claimed by this request.
+    """
+
+    scope = {
+        "user": request.user,
+        "method": request.method,
+        "path": request.path,
+        "key": key,
+    }
+
+    # Expired keys are released, so they can be claimed again
+    IdempotencyKey.objects.filter(**scope, expires__lte=timezone.now()).delete()
+
+    try:
+        with transaction.atomic():
+            claimed = IdempotencyKey.objects.create(
+                **scope,
+                fingerprint=fingerprint,
+                expires=timezone.now() + timedelta(seconds=timeout),
+            )
+        return claimed, True
+    except IntegrityError:
+        existing = IdempotencyKey.objects.filter(**scope).first()
+
+        # The existing key may have been released since the claim was attempted
+        if existing is None:
+            return claim_idempotency_key(request, key, fingerprint, timeout)
+
+        return existing, False
+
+
+def idempotent(func):
+    """
+    Decorator that makes a view method idempotent for requests with an `Idempotency-Key` header.
+
+    The response of the first successful request with a given key is stored for the `IDEMPOTENCY` TTL.
+    Repeats of the request with the same key replay the stored response, without running the view method.
+    A repeat that is received while the first request is still in progress is rejected, as is a request
+    that reuses a key with a different body.
+
+    Keys are stored in the database, so they apply across all workers.
+    Requests without an `Idempotency-Key` header are not affected.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, request: Request, *args, **kwargs) -> Response:
+        key = request.headers.get("Idempotency-Key")
+
+        if key is None:
+            return func(self, request, *args, **kwargs)
+
+        if not key or len(key) > 255:
+            raise exceptions.ValidationError(
+                {"Idempotency-Key": ["Must be between 1 and 255 characters."]}
+            )
+
+        config = getattr(settings, "IDEMPOTENCY", {})
+        fingerprint = get_request_fingerprint(request)
+
+        # Mark the key as in progress, unless it has already been used
+        # The in progress marker expires after LOCK_TIMEOUT, in case the request never completes
+        idempotency_key, claimed = claim_idempotency_key(
+            request, key, fingerprint, config.get("LOCK_TIMEOUT", 60)
+        )
+
+        if not claimed:
+            if idempotency_key.fingerprint != fingerprint:
+                raise IdempotencyKeyReused
+
+            if idempotency_key.response is None:
+                raise IdempotencyKeyInUse
+
+            response = Response(
+                idempotency_key.response["data"],
+                status=idempotency_key.response["status"],
+                headers=idempotency_key.response["headers"],
+            )
+            response["Idempotent-Replayed"] = "true"
+            return response
+
+        stored = IdempotencyKey.objects.filter(pk=idempotency_key.pk)
+
+        try:
+            response = func(self, request, *args, **kwargs)
+        except BaseException:
+            stored.delete()
+            raise
+
+        # Only successful responses are stored, so that failed requests can be retried
+        if status.is_success(response.status_code):
+            stored.update(
+                response={
+                    "data": response.data,
+                    "status": response.status_code,
+                    "headers": dict(response.items()),
+                },
+                expires=timezone.now() + timedelta(seconds=config.get("TTL", 86400)),
+            )
+        else:
+            stored.delete()
+
+        return response
+
+    return wrapper
@@ -0,0 +1,243 @@
+from datetime import timedelta
+from django.core.management import base
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import get_history_manager_for_model
+from ...models import Project, BaseRecord
+
+
+def get_record_models(model: type[BaseRecord]) -> list[type[BaseRecord]]:
+    """
+    Get a record `model`, and the models of all records nested within it.
+
+    Args:
+        model: The record model.
+
+    Returns:
+        The list of record models.
+    """
+
+    record_models = [model]
+
+    for relation in model._meta.related_objects:
+        related_model = relation.related_model
+
+        if (
+            isinstance(related_model, type)
+            and issubclass(related_model, BaseRecord)
+            and related_model not in record_models
+        ):
+            record_models.extend(get_record_models(related_model))
+
+    return record_models
+
+
+def get_pruned_versions(
+    versions: list[dict],
+    compared_fields: list[str],
+    keep: int | None = None,
+    collapse: bool = False,
+    cutoff=None,
+) -> list[int]:
+    """
+    Determine which versions of a single object are pruned.
+
+    The latest version of an object is never pruned.
+
+    Args:
+        versions: The versions of the object, ordered from oldest to latest.
+        compared_fields: The fields that are compared when collapsing identical versions.
+        keep: If provided, prune all but the latest `keep` versions.
+        collapse: If `True`, prune updates that are identical to the version before them.
+        cutoff: If provided, prune versions with a history date before the `cutoff`.
+
+    Returns:
+        The history IDs of the pruned versions.
+    """
+
+    pruned = set()
+    latest = versions[-1]["history_id"]
+
+    if keep is not None:
+        pruned.update(version["history_id"] for version in versions[:-keep])
+
+    if collapse:
+        for previous, version in zip(versions, versions[1:]):
+            if version["history_type"] == "~" and all(
+                version[field] == previous[field] for field in compared_fields
+            ):
+                pruned.add(version["history_id"])
+
+    if cutoff is not None:
+        pruned.update(
+            version["history_id"]
+            for version in versions
+            if version["history_date"] < cutoff
+        )
+
+    pruned.discard(latest)
+    return sorted(pruned)
+
+
+class Command(base.BaseCommand):
+    help = "Compact and apply retention to the historical records of a project."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project")
+        parser.add_argument(
+            "--keep",
+            type=int,
+            help="Keep only the latest KEEP versions of each record.",
+        )
+        parser.add_argument(
+            "--collapse",
+            action="store_true",
+            help="Remove updates that are identical to the version before them.",
+        )
+        parser.add_argument(
+            "--retention",
+            type=int,
+            help="Remove versions older than RETENTION days. The latest version of each record is always kept.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of records whose versions are compacted in each transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the number of versions that would be removed, without removing them.",
+        )
+        parser.add_argument("--quiet", action="store_true")
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+
+        if options["keep"] is not None and options["keep"] < 1:
+            raise base.CommandError("--keep must be at least 1.")
+
+        if (
+            options["keep"] is None
+            and not options["collapse"]
+            and options["retention"] is None
+        ):
+            raise base.CommandError(
+                "At least one of --keep, --collapse or --retention is required."
+            )
+
+        try:
+            project = Project.objects.get(code=options["project"])
+        except Project.DoesNotExist:
+            raise base.CommandError(
+                f"Project with code '{options['project']}' does not exist."
+            )
+
+        model = project.content_type.model_class()
+        assert model is not None and issubclass(model, BaseRecord)
+
+        if options["retention"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["retention"])
+        else:
+            cutoff = None
+
+        self.print("Project:", project.code)
+
+        for record_model in get_record_models(model):
+            pruned = self.compact(
+                record_model,
+                keep=options["keep"],
+                collapse=options["collapse"],
+                cutoff=cutoff,
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+
+            if options["dry_run"]:
+                self.print(f"• {record_model.__name__}: {pruned} versions to remove")
+            else:
+                self.print(f"• {record_model.__name__}: {pruned} versions removed")
+
+    def compact(
+        self,
+        model: type[BaseRecord],
+        keep: int | None,
+        collapse: bool,
+        cutoff,
+        batch_size: int,
+        dry_run: bool,
+    ) -> int:
+        """
+        Compact the historical records of a `model`, in batches of `batch_size` records.
+
+        Each batch is compacted in its own transaction, so that the command can run on a live system.
+
+        Returns:
+            The number of versions removed (or that would be removed, if `dry_run = True`).
+        """
+
+        history_model = get_history_manager_for_model(model).model
+        object_id = model._meta.pk.attname
+
+        # Fields that are set automatically on save (e.g. last_modified) differ between every version
+        # So these are excluded when comparing versions
+        compared_fields = [
+            field.attname
+            for field in history_model.tracked_fields
+            if not getattr(field, "auto_now", False) and field.attname != object_id
+        ]
+        values = ["history_id", "history_date", "history_type", object_id]
+        values += [field for field in compared_fields if field not in values]
+
+        object_ids = (
+            history_model.objects.order_by(object_id)
+            .values_list(object_id, flat=True)
+            .distinct()
+        )
+
+        total = 0
+        last_id = None
+        while True:
+            # Retrieve the next batch of records, using keyset pagination over their IDs
+            batch = object_ids
+            if last_id is not None:
+                batch = batch.filter(**{f"{object_id}__gt": last_id})
+            batch = list(batch[:batch_size])
+
+            if not batch:
+                break
+
+            last_id = batch[-1]
+
+            with transaction.atomic():
+                versions = {}
+                for version in (
+                    history_model.objects.filter(**{f"{object_id}__in": batch})
+                    .order_by(object_id, "history_date", "history_id")
+                    .values(*values)
+                ):
+                    versions.setdefault(version[object_id], []).append(version)
+
+                pruned = []
+                for object_versions in versions.values():
+                    pruned.extend(
+                        get_pruned_versions(
+                            object_versions,
+                            compared_fields,
+                            keep=keep,
+                            collapse=collapse,
+                            cutoff=cutoff,
+                        )
+                    )
+
+                if pruned and not dry_run:
+                    history_model.objects.filter(history_id__in=pruned).delete()
+
+            total += len(pruned)
+
+        return total
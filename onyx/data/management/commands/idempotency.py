@@ -0,0 +1,20 @@
+from django.core.management import base
+from django.utils import timezone
+from ...models import IdempotencyKey
+
+
+class Command(base.BaseCommand):
+    help = "Remove expired idempotency keys."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiet", action="store_true")
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+
+        removed, _ = IdempotencyKey.objects.filter(expires__lte=timezone.now()).delete()
+        self.print(f"Expired keys removed: {removed}")
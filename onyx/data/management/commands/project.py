@@ -5,6 +5,7 @@ from django.core.management import base
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from ...models import Project, ProjectGroup, Choice
+from ...validators import invalidate_choice_constraint_graph
 
 
 class PermissionConfig(BaseModel):
@@ -97,6 +98,9 @@ class Command(base.BaseCommand):
         if project_config.choice_constraints:
             self.set_choice_constraints(project_config.choice_constraints)
 
+        # Ensure validation uses the updated choices and constraints
+        invalidate_choice_constraint_graph(self.project.code)
+
         if p_created:
             self.print(f"Created project: {self.project.code}")
         else:
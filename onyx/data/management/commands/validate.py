@@ -0,0 +1,106 @@
+import json
+import sys
+from types import SimpleNamespace
+from django.core.management import base
+from django.urls import resolve, reverse, NoReverseMatch
+from rest_framework import exceptions
+from accounts.models import User
+from internal.renderers import OnyxJSONRenderer
+from ...models import Project
+from ...fields import FieldHandler, flatten_fields
+from ...bulk import validate_bulk
+
+
+class Command(base.BaseCommand):
+    help = "Validate a JSON file of records for creation in a project, without creating them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project")
+        parser.add_argument(
+            "file",
+            help="Path to a JSON file containing a list of records, or '-' to read from stdin.",
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username of the user that the records are validated for.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="The number of records in each chunk. Defaults to the BULK_VALIDATION setting.",
+        )
+        parser.add_argument(
+            "--errors-only",
+            action="store_true",
+            help="Only output the results of records that failed validation.",
+        )
+        parser.add_argument("--quiet", action="store_true")
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+
+        try:
+            project = Project.objects.get(code=options["project"])
+        except Project.DoesNotExist:
+            raise base.CommandError(
+                f"Project with code '{options['project']}' does not exist."
+            )
+
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise base.CommandError(
+                f"User with username '{options['user']}' does not exist."
+            )
+
+        try:
+            if options["file"] == "-":
+                data = json.load(sys.stdin)
+            else:
+                with open(options["file"]) as file:
+                    data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            raise base.CommandError(f"Could not read records: {e}")
+
+        # The serializer of a project is provided to its views through its URLs
+        try:
+            match = resolve(reverse(f"project.{project.code}"))
+        except NoReverseMatch:
+            raise base.CommandError(
+                f"Project with code '{project.code}' does not have any URLs."
+            )
+        serializer_class = match.kwargs["serializer_class"]
+
+        if not isinstance(data, list) or not data:
+            raise base.CommandError("Expected a JSON list of at least one record.")
+
+        # Validate the fields of the records, as they would be for the user in a request
+        handler = FieldHandler(project=project, action="add", user=user)
+        try:
+            handler.resolve_fields(flatten_fields(data))
+        except exceptions.ValidationError as e:
+            raise base.CommandError(f"Invalid fields: {e.detail}")
+
+        # Serializer defaults (e.g. the site) are taken from the user of the request
+        request = SimpleNamespace(user=user)
+
+        renderer = OnyxJSONRenderer()
+        failed = 0
+        for result in validate_bulk(
+            project=project,
+            serializer_class=serializer_class,
+            data=data,
+            request=request,
+            chunk_size=options["chunk_size"],
+        ):
+            if result["status"] != "success":
+                failed += 1
+            elif options["errors_only"]:
+                continue
+
+            self.stdout.write(renderer.dumps(result).decode())
+
+        if not self.quiet:
+            self.stderr.write(f"Validated: {len(data)}")
+            self.stderr.write(f"Failed: {failed}")
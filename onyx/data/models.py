@@ -1,17 +1,24 @@
 from typing import Any
+import functools
+import operator
 import uuid
 from datetime import datetime
 from secrets import token_hex
-from django.db import models
+from django.conf import settings
+from django.db import models, router, connections
+from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core import checks
 from django.core.checks.messages import CheckMessage
+from rest_framework.utils.encoders import JSONEncoder
 from accounts.models import Site, User
 from utils.fields import StrippedCharField, LowerCharField, UpperCharField, SiteField
 from utils.constraints import unique_together
-from simple_history.models import HistoricalRecords
+from simple_history.utils import get_history_manager_for_model
 from .types import ALL_LOOKUPS
+from .history import DeferredHistoricalRecords
 
 
 class Project(models.Model):
@@ -20,6 +27,9 @@ class Project(models.Model):
     description = models.TextField(blank=True)
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
 
+    # Incremented when the choices or choice constraints change, to invalidate compiled constraint graphs
+    choice_constraints_version = models.PositiveIntegerField(default=0)
+
 
 class ProjectGroup(models.Model):
     group = models.OneToOneField(
@@ -60,6 +70,57 @@ class Choice(models.Model):
         ]
 
 
+def insert_ignore_conflicts(
+    model: type[models.Model],
+    rows: list[dict[str, Any]],
+    returning: list[str],
+    batch_size: int = 1000,
+) -> list[tuple]:
+    """
+    Insert `rows` into the table of the `model`, ignoring any rows that conflict with a unique constraint.
+
+    Each batch of `batch_size` rows is inserted in a single `INSERT ... ON CONFLICT DO NOTHING` query.
+
+    Args:
+        model: The model to insert rows for.
+        rows: The rows to insert. Each row is a dictionary mapping field names to values, with the same keys.
+        returning: The fields to return for each inserted row.
+        batch_size: The number of rows to insert in each query.
+
+    Returns:
+        The values of the `returning` fields, for each row that was inserted.
+    """
+
+    if not rows:
+        return []
+
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    returning_fields = [model._meta.get_field(name) for name in returning]
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    inserted = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i : i + batch_size]
+            sql = "INSERT INTO %s (%s) VALUES %s ON CONFLICT DO NOTHING RETURNING %s" % (
+                quote(model._meta.db_table),
+                ", ".join(quote(field.column) for field in fields),  # type: ignore
+                ", ".join([placeholders] * len(batch)),
+                ", ".join(quote(field.column) for field in returning_fields),  # type: ignore
+            )
+            params = [
+                field.get_db_prep_save(value, connection)  # type: ignore
+                for row in batch
+                for field, value in zip(fields, row.values())
+            ]
+            cursor.execute(sql, params)
+            inserted.extend(cursor.fetchall())
+
+    return inserted
+
+
 def generate_climb_id():
     """
     Generate a random new CLIMB ID.
@@ -67,24 +128,119 @@ def generate_climb_id():
     The CLIMB ID consists of the prefix `C-` followed by 10 random hexadecimal numbers.
 
     This means there are `16^10 = 1,099,511,627,776` CLIMB IDs to choose from.
-    """
-    climb_id = "C-" + "".join(token_hex(5).upper())
 
-    if ClimbID.objects.filter(climb_id=climb_id).exists():
-        climb_id = generate_climb_id()
+    The CLIMB ID is not checked for uniqueness. Use `ClimbID.allocate` to reserve unique CLIMB IDs.
+    """
 
-    return climb_id
+    return "C-" + token_hex(5).upper()
 
 
 class ClimbID(models.Model):
     climb_id = UpperCharField(default=generate_climb_id, max_length=12, unique=True)
 
+    @classmethod
+    def allocate(cls, n: int = 1) -> list[str]:
+        """
+        Reserve `n` new unique CLIMB IDs.
+
+        The CLIMB IDs are reserved in a block, using a single insert that ignores conflicts.
+        Any CLIMB IDs that collided with existing ones are regenerated and retried.
+
+        Args:
+            n: The number of CLIMB IDs to reserve.
+
+        Returns:
+            The list of reserved CLIMB IDs.
+        """
+
+        climb_ids = []
+
+        while len(climb_ids) < n:
+            # Use a set to avoid collisions within the block itself
+            candidates = set()
+            while len(candidates) < n - len(climb_ids):
+                candidates.add(generate_climb_id())
+
+            climb_ids.extend(
+                climb_id
+                for (climb_id,) in insert_ignore_conflicts(
+                    cls,
+                    [{"climb_id": candidate} for candidate in candidates],
+                    returning=["climb_id"],
+                )
+            )
+
+        return climb_ids
+
+
+def bulk_insert(
+    model: type[models.Model],
+    instances: list[models.Model],
+    batch_size: int,
+) -> list[models.Model]:
+    """
+    Insert unsaved `instances` of the `model` in batches of `batch_size`.
+
+    Unlike `QuerySet.bulk_create`, this supports models with multi-table inheritance.
+    For these, the instances of each parent model are inserted first, followed by the model's own fields.
+
+    Args:
+        model: The model of the instances.
+        instances: The unsaved instances.
+        batch_size: The number of instances to insert in each query.
+
+    Returns:
+        The inserted instances.
+    """
+
+    if not model._meta.parents:
+        return model._base_manager.bulk_create(instances, batch_size=batch_size)
+
+    # Insert the parent instances, and link them to the instances
+    for parent, parent_link in model._meta.parents.items():
+        parent_fields = parent._meta.concrete_fields
+        parent_instances = [
+            parent(
+                **{
+                    field.attname: getattr(instance, field.attname)
+                    for field in parent_fields
+                }
+            )
+            for instance in instances
+        ]
+        bulk_insert(parent, parent_instances, batch_size)
+
+        # Copy back any values set on insert (e.g. primary keys, auto_now fields)
+        for instance, parent_instance in zip(instances, parent_instances):
+            for field in parent_fields:
+                setattr(
+                    instance, field.attname, getattr(parent_instance, field.attname)
+                )
+
+            if parent_link:
+                setattr(instance, parent_link.attname, parent_instance.pk)
+
+    # Insert the fields local to the model
+    db = router.db_for_write(model)
+    for i in range(0, len(instances), batch_size):
+        model._base_manager._insert(  # type: ignore
+            instances[i : i + batch_size],
+            fields=model._meta.local_concrete_fields,
+            using=db,
+        )
+
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = db
+
+    return instances
+
 
 class BaseRecord(models.Model):
     # TODO: Make uuid primary key?
     # Stop worrying about collisions. its not going to happen m8
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
-    history = HistoricalRecords(inherit=True)
+    history = DeferredHistoricalRecords(inherit=True)
     created = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.PROTECT)
@@ -107,6 +263,277 @@ class BaseRecord(models.Model):
 
         return errors
 
+    def save(self, *args, **kwargs):
+        # If only specific fields are being updated, fields that are set automatically on save
+        # (e.g. last_modified) are also updated, so that they still reflect the change
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {
+                field.name
+                for field in self._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            }
+
+        super().save(*args, **kwargs)
+
+    def get_version_token(self) -> str:
+        """
+        Get a token identifying the current version of the instance, for use as an entity tag.
+
+        The token is derived from the `last_modified` timestamp of the instance.
+        """
+
+        return str(int(self.last_modified.timestamp() * 1_000_000))
+
+    def touch_if_unmodified(self, last_modified: datetime) -> bool:
+        """
+        Update the `last_modified` timestamp of the instance, only if it still equals `last_modified` in the database.
+
+        This is a single conditional `UPDATE ... WHERE`, so no separate lock is taken.
+        Within a transaction, the row remains locked by the update until the transaction ends,
+        so any concurrent conditional update will then fail.
+
+        Args:
+            last_modified: The `last_modified` timestamp that the instance is expected to have.
+
+        Returns:
+            `True` if the instance was updated, otherwise `False`.
+        """
+
+        # With multi-table inheritance, the field belongs to the concrete model that declares it
+        # The update is run against this model, so that the condition is applied to the same table
+        model = self._meta.get_field("last_modified").model
+        now = timezone.now()
+
+        updated = model._base_manager.filter(
+            pk=self.pk,
+            last_modified=last_modified,
+        ).update(last_modified=now)
+
+        if updated:
+            self.last_modified = now
+
+        return bool(updated)
+
+    @classmethod
+    def prepare_bulk_create(cls, instances: list["BaseRecord"]) -> None:
+        """
+        Prepare unsaved `instances` of the model for a bulk create.
+
+        A bulk create does not call `save` on the instances,
+        so any additional setup done on `save` must be done here instead.
+        """
+
+        pass
+
+    @classmethod
+    def bulk_create(
+        cls,
+        instances: list["BaseRecord"],
+        batch_size: int,
+    ) -> list["BaseRecord"]:
+        """
+        Create unsaved `instances` of the model, and their history, in batches of `batch_size`.
+
+        Args:
+            instances: The unsaved instances.
+            batch_size: The number of instances to insert in each query.
+
+        Returns:
+            The created instances.
+        """
+
+        cls.prepare_bulk_create(instances)
+        bulk_insert(cls, instances, batch_size)  # type: ignore
+        get_history_manager_for_model(cls).bulk_history_create(
+            instances,
+            batch_size=batch_size,
+        )
+
+        return instances
+
+    @classmethod
+    def bulk_update(
+        cls,
+        instances: list["BaseRecord"],
+        fields: list[str],
+        batch_size: int,
+    ) -> list["BaseRecord"]:
+        """
+        Update the `fields` of saved `instances` of the model, and create their history, in batches of `batch_size`.
+
+        Args:
+            instances: The saved instances, with their updated values assigned.
+            fields: The names of the fields to update.
+            batch_size: The number of instances to update in each query.
+
+        Returns:
+            The updated instances.
+        """
+
+        # A bulk update does not call `save` on the instances
+        # So any fields that are set automatically on save (e.g. last_modified) are set here instead
+        fields = list(fields)
+        for field in cls._meta.concrete_fields:
+            if getattr(field, "auto_now", False):
+                for instance in instances:
+                    field.pre_save(instance, add=False)
+
+                if field.name not in fields:
+                    fields.append(field.name)
+
+        cls._base_manager.bulk_update(instances, fields, batch_size=batch_size)
+        get_history_manager_for_model(cls).bulk_history_create(
+            instances,
+            batch_size=batch_size,
+            update=True,
+        )
+
+        return instances
+
+    @classmethod
+    def bulk_delete(cls, pks: list[Any], batch_size: int) -> None:
+        """
+        Delete the instances of the model with the given `pks`, along with any nested records, in batches of `batch_size`.
+
+        Unlike `QuerySet.delete`, each model's instances are deleted with a single query per batch,
+        rather than one object at a time. Historical records of the deletions are bulk created.
+
+        If the model has any relations other than nested records, the instances are deleted with `QuerySet.delete`.
+
+        Args:
+            pks: The primary keys of the instances to delete.
+            batch_size: The number of instances to delete in each query.
+        """
+
+        nested = []
+        for relation in cls._meta.related_objects:
+            related_model = relation.related_model
+
+            # Skip the links between a model and its multi-table inheritance parents/children
+            if relation.parent_link:
+                continue
+
+            if (
+                isinstance(related_model, type)
+                and issubclass(related_model, BaseRecord)
+                and relation.on_delete is models.CASCADE
+            ):
+                nested.append((related_model, relation.field.name))  # type: ignore
+            else:
+                # Fall back to the standard deletion, which handles any relation
+                for i in range(0, len(pks), batch_size):
+                    cls._base_manager.filter(pk__in=pks[i : i + batch_size]).delete()
+
+                return
+
+        db = router.db_for_write(cls)
+        history_model = get_history_manager_for_model(cls).model
+
+        for i in range(0, len(pks), batch_size):
+            batch = pks[i : i + batch_size]
+
+            # Delete the nested records first
+            for related_model, link in nested:
+                related_model.bulk_delete(
+                    list(
+                        related_model._base_manager.filter(
+                            **{f"{link}__in": batch}
+                        ).values_list("pk", flat=True)
+                    ),
+                    batch_size=batch_size,
+                )
+
+            # Create the historical records of the deletions
+            if getattr(settings, "SIMPLE_HISTORY_ENABLED", True):
+                now = timezone.now()
+                history_model.objects.bulk_create(
+                    [
+                        history_model(
+                            history_date=now,
+                            history_type="-",
+                            history_user=history_model.get_default_history_user(
+                                instance
+                            ),
+                            **{
+                                field.attname: getattr(instance, field.attname)
+                                for field in history_model.tracked_fields
+                            },
+                        )
+                        for instance in cls._base_manager.filter(pk__in=batch)
+                    ],
+                    batch_size=batch_size,
+                )
+
+            # Delete the instances, followed by their multi-table inheritance parents
+            cls._base_manager.filter(pk__in=batch)._raw_delete(db)  # type: ignore
+            for parent in cls._meta.get_parent_list():
+                parent._base_manager.filter(pk__in=batch)._raw_delete(db)  # type: ignore
+
+    def get_bulk_set_values(self, values: dict[str, Any]) -> dict[str, Any]:
+        """
+        Get the values to set on the instance in a bulk set of `values`.
+
+        A bulk set does not call `save` on the instances,
+        so any additional values set on `save` must be added here instead.
+        """
+
+        return values
+
+    @classmethod
+    def bulk_set(
+        cls,
+        instances: list["BaseRecord"],
+        values: dict[str, Any],
+        batch_size: int,
+    ) -> list["BaseRecord"]:
+        """
+        Set the same `values` on saved `instances` of the model, and create their history, in batches of `batch_size`.
+
+        Instances that are set with the same values are updated together, with a single `UPDATE` per batch.
+
+        Args:
+            instances: The saved instances.
+            values: Dictionary mapping field names to the values to set.
+            batch_size: The number of instances to update in each query.
+
+        Returns:
+            The updated instances.
+        """
+
+        # Fields that are set automatically on save (e.g. last_modified) are set here instead
+        now = timezone.now()
+        values = values | {
+            field.name: now
+            for field in cls._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        }
+
+        # Group the instances by the values to set on them
+        groups = {}
+        for instance in instances:
+            instance_values = instance.get_bulk_set_values(values)
+
+            for field, value in instance_values.items():
+                setattr(instance, field, value)
+
+            groups.setdefault(
+                tuple(sorted(instance_values.items(), key=lambda item: item[0])), []
+            ).append(instance)
+
+        for group_values, group in groups.items():
+            for i in range(0, len(group), batch_size):
+                cls._base_manager.filter(
+                    pk__in=[instance.pk for instance in group[i : i + batch_size]]
+                ).update(**dict(group_values))
+
+        get_history_manager_for_model(cls).bulk_history_create(
+            instances,
+            batch_size=batch_size,
+            update=True,
+        )
+
+        return instances
+
 
 class ProjectRecord(BaseRecord):
     @classmethod
@@ -146,14 +573,49 @@ class ProjectRecord(BaseRecord):
 
     def save(self, *args, **kwargs):
         if not self.pk:
-            climb_id = ClimbID.objects.create()
-            self.climb_id = climb_id.climb_id
+            self.climb_id = ClimbID.allocate()[0]
 
         if self.published_date is None and self.is_published:
             self.published_date = datetime.today().date()
 
+            # Ensure the published date is saved if only specific fields are being updated
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | {
+                    "published_date"
+                }
+
         super().save(*args, **kwargs)
 
+    def get_bulk_set_values(self, values: dict[str, Any]) -> dict[str, Any]:
+        """
+        Get the values to set on the instance in a bulk set of `values`.
+
+        If the instance is being published, it is assigned a published date.
+        """
+
+        if self.published_date is None and values.get(
+            "is_published", self.is_published
+        ):
+            values = values | {"published_date": datetime.today().date()}
+
+        return values
+
+    @classmethod
+    def prepare_bulk_create(cls, instances: list["ProjectRecord"]) -> None:
+        """
+        Prepare unsaved `instances` of the model for a bulk create.
+
+        Each instance is assigned a new CLIMB ID, and a published date if it is published.
+        """
+
+        climb_ids = ClimbID.allocate(len(instances))
+
+        for instance, climb_id in zip(instances, climb_ids):
+            instance.climb_id = climb_id
+
+            if instance.published_date is None and instance.is_published:
+                instance.published_date = datetime.today().date()
+
 
 class Anonymiser(models.Model):
     project = models.ForeignKey(Project, on_delete=models.PROTECT)
@@ -206,3 +668,162 @@ class Anonymiser(models.Model):
             self.identifier = self.generate_identifier()
 
         super().save(*args, **kwargs)
+
+    @classmethod
+    def allocate(
+        cls,
+        project: Project,
+        entries: list[tuple[Site, str, str, str]],
+        batch_size: int = 500,
+    ) -> list[str]:
+        """
+        Get or create the identifiers for a list of `entries` within a `project`.
+
+        Each entry is a tuple of `(site, field, hash, prefix)`.
+
+        Identifiers are reserved in a block, using a single insert that ignores conflicts.
+        Any entries that were not inserted either already exist, in which case their existing identifier is retrieved,
+        or their identifier collided with an existing one, in which case the identifier is regenerated and retried.
+
+        Args:
+            project: The project of the entries.
+            entries: The list of `(site, field, hash, prefix)` tuples.
+            batch_size: The number of entries to retrieve in each query.
+
+        Returns:
+            The list of identifiers, in the same order as the `entries`.
+        """
+
+        field_instance = cls._meta.get_field("field")
+
+        # Keys that identify each entry, as stored in the database
+        keys = [
+            (site.pk, field_instance.to_python(field), hash)
+            for site, field, hash, _ in entries
+        ]
+
+        # Entries still requiring an identifier, mapped to their prefix
+        pending = {key: entry[3] for key, entry in zip(keys, entries)}
+        identifiers = {}
+
+        while pending:
+            # Attempt to insert each pending entry with a new identifier
+            inserted = insert_ignore_conflicts(
+                cls,
+                [
+                    {
+                        "project": project.pk,
+                        "site": site_id,
+                        "field": field,
+                        "hash": hash,
+                        "prefix": prefix,
+                        "identifier": prefix + token_hex(5).upper(),
+                    }
+                    for (site_id, field, hash), prefix in pending.items()
+                ],
+                returning=["site", "field", "hash", "identifier"],
+            )
+            for site_id, field, hash, identifier in inserted:
+                identifiers[(site_id, field, hash)] = identifier
+                pending.pop((site_id, field, hash))
+
+            # Retrieve the identifiers of any entries that already exist
+            existing = cls.get_existing(project, list(pending), batch_size=batch_size)
+            for key, identifier in existing.items():
+                identifiers[key] = identifier
+                pending.pop(key)
+
+            # Any remaining entries had colliding identifiers, so are retried
+
+        return [identifiers[key] for key in keys]
+
+    @classmethod
+    def lookup(
+        cls,
+        project: Project,
+        entries: list[tuple[Site, str, str, str]],
+        batch_size: int = 500,
+    ) -> list[str | None]:
+        """
+        Get the existing identifiers for a list of `entries` within a `project`, without creating any.
+
+        Each entry is a tuple of `(site, field, hash, prefix)`.
+
+        Args:
+            project: The project of the entries.
+            entries: The list of `(site, field, hash, prefix)` tuples.
+            batch_size: The number of entries to retrieve in each query.
+
+        Returns:
+            The list of identifiers (or `None` for entries without one), in the same order as the `entries`.
+        """
+
+        field_instance = cls._meta.get_field("field")
+
+        keys = [
+            (site.pk, field_instance.to_python(field), hash)
+            for site, field, hash, _ in entries
+        ]
+        existing = cls.get_existing(project, list(set(keys)), batch_size=batch_size)
+
+        return [existing.get(key) for key in keys]
+
+    @classmethod
+    def get_existing(
+        cls,
+        project: Project,
+        keys: list[tuple[Any, str, str]],
+        batch_size: int = 500,
+    ) -> dict[tuple[Any, str, str], str]:
+        """
+        Retrieve the identifiers of any `(site_id, field, hash)` keys that already exist within a `project`.
+
+        Args:
+            project: The project of the keys.
+            keys: The list of `(site_id, field, hash)` tuples.
+            batch_size: The number of keys to retrieve in each query.
+
+        Returns:
+            Dictionary mapping each existing key to its identifier.
+        """
+
+        existing = {}
+
+        for i in range(0, len(keys), batch_size):
+            q_object = functools.reduce(
+                operator.or_,
+                [
+                    Q(site_id=site_id, field=field, hash=hash)
+                    for site_id, field, hash in keys[i : i + batch_size]
+                ],
+            )
+            for site_id, field, hash, identifier in (
+                cls.objects.filter(project=project)
+                .filter(q_object)
+                .values_list("site_id", "field", "hash", "identifier")
+            ):
+                existing[(site_id, field, hash)] = identifier
+
+        return existing
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+
+    # The stored response, which is null while the request holding the key is in progress
+    response = models.JSONField(null=True, encoder=JSONEncoder)
+    expires = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires"]),
+        ]
+        constraints = [
+            unique_together(
+                fields=["user", "method", "path", "key"],
+            ),
+        ]
@@ -110,6 +110,94 @@ def make_query(data: Dict[str, Any]) -> Q:
         return q
 
 
+@validate_data
+def make_nested_query(
+    data: Dict[str, Any],
+    onyx_fields: Dict[str, OnyxField],
+    prefix: str,
+) -> Q | None:
+    """
+    Traverses the provided `data` and forms the Q object that applies to the nested relation `prefix`.
+
+    The Q object is relative to the nested relation, so it can be used to filter its prefetched instances.
+
+    Returns `None` if the query places no constraint on the nested relation.
+    """
+
+    key, value = next(iter(data.items()))
+
+    if key == "&":
+        # Any parts of the query that do not apply to the nested relation can be dropped
+        # This is because these parts are filtering the parent instances, not the nested instances
+        q_objects = [
+            q
+            for q in (make_nested_query(k_v, onyx_fields, prefix) for k_v in value)
+            if q is not None
+        ]
+        if not q_objects:
+            return None
+
+        return functools.reduce(operator.and_, q_objects)
+
+    elif key == "|":
+        # If any part of the query does not apply to the nested relation
+        # then a parent instance could have matched through this part
+        # In which case, no constraint can be placed on the nested instances
+        q_objects = [make_nested_query(k_v, onyx_fields, prefix) for k_v in value]
+        if any(q is None for q in q_objects):
+            return None
+
+        return functools.reduce(operator.or_, q_objects)  # type: ignore
+
+    elif key == "~":
+        # A negation is only carried over if it applies entirely to the nested relation
+        # Otherwise, negating the partial query would exclude nested instances incorrectly
+        if not all(
+            onyx_fields[atom.key].field_path.startswith(f"{prefix}__")
+            for atom in get_atoms(value)
+        ):
+            return None
+
+        q = make_nested_query(value, onyx_fields, prefix)
+        if q is None:
+            return None
+
+        return ~q
+
+    elif key == "^":
+        # Exclusive-or across parent instances does not correspond to a constraint on nested instances
+        return None
+
+    else:
+        # Base case: a QueryAtom to filter on
+        # This only applies if it filters on a field within the nested relation
+        # (and not on the nested relation itself, e.g. `records__isnull`)
+        if not onyx_fields[value.key].field_path.startswith(f"{prefix}__"):
+            return None
+
+        return Q(**{value.key.removeprefix(f"{prefix}__"): value.value})
+
+
+@validate_data
+def get_atoms(data: Dict[str, Any]) -> List[QueryAtom]:
+    """
+    Traverses the provided `data` and returns the list of `QueryAtom` objects within it.
+
+    Unlike `make_atoms`, this does not modify `data`, so can be used after the query has been built.
+    """
+
+    key, value = next(iter(data.items()))
+
+    if key in {"&", "|", "^"}:
+        return functools.reduce(operator.add, [get_atoms(k_v) for k_v in value])
+
+    elif key == "~":
+        return get_atoms(value)
+
+    else:
+        return [value]
+
+
 def validate_atoms(
     model: type[Model],
     atoms: List[QueryAtom],
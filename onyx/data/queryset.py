@@ -1,7 +1,10 @@
-from django.db.models import Q, QuerySet
+from typing import Any
+from django.db.models import Q, QuerySet, Model, Prefetch
 from django.db.models.manager import BaseManager
 from accounts.models import User
 from .models import ProjectRecord
+from .fields import OnyxField
+from .query import make_nested_query
 
 
 def init_project_queryset(
@@ -44,29 +47,60 @@ def prefetch_nested(
     qs: QuerySet,
     fields_dict: dict,
     prefix: str | None = None,
+    query: dict[str, Any] | None = None,
+    onyx_fields: dict[str, OnyxField] | None = None,
+    model: type[Model] | None = None,
 ) -> QuerySet:
     """
     For each field in `fields_dict` that contains nested data, apply prefetching to the QuerySet `qs`.
 
+    If a `query` is provided, the prefetched instances of each nested field are filtered
+    by the parts of the `query` that apply to that nested field.
+
     Args:
         qs: The QuerySet to apply prefetching to.
         fields_dict: A dictionary of fields, where nested fields trigger prefetching.
         prefix: The prefix to use for the fields.
+        query: The validated query used to filter the prefetched instances.
+        onyx_fields: The `OnyxField` objects for each field (and lookup) in the `query`.
+        model: The model of the fields. Defaults to the model of the QuerySet.
 
     Returns:
         The QuerySet with prefetching applied.
     """
 
+    if model is None:
+        model = qs.model
+
     for field, nested in fields_dict.items():
         if nested:
+            related_model = model._meta.get_field(field).related_model
+
             if prefix:
                 field = f"{prefix}__{field}"
 
-            qs = qs.prefetch_related(field)
+            q_object = None
+            if query:
+                assert onyx_fields is not None
+                q_object = make_nested_query(query, onyx_fields, field)
+
+            if q_object is not None:
+                qs = qs.prefetch_related(
+                    Prefetch(
+                        field,
+                        queryset=related_model.objects.filter(q_object),  # type: ignore
+                    )
+                )
+            else:
+                qs = qs.prefetch_related(field)
+
             qs = prefetch_nested(
                 qs=qs,
                 fields_dict=nested,
                 prefix=field,
+                query=query,
+                onyx_fields=onyx_fields,
+                model=related_model,  # type: ignore
             )
 
     return qs
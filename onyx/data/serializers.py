@@ -1,7 +1,11 @@
 from __future__ import annotations
+import functools
 import hashlib
+import operator
+from datetime import datetime
 from typing import Any
 from django.db import transaction, DatabaseError, models
+from django.db.models import Q
 from rest_framework import serializers, exceptions
 from accounts.models import User
 from utils.defaults import CurrentUserSiteDefault
@@ -9,8 +13,9 @@ from utils.fieldserializers import DateField, SiteField
 from . import validators
 from .types import OnyxType
 from .fields import OnyxField
-from .models import Anonymiser
-
+from .models import Project, Anonymiser
+from .exceptions import PreconditionFailed
+from .history import deferred_history
 
 # Mapping of OnyxType to Django REST Framework serializer field
 FIELDS = {
@@ -227,29 +232,85 @@ class ProjectRecordSerializer(BaseRecordSerializer):
         if not self.instance:
             # NOTE: This runs before unique_together checks, but AFTER unique checks
             # TODO: This currently only allows anonymisation on create. Should it be this way?
-            for anonymised_field, prefix in self.OnyxMeta.anonymised_fields.items():
-                if data.get(anonymised_field):
-                    hasher = hashlib.sha256()
-                    hasher.update(
-                        data[anonymised_field].strip().lower().encode("utf-8")
-                    )
-                    hash = hasher.hexdigest()
-
-                    anonymiser, _ = Anonymiser.objects.get_or_create(
-                        project=self.context["project"],
-                        site=data["site"],
-                        field=anonymised_field,
-                        hash=hash,
-                        defaults={"prefix": prefix},
-                    )
-                    data[anonymised_field] = anonymiser.identifier
+            entries = self.get_anonymiser_entries(data)
+
+            if self.context.get("bulk"):
+                # In bulk operations, fields are anonymised across the whole batch at once
+                # This is done using the anonymise_batch method, after each item is validated
+                self.anonymiser_entries = entries
+
+            elif entries:
+                identifiers = Anonymiser.allocate(
+                    project=self.context["project"],
+                    entries=list(entries.values()),
+                )
+                data.update(zip(entries.keys(), identifiers))
 
         return data
 
+    def get_anonymiser_entries(
+        self, data: dict[str, Any]
+    ) -> dict[str, tuple[Any, str, str, str]]:
+        """
+        Get the `(site, field, hash, prefix)` entries required to anonymise the fields in `data`.
+
+        Args:
+            data: The data being validated.
+
+        Returns:
+            Dictionary mapping each anonymised field to its entry.
+        """
+
+        entries = {}
+
+        for anonymised_field, prefix in self.OnyxMeta.anonymised_fields.items():
+            if data.get(anonymised_field):
+                hasher = hashlib.sha256()
+                hasher.update(data[anonymised_field].strip().lower().encode("utf-8"))
+                hash = hasher.hexdigest()
+
+                entries[anonymised_field] = (
+                    data["site"],
+                    anonymised_field,
+                    hash,
+                    prefix,
+                )
+
+        return entries
+
+    @staticmethod
+    def anonymise_batch(
+        serializers: list[ProjectRecordSerializer],
+        project: Project,
+    ) -> None:
+        """
+        Anonymise the fields of a batch of validated bulk `serializers`, using a single set-based allocation.
+
+        The anonymised identifiers are written into the `validated_data` of each serializer.
+
+        Args:
+            serializers: The list of validated serializers.
+            project: The project of the serializers.
+        """
+
+        targets = []
+        entries = []
+
+        for serializer in serializers:
+            for field, entry in getattr(serializer, "anonymiser_entries", {}).items():
+                targets.append((serializer, field))
+                entries.append(entry)
+
+        if not entries:
+            return
+
+        identifiers = Anonymiser.allocate(project=project, entries=entries)
+
+        for (serializer, field), identifier in zip(targets, identifiers):
+            serializer.validated_data[field] = identifier  # type: ignore
+
 
 # TODO: Race condition testing + preventions.
-# E.g. could introduce model update_fields argument
-# This would mean only changed fields are updated, rather than whole instance
 # TODO: Investigate type: ignore statements in SerializerNode
 class SerializerNode:
     def __init__(
@@ -338,26 +399,37 @@ class SerializerNode:
                 except exceptions.ValidationError as e:
                     self.errors[field] = e.args[0]
 
-    def _validate_subnode(
+    def _validate_subnodes(
         self,
-        subnode: SerializerNode,
+        subnodes: list[SerializerNode],
         link: models.Model | None = None,
-    ) -> tuple[bool, dict[str, Any]]:
+        batch_size: int = 500,
+    ) -> list[tuple[bool, dict[str, Any]]]:
         """
-        Prepare/run validation of a subnode.
+        Prepare/run validation of a list of subnodes, that share the same relation.
+
+        Any existing instances of the subnodes are retrieved together, using one query per batch of subnodes.
         """
 
+        if not subnodes:
+            return []
+
         if not link:
-            # If a link was not provided, the subnode does not exist
+            # If a link was not provided, the subnodes do not exist
             # This is because a subnode cannot already exist without a pre-existing linked instance
-            # Therefore, the subnode is validated against the assumption it is being created
-            if not subnode.is_valid():
-                return False, subnode.errors
-        else:
-            # If a link was provided, the subnode may exist
-            # The subnode's identifiers are mandatory fields that locate an instance, required for either create/update
-            # These identifiers are validated, and used to attempt to locate an instance
-            # If an instance is found, the subnode validates for update, otherwise it validates for creation
+            # Therefore, the subnodes are validated against the assumption they are being created
+            return [
+                (True, {}) if subnode.is_valid() else (False, subnode.errors)
+                for subnode in subnodes
+            ]
+
+        # If a link was provided, the subnodes may exist
+        # The subnode's identifiers are mandatory fields that locate an instance, required for either create/update
+        # These identifiers are validated, and used to attempt to locate an instance
+        # If an instance is found, the subnode validates for update, otherwise it validates for creation
+        results = {}
+        valid_identifiers = {}
+        for i, subnode in enumerate(subnodes):
             identifiers = {
                 key: value
                 for key, value in subnode.data.items()
@@ -370,28 +442,39 @@ class SerializerNode:
 
             # Determine whether the provided identifiers are valid
             if not identifier_serializer.is_valid():
-                return False, identifier_serializer.errors  #  type: ignore
+                results[i] = (False, identifier_serializer.errors)
+                continue
 
             # Obtain the valid identifiers
-            valid_identifiers = identifier_serializer.validated_data
-            assert isinstance(valid_identifiers, dict)
-
-            # Use the identifiers to try and locate an instance
-            try:
-                ins = subnode.model.objects.get(
-                    link=link,
-                    **valid_identifiers,
-                )
-            except subnode.model.DoesNotExist:
-                ins = None
-
-            # Run validation of the subnode
-            # If an instance was found, it is passed into the subnode and this will be validated as an update
-            # Otherwise, the subnode is validated for purpose of creating an instance
-            if not subnode.is_valid(instance=ins):
-                return False, subnode.errors
+            assert isinstance(identifier_serializer.validated_data, dict)
+            valid_identifiers[i] = identifier_serializer.validated_data
+
+        # Use the identifiers to locate the existing instances, keyed by their identifiers
+        model = subnodes[0].model
+        fields = list(subnodes[0].identifiers)
+        existing = {}
+        filters = list(valid_identifiers.values())
+        for j in range(0, len(filters), batch_size):
+            q_object = functools.reduce(
+                operator.or_,
+                [Q(**identifiers) for identifiers in filters[j : j + batch_size]],
+            )
+            for ins in model.objects.filter(link=link).filter(q_object):
+                existing[tuple(getattr(ins, field) for field in fields)] = ins
+
+        # Run validation of each subnode
+        # If an instance was found, it is passed into the subnode and this will be validated as an update
+        # Otherwise, the subnode is validated for purpose of creating an instance
+        for i, identifiers in valid_identifiers.items():
+            subnode = subnodes[i]
+            ins = existing.get(tuple(identifiers.get(field) for field in fields))
+
+            if subnode.is_valid(instance=ins):
+                results[i] = (True, {})
+            else:
+                results[i] = (False, subnode.errors)
 
-        return True, {}
+        return [results[i] for i in range(len(subnodes))]
 
     def is_valid(
         self,
@@ -420,12 +503,20 @@ class SerializerNode:
                 # Used to track duplicate identifiers
                 identifiers_set = set()
 
+                # Need to check for the existence of each subnode
+                # This is because some may be set to 'None' if they failed __init__ validation
+                # e.g. the subnode may have been provided as a list when expected a dict
+                # The remaining subnodes are validated together
+                subnode_results = iter(
+                    self._validate_subnodes(
+                        [n for n in node if n],
+                        link=instance,
+                    )
+                )
+
                 for i, n in enumerate(node):
-                    # Need to check for the existence of the subnode
-                    # This is because some may be set to 'None' if they failed __init__ validation
-                    # e.g. the subnode may have been provided as a list when expected a dict
                     if n:
-                        val, errors = self._validate_subnode(n, link=instance)
+                        val, errors = next(subnode_results)
                         valid.append(val)
 
                         if errors:
@@ -455,7 +546,7 @@ class SerializerNode:
                             identifiers_set.add(n_identifiers)
 
             else:
-                val, errors = self._validate_subnode(node, link=instance)
+                [(val, errors)] = self._validate_subnodes([node], link=instance)
                 valid.append(val)
 
                 if errors:
@@ -466,6 +557,7 @@ class SerializerNode:
     def _save(
         self,
         link: models.Model | None = None,
+        batch_size: int = 500,
     ) -> models.Model:
         """
         Inner function for saving a node, without being wrapped in a transaction.
@@ -473,31 +565,76 @@ class SerializerNode:
         Do NOT call this function outside of the SerializerNode.
         """
 
+        if self.serializer.instance is not None:
+            # Update only the fields that have changed
+            # If no fields have changed, the instance is not saved, so no historical record is created
+            instance = self.serializer.instance
+            changed_fields = self.get_changed_fields()
+
+            if changed_fields:
+                for field in changed_fields:
+                    setattr(instance, field, self.serializer.validated_data[field])  # type: ignore
+
+                instance.save(update_fields=changed_fields)
+
         # Save the serializer and retrieve an instance
         # If a link was provided, pass it through to the serializer
-        if link:
+        elif link:
             instance = self.serializer.save(link=link)
         else:
             instance = self.serializer.save()
 
-        # Save any nested objects, providing a link to the current instance
+        # Save any nested objects with bulk inserts/updates, providing a link to the current instance
+        SerializerNode._bulk_save_nested([self], batch_size=batch_size)
+
+        return instance  # type: ignore
+
+    def get_changed_fields(self) -> list[str]:
+        """
+        Get the fields in the validated data of a node that differ from its instance.
+
+        If the node has no instance, all fields in the validated data are returned.
+        """
+
+        data = self.serializer.validated_data
+        assert isinstance(data, dict)
+
+        if self.serializer.instance is None:
+            return list(data.keys())
+
+        return [
+            field
+            for field, value in data.items()
+            if getattr(self.serializer.instance, field) != value
+        ]
+
+    def has_changes(self) -> bool:
+        """
+        Determine whether saving a node (or any of its nested nodes) would write to the database.
+        """
+
+        if self.serializer.instance is None or self.get_changed_fields():
+            return True
+
         for node in self.nodes.values():
             if isinstance(node, list):
-                for n in node:
-                    if n:
-                        n._save(link=instance)
-            else:
-                node._save(link=instance)
+                if any(n.has_changes() for n in node if n):
+                    return True
+            elif node.has_changes():
+                return True
 
-        return instance  #  type: ignore
+        return False
 
-    def save(self) -> models.Model:
+    def save(self, last_modified: datetime | None = None) -> models.Model:
         """
         Save a node.
 
         Wraps the whole operation in a `transaction.atomic` block, ensuring atomicity of the database.
 
         This means either all changes to the database triggered by the save are committed, or none of them are.
+
+        If `last_modified` is provided, the node's instance is only updated if it has not been modified since.
+        Otherwise, `PreconditionFailed` is raised.
         """
 
         try:
@@ -506,9 +643,24 @@ class SerializerNode:
             # If the context manager encounters any DatabaseErrors, it rolls back the transaction.
             with transaction.atomic():
                 try:
-                    # Attempt to save the node
-                    # If successful, returns the saved instance
-                    instance = self._save()
+                    # If enabled, historical records are deferred and bulk inserted at the end of the transaction
+                    with deferred_history():
+                        # Claim the current version of the instance with a conditional update
+                        # This fails if the instance has been modified since the given timestamp
+                        # Changes to nested nodes also claim the instance, so they are covered by its version
+                        if (
+                            last_modified is not None
+                            and self.serializer.instance is not None
+                            and self.has_changes()
+                            and not self.serializer.instance.touch_if_unmodified(  # type: ignore
+                                last_modified
+                            )
+                        ):
+                            raise PreconditionFailed
+
+                        # Attempt to save the node
+                        # If successful, returns the saved instance
+                        instance = self._save()
                 except Exception as e:
                     # Catch all exceptions thrown during the saving process, and re-raise them as DatabaseErrors.
                     # This means ANY error will cause the entire database transaction to be rolled back.
@@ -521,3 +673,206 @@ class SerializerNode:
             raise e.__cause__
 
         return instance
+
+    @staticmethod
+    def _bulk_save(
+        nodes: list[SerializerNode],
+        batch_size: int,
+        links: list[models.Model] | None = None,
+    ) -> list[models.Model]:
+        """
+        Inner function for saving a list of nodes with bulk inserts/updates, without being wrapped in a transaction.
+
+        All nodes must share the same serializer class.
+        Nodes validated for creation are inserted, and nodes validated for update of an instance are updated.
+
+        Do NOT call this function outside of the SerializerNode.
+        """
+
+        if not nodes:
+            return []
+
+        model = nodes[0].model
+
+        # Build an unsaved instance from the validated data of each node to be created
+        # If links were provided, pass them through to the instances
+        # For each node to be updated, assign its validated data to its instance
+        instances = []
+        created = []
+        updated = []
+        updated_fields = set()
+        for i, node in enumerate(nodes):
+            data = dict(node.serializer.validated_data)  # type: ignore
+
+            if node.serializer.instance is None:
+                if links:
+                    data["link"] = links[i]
+
+                instance = model(**data)
+                created.append(instance)
+            else:
+                instance = node.serializer.instance
+                changed_fields = node.get_changed_fields()
+
+                # Instances without any changes are not updated, and no historical record is created
+                if changed_fields:
+                    for field in changed_fields:
+                        setattr(instance, field, data[field])
+
+                    updated.append(instance)
+                    updated_fields.update(changed_fields)
+
+            instances.append(instance)
+
+        # Create/update the instances (and their history) in batches
+        if created:
+            model.bulk_create(created, batch_size=batch_size)
+
+        if updated:
+            model.bulk_update(updated, list(updated_fields), batch_size=batch_size)
+
+        for node, instance in zip(nodes, instances):
+            node.serializer.instance = instance
+
+        SerializerNode._bulk_save_nested(nodes, batch_size=batch_size)
+
+        return instances
+
+    @staticmethod
+    def _bulk_save_nested(
+        nodes: list[SerializerNode],
+        batch_size: int,
+    ) -> None:
+        """
+        Inner function for saving the nested nodes of a list of saved nodes, without being wrapped in a transaction.
+
+        Do NOT call this function outside of the SerializerNode.
+        """
+
+        # Group the nested nodes of each relation, along with the instances they link to
+        # This means the nested nodes of all instances are saved together
+        related = {}
+        for node in nodes:
+            for field, field_nodes in node.nodes.items():
+                if not isinstance(field_nodes, list):
+                    field_nodes = [field_nodes]
+
+                for n in field_nodes:
+                    if n:
+                        related_nodes, related_links = related.setdefault(
+                            field, ([], [])
+                        )
+                        related_nodes.append(n)
+                        related_links.append(node.serializer.instance)
+
+        # Save the nested nodes of each relation, providing links to their instances
+        for related_nodes, related_links in related.values():
+            SerializerNode._bulk_save(
+                related_nodes,
+                batch_size=batch_size,
+                links=related_links,
+            )
+
+    @staticmethod
+    def bulk_save(
+        nodes: list[SerializerNode],
+        batch_size: int = 500,
+        atomic: bool = True,
+    ) -> list[models.Model | None]:
+        """
+        Save a list of nodes, using bulk inserts in batches of `batch_size`.
+
+        All nodes must share the same serializer class.
+        Nodes validated for creation are inserted, and nodes validated for update of an instance are updated.
+
+        If `atomic = True`, the whole operation is wrapped in a `transaction.atomic` block,
+        so either all nodes are saved, or none of them are.
+
+        Otherwise, each batch is committed separately. If a batch fails, its nodes are saved one at a time,
+        so that only the failing nodes are not saved. These nodes are returned as `None`, with their errors set.
+        """
+
+        if atomic:
+            try:
+                with transaction.atomic():
+                    try:
+                        with deferred_history():
+                            return SerializerNode._bulk_save(  # type: ignore
+                                nodes, batch_size=batch_size
+                            )
+                    except Exception as e:
+                        # As with save, ANY error will cause the entire transaction to be rolled back.
+                        raise DatabaseError from e
+
+            except DatabaseError as e:
+                assert e.__cause__ is not None
+                raise e.__cause__
+
+        instances = []
+        for i in range(0, len(nodes), batch_size):
+            batch = nodes[i : i + batch_size]
+            snapshots = [node.snapshot_instances() for node in batch]
+
+            try:
+                with transaction.atomic(), deferred_history():
+                    instances.extend(
+                        SerializerNode._bulk_save(batch, batch_size=batch_size)
+                    )
+            except Exception:
+                # Save each node in the batch individually, to isolate the failure
+                for node, snapshot in zip(batch, snapshots):
+                    # The failed batch may have assigned instances to new nodes, and modified existing instances
+                    # These changes were rolled back in the database, so are also undone in memory
+                    SerializerNode.restore_instances(snapshot)
+
+                    try:
+                        instances.append(node.save())
+                    except Exception:
+                        node.errors = {
+                            "non_field_errors": ["This record could not be saved."]
+                        }
+                        instances.append(None)
+
+        return instances
+
+    def snapshot_instances(
+        self,
+    ) -> list[tuple[SerializerNode, models.Model | None, dict[str, Any]]]:
+        """
+        Get the instance of a node (and its nested nodes), with the current values of the fields that saving would change.
+        """
+
+        instance = self.serializer.instance
+        data = self.serializer.validated_data
+        assert isinstance(data, dict)
+
+        values = (
+            {field: getattr(instance, field) for field in data}
+            if instance is not None
+            else {}
+        )
+        snapshot = [(self, instance, values)]
+
+        for node in self.nodes.values():
+            if isinstance(node, list):
+                for n in node:
+                    if n:
+                        snapshot.extend(n.snapshot_instances())
+            else:
+                snapshot.extend(node.snapshot_instances())
+
+        return snapshot
+
+    @staticmethod
+    def restore_instances(
+        snapshot: list[tuple[SerializerNode, models.Model | None, dict[str, Any]]],
+    ) -> None:
+        """
+        Restore the instances (and their field values) recorded in a `snapshot` to their nodes.
+        """
+
+        for node, instance, values in snapshot:
+            for field, value in values.items():
+                setattr(instance, field, value)
+
+            node.serializer.instance = instance
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from .utils import OnyxTestCase, generate_test_data
+from projects.testproject.models import TestModel, TestModelRecord
+
+
+class TestHistoryCommand(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions and create a test record with several versions.
+        """
+
+        super().setUp()
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+        response = self.client.post(
+            reverse("project.testproject", kwargs={"code": "testproject"}),
+            data=generate_test_data(n=1, nested=True)[0],
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.instance = TestModel.objects.get(
+            climb_id=response.json()["data"]["climb_id"]
+        )
+
+        # Two identical versions, followed by a change and another identical version
+        self.instance.save()
+        self.instance.save()
+        self.instance.tests += 1  # type: ignore
+        self.instance.save()
+        self.instance.save()
+        self.assertEqual(self.instance.history.count(), 5)  # type: ignore
+
+    def test_collapse(self):
+        """
+        Test that consecutive identical versions are collapsed.
+        """
+
+        call_command("history", "testproject", "--collapse", quiet=True)
+        history = self.instance.history.order_by("history_date")  # type: ignore
+        self.assertEqual(history.count(), 3)
+        self.assertEqual(history.last().tests, self.instance.tests)
+        self.assertEqual(
+            TestModelRecord.history.filter(link=self.instance).count(), 2  # type: ignore
+        )
+
+    def test_keep(self):
+        """
+        Test that only the latest versions are kept.
+        """
+
+        call_command("history", "testproject", "--keep", "2", quiet=True)
+        self.assertEqual(self.instance.history.count(), 2)  # type: ignore
+
+        call_command("history", "testproject", "--keep", "1", quiet=True)
+        self.assertEqual(self.instance.history.count(), 1)  # type: ignore
+        self.assertEqual(self.instance.history.first().tests, self.instance.tests)  # type: ignore
+
+    def test_retention(self):
+        """
+        Test that versions older than the retention period are removed, except for the latest.
+        """
+
+        self.instance.history.update(  # type: ignore
+            history_date=timezone.now() - timedelta(days=10)
+        )
+        call_command("history", "testproject", "--retention", "20", quiet=True)
+        self.assertEqual(self.instance.history.count(), 5)  # type: ignore
+
+        call_command("history", "testproject", "--retention", "5", quiet=True)
+        self.assertEqual(self.instance.history.count(), 1)  # type: ignore
+
+    def test_dry_run(self):
+        """
+        Test that a dry run does not remove any versions.
+        """
+
+        call_command("history", "testproject", "--keep", "1", "--dry-run", quiet=True)
+        self.assertEqual(self.instance.history.count(), 5)  # type: ignore
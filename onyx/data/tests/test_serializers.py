@@ -0,0 +1,80 @@
+from unittest import mock
+from django.db import DatabaseError
+from django.test import RequestFactory
+from rest_framework import status
+from rest_framework.reverse import reverse
+from .utils import OnyxTestCase, generate_test_data
+from data.models import Project
+from data.serializers import SerializerNode
+from projects.testproject.models import TestModel, TestModelRecord
+from projects.testproject.serializers import TestModelSerializer
+
+
+class TestBulkSave(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions and create a test record with nested records.
+        """
+
+        super().setUp()
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+        response = self.client.post(
+            reverse("project.testproject", kwargs={"code": "testproject"}),
+            data=generate_test_data(n=1, nested=True)[0],
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.instance = TestModel.objects.get(
+            climb_id=response.json()["data"]["climb_id"]
+        )
+
+    def test_non_atomic_retry(self):
+        """
+        Test that retrying a failed batch updates existing instances, rather than duplicating them.
+        """
+
+        request = RequestFactory().post("/")
+        request.user = self.user
+        node = SerializerNode(
+            TestModelSerializer,
+            data={
+                "tests": 3,
+                "records": [
+                    {"test_id": 1, "test_pass": True, "test_result": "retried"},
+                    {
+                        "test_id": 3,
+                        "test_pass": False,
+                        "test_start": "2022-01",
+                        "test_end": "2023-01",
+                        "score_a": 1.0,
+                    },
+                ],
+            },
+            context={
+                "project": Project.objects.get(code="testproject"),
+                "request": request,
+            },
+        )
+        self.assertTrue(node.is_valid(instance=self.instance), node.errors)
+
+        # Fail the first insert of nested records, after the instance and its records have been updated
+        bulk_create = TestModelRecord.bulk_create
+        calls = []
+
+        def fail_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise DatabaseError
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(TestModelRecord, "bulk_create", side_effect=fail_once):
+            [instance] = SerializerNode.bulk_save([node], atomic=False)
+
+        self.assertEqual(node.errors, {})
+        self.assertEqual(instance, self.instance)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.tests, 3)
+        records = TestModelRecord.objects.filter(link=self.instance)
+        self.assertEqual(sorted(records.values_list("test_id", flat=True)), [1, 2, 3])
+        self.assertEqual(records.get(test_id=1).test_result, "retried")
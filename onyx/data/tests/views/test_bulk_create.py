@@ -0,0 +1,186 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+from ..utils import OnyxTestCase, generate_test_data
+from data.models import Anonymiser
+from projects.testproject.models import TestModel, TestModelRecord
+
+
+class TestBulkCreateView(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.bulk", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def test_basic(self):
+        """
+        Test bulk creation of records.
+        """
+
+        payload = generate_test_data(n=20, nested=True)
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()["data"]), len(payload))
+        self.assertEqual(TestModel.objects.count(), len(payload))
+        self.assertEqual(TestModel.history.count(), len(payload))  # type: ignore
+        self.assertEqual(TestModelRecord.objects.count(), 2 * len(payload))
+        self.assertEqual(
+            TestModelRecord.history.count(), 2 * len(payload)  # type: ignore
+        )
+
+        for data, result in zip(payload, response.json()["data"]):
+            instance = TestModel.objects.get(climb_id=result["climb_id"])
+            self.assertEqual(instance.sample_id, result["sample_id"])
+            self.assertEqual(instance.run_name, result["run_name"])
+            self.assertIsNotNone(instance.published_date)
+
+            self.assertEqual(instance.tests, data["tests"])
+            self.assertEqual(instance.score, data["score"])
+            self.assertEqual(instance.records.count(), len(data["records"]))
+
+    def test_test(self):
+        """
+        Test the test bulk creation of records.
+        """
+
+        payload = generate_test_data(n=10)
+        response = self.client.post(
+            reverse("project.testproject.test.bulk", kwargs={"code": "testproject"}),
+            data=payload,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["data"], [])
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_bad_request(self):
+        """
+        Test that a request body that is not a list of objects fails.
+        """
+
+        for payload in [{}, [], ["hi"], [[]], generate_test_data(n=1)[0]]:
+            response = self.client.post(self.endpoint, data=payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            self.endpoint + "?atomic=hi", data=generate_test_data(n=1)
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_unknown_field(self):
+        """
+        Test that bulk creation with an unknown field fails.
+        """
+
+        payload = generate_test_data(n=5)
+        payload[3]["hello"] = "world"
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("hello", response.json()["messages"])
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_invalid(self):
+        """
+        Test that bulk creation with an invalid record fails, with errors for the invalid record.
+        """
+
+        payload = generate_test_data(n=5)
+        payload[2]["tests"] = "hello"
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["2"])
+        self.assertIn("tests", response.json()["messages"]["2"])
+        self.assertEqual(TestModel.objects.count(), 0)
+
+    def test_unique_together(self):
+        """
+        Test that bulk creation fails for records that are not unique.
+        """
+
+        payload = generate_test_data(n=5)
+
+        # Duplicate within the batch
+        payload[4]["sample_id"] = payload[1]["sample_id"]
+        payload[4]["run_name"] = payload[1]["run_name"]
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["4"])
+        self.assertEqual(TestModel.objects.count(), 0)
+
+        # Duplicate of an existing record
+        response = self.client.post(self.endpoint, data=payload[:2])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.endpoint, data=payload[1:4])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["0"])
+        self.assertEqual(TestModel.objects.count(), 2)
+
+    def test_anonymisation(self):
+        """
+        Test that anonymised fields are allocated consistently across a batch, and with existing identifiers.
+        """
+
+        payload = generate_test_data(n=4)
+        for i, data in enumerate(payload):
+            data["run_name"] = f"run-{i}"
+
+        # Records that share a sample_id within the batch share its identifier
+        payload[1]["sample_id"] = payload[0]["sample_id"]
+        response = self.client.post(self.endpoint, data=payload[:3])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()["data"]
+        self.assertEqual(results[0]["sample_id"], results[1]["sample_id"])
+        self.assertNotEqual(results[0]["sample_id"], results[2]["sample_id"])
+        self.assertEqual(Anonymiser.objects.filter(field="sample_id").count(), 2)
+
+        # A record that shares a sample_id with an existing record reuses its identifier
+        payload[3]["sample_id"] = payload[2]["sample_id"]
+        response = self.client.post(self.endpoint, data=payload[3:])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.json()["data"][0]["sample_id"], results[2]["sample_id"]
+        )
+        self.assertEqual(Anonymiser.objects.filter(field="sample_id").count(), 2)
+
+    def test_non_atomic(self):
+        """
+        Test that non-atomic bulk creation creates the valid records, and returns errors for the invalid records.
+        """
+
+        payload = generate_test_data(n=5, nested=True)
+        payload[1]["tests"] = "hello"
+        payload[3]["sample_id"] = payload[0]["sample_id"]
+        payload[3]["run_name"] = payload[0]["run_name"]
+        response = self.client.post(self.endpoint + "?atomic=false", data=payload)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+
+        results = response.json()["data"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["success", "fail", "success", "fail", "success"],
+        )
+        self.assertIn("tests", results[1]["messages"])
+        self.assertIn("non_field_errors", results[3]["messages"])
+        self.assertEqual(TestModel.objects.count(), 3)
+        self.assertEqual(TestModelRecord.objects.count(), 6)
+
+        for result in results:
+            if result["status"] == "success":
+                self.assertTrue(
+                    TestModel.objects.filter(
+                        climb_id=result["data"]["climb_id"]
+                    ).exists()
+                )
+
+        # If every record succeeds, the response indicates creation
+        response = self.client.post(
+            self.endpoint + "?atomic=false", data=generate_test_data(n=2)[1:]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
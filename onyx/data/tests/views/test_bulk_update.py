@@ -0,0 +1,126 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+from ..utils import OnyxTestCase, generate_test_data
+from projects.testproject.models import TestModel
+
+
+class TestBulkUpdateView(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions and create test records.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.update", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+        response = self.client.post(
+            reverse("project.testproject.bulk", kwargs={"code": "testproject"}),
+            data=generate_test_data(n=20),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_basic(self):
+        """
+        Test updating all records that match a query.
+        """
+
+        climb_ids = set(
+            TestModel.objects.filter(country="eng").values_list("climb_id", flat=True)
+        )
+        history_count = TestModel.history.count()  # type: ignore
+        response = self.client.patch(
+            self.endpoint,
+            data={"query": {"country": "eng"}, "update": {"text_option_2": "updated"}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], len(climb_ids))
+        self.assertEqual(set(response.json()["data"]["climb_ids"]), climb_ids)
+        self.assertEqual(
+            set(
+                TestModel.objects.filter(text_option_2="updated").values_list(
+                    "climb_id", flat=True
+                )
+            ),
+            climb_ids,
+        )
+        self.assertEqual(
+            TestModel.history.count(), history_count + len(climb_ids)  # type: ignore
+        )
+
+        # Records that would not change are not updated
+        response = self.client.patch(
+            self.endpoint,
+            data={"query": {"country": "eng"}, "update": {"text_option_2": "updated"}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], 0)
+
+    def test_test(self):
+        """
+        Test the test update of records that match a query.
+        """
+
+        count = TestModel.objects.filter(tests=2).count()
+        response = self.client.patch(
+            reverse("project.testproject.test.update", kwargs={"code": "testproject"}),
+            data={"query": {"tests": 2}, "update": {"text_option_2": "updated"}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], count)
+        self.assertEqual(TestModel.objects.filter(text_option_2="updated").count(), 0)
+
+    def test_bad_request(self):
+        """
+        Test that a request without a query or updates fails.
+        """
+
+        for data in [
+            {},
+            {"query": {"country": "eng"}},
+            {"update": {"tests": 3}},
+            {"query": {}, "update": {"tests": 3}},
+        ]:
+            response = self.client.patch(self.endpoint, data=data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_disallowed_fields(self):
+        """
+        Test that identifying and nested fields cannot be updated in bulk.
+        """
+
+        for update in [
+            {"climb_id": "C-0123456789"},
+            {"sample_id": "sample"},
+            {"records": []},
+            {"hello": "world"},
+        ]:
+            response = self.client.patch(
+                self.endpoint, data={"query": {"tests": 2}, "update": update}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid(self):
+        """
+        Test that no records are updated if the update is invalid for any of them.
+        """
+
+        # An invalid value
+        response = self.client.patch(
+            self.endpoint, data={"query": {"tests": 2}, "update": {"tests": "hi"}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # A value that is invalid when combined with existing values
+        response = self.client.patch(
+            self.endpoint, data={"query": {"tests": 2}, "update": {"start": 100}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(response.json()["messages"].keys()),
+            set(TestModel.objects.values_list("climb_id", flat=True)),
+        )
+        self.assertFalse(TestModel.objects.filter(start=100).exists())
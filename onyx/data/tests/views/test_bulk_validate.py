@@ -0,0 +1,174 @@
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from ..utils import OnyxTestCase, generate_test_data
+from data import bulk
+from data.models import Anonymiser
+from projects.testproject.models import TestModel
+
+
+@override_settings(BULK_VALIDATION={"CHUNK_SIZE": 2})
+class TestBulkValidateView(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.test.validate", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def get_results(self, response) -> list[dict]:
+        """
+        Get the results of a streamed validation response.
+        """
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_basic(self):
+        """
+        Test bulk validation of records, in chunks.
+        """
+
+        payload = generate_test_data(n=7, nested=True)
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = self.get_results(response)
+        self.assertEqual([result["index"] for result in results], list(range(7)))
+        self.assertTrue(all(result["status"] == "success" for result in results))
+        self.assertEqual(TestModel.objects.count(), 0)
+        self.assertEqual(Anonymiser.objects.count(), 0)
+
+    def test_invalid(self):
+        """
+        Test that bulk validation returns errors for each invalid record.
+        """
+
+        payload = generate_test_data(n=5)
+        payload[1]["tests"] = "hello"
+        payload[4]["country"] = "hello"
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = self.get_results(response)
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["success", "fail", "success", "success", "fail"],
+        )
+        self.assertIn("tests", results[1]["messages"])
+        self.assertIn("country", results[4]["messages"])
+
+    def test_unique_together(self):
+        """
+        Test that bulk validation detects records that are not unique, across chunks and with existing records.
+        """
+
+        payload = generate_test_data(n=5)
+        for i, data in enumerate(payload):
+            data["run_name"] = f"run-{i}"
+
+        # Create a record, which the last record duplicates
+        response = self.client.post(
+            reverse("project.testproject", kwargs={"code": "testproject"}),
+            data=payload[0],
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payload[4]["sample_id"] = payload[0]["sample_id"]
+        payload[4]["run_name"] = payload[0]["run_name"]
+
+        # The fourth record duplicates the second, which is in an earlier chunk
+        payload[3]["sample_id"] = payload[1]["sample_id"]
+        payload[3]["run_name"] = payload[1]["run_name"]
+
+        response = self.client.post(self.endpoint, data=payload[1:])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = self.get_results(response)
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["success", "success", "fail", "fail"],
+        )
+        self.assertIn("non_field_errors", results[2]["messages"])
+        self.assertIn("non_field_errors", results[3]["messages"])
+        self.assertEqual(TestModel.objects.count(), 1)
+        self.assertEqual(Anonymiser.objects.count(), 2)
+
+    def test_chunk_error(self):
+        """
+        Test that a chunk failing to validate gives an error for each of its records, without ending the stream.
+        """
+
+        validate_chunk = bulk.validate_chunk
+
+        def fail_chunk(serializer_class, chunk, context):
+            if chunk[0][0] == 2:
+                raise RuntimeError("Chunk failed.")
+            return validate_chunk(serializer_class, chunk, context)
+
+        payload = generate_test_data(n=5)
+        with (
+            mock.patch("data.bulk.validate_chunk", side_effect=fail_chunk),
+            mock.patch.object(bulk.logger, "exception") as exception,
+        ):
+            response = self.client.post(self.endpoint, data=payload)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results = self.get_results(response)
+
+        exception.assert_called_once()
+        self.assertEqual([result["index"] for result in results], list(range(5)))
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["success", "success", "error", "error", "success"],
+        )
+        self.assertEqual(results[2]["code"], status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn("non_field_errors", results[3]["messages"])
+
+    def test_bad_request(self):
+        """
+        Test that a request body that is not a list of objects, or has unknown fields, fails.
+        """
+
+        for payload in [{}, [], ["hi"], [[]], [{"hello": "world"}]]:
+            response = self.client.post(self.endpoint, data=payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_command(self):
+        """
+        Test bulk validation of a file of records using the validate command.
+        """
+
+        payload = generate_test_data(n=5)
+        payload[2]["tests"] = "hello"
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            json.dump(payload, file)
+            file.flush()
+
+            stdout = StringIO()
+            call_command(
+                "validate",
+                "testproject",
+                file.name,
+                user=self.user.username,
+                errors_only=True,
+                quiet=True,
+                stdout=stdout,
+            )
+
+        results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["index"], 2)
+        self.assertIn("tests", results[0]["messages"])
+        self.assertEqual(TestModel.objects.count(), 0)
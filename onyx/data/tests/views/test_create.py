@@ -1,12 +1,17 @@
 import copy
+import uuid
 from datetime import datetime, timedelta
+from django.core.management import call_command
+from django.db.models import F
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.serializers import BooleanField
 from ..utils import OnyxTestCase, _test_record
+from data.models import Project, Choice, IdempotencyKey
+from data.validators import invalidate_choice_constraint_graph
 from projects.testproject.models import TestModel, TestModelRecord
 
-
 # TODO:
 # - Required field tests (i.e. no None/"" values)
 # - Investigate IntegerField/FloatField different handling of True/False
@@ -446,6 +451,161 @@ class TestCreateView(OnyxTestCase):
         assert TestModel.objects.count() == 0
         assert TestModelRecord.objects.count() == 0
 
+    def test_choice_constraint_invalidation(self):
+        """
+        Test that choice constraints are recompiled after they are invalidated.
+        """
+
+        # Compile the constraints, by creating a valid record
+        payload = copy.deepcopy(default_payload)
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Remove the constraints between the country and region choices
+        for choice in Choice.objects.filter(project_id="testproject", field="country"):
+            choice.constraints.clear()
+            choice.reverse_constraints.clear()
+
+        # The compiled constraints are still in use, so the choices are compatible
+        payload["sample_id"] = "sample-2"
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Once invalidated, the choices are incompatible
+        invalidate_choice_constraint_graph("testproject")
+        payload["sample_id"] = "sample-3"
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        assert TestModel.objects.count() == 2
+
+        # An invalidation by another process is seen through the version in the database
+        regions = Choice.objects.filter(project_id="testproject", field="region")
+        for choice in Choice.objects.filter(project_id="testproject", field="country"):
+            choice.constraints.add(*regions)
+            choice.reverse_constraints.add(*regions)
+        Project.objects.filter(code="testproject").update(
+            choice_constraints_version=F("choice_constraints_version") + 1
+        )
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(DEFERRED_HISTORY={"ENABLED": True, "BATCH_SIZE": 500})
+    def test_deferred_history(self):
+        """
+        Test that deferred historical records are created for a record and its nested records.
+        """
+
+        payload = copy.deepcopy(default_payload)
+        response = self.client.post(self.endpoint, data=payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        instance = TestModel.objects.get(climb_id=response.json()["data"]["climb_id"])
+        self.assertEqual(instance.history.count(), 1)  # type: ignore
+        self.assertEqual(
+            TestModelRecord.history.filter(link=instance).count(),  # type: ignore
+            len(payload["records"]),
+        )
+        self.assertEqual(instance.history.first().tests, payload["tests"])  # type: ignore
+
+    def test_idempotency(self):
+        """
+        Test that a repeated create with the same Idempotency-Key replays the first response.
+        """
+
+        key = uuid.uuid4().hex
+
+        # A failed request does not store its response
+        payload = copy.deepcopy(default_payload)
+        payload["tests"] = "hello"
+        response = self.client.post(
+            self.endpoint, data=payload, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        payload = copy.deepcopy(default_payload)
+        response = self.client.post(
+            self.endpoint, data=payload, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        climb_id = response.json()["data"]["climb_id"]
+
+        # Repeats with the same key are replayed, without creating another record
+        response = self.client.post(
+            self.endpoint, data=payload, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(response.json()["data"]["climb_id"], climb_id)
+        self.assertEqual(TestModel.objects.count(), 1)
+
+        # Reusing the key for a different request fails
+        payload["tests"] = 3
+        response = self.client.post(
+            self.endpoint, data=payload, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(TestModel.objects.count(), 1)
+
+    def test_idempotency_across_caches(self):
+        """
+        Test that a repeated create is replayed when the requests are handled with separate caches (e.g. by different workers).
+        """
+
+        key = uuid.uuid4().hex
+        payload = copy.deepcopy(default_payload)
+
+        responses = []
+        for location in ["worker-1", "worker-2"]:
+            with override_settings(
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": location,
+                    }
+                }
+            ):
+                responses.append(
+                    self.client.post(
+                        self.endpoint, data=payload, headers={"Idempotency-Key": key}
+                    )
+                )
+
+        self.assertEqual(responses[0].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(responses[1].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(responses[1]["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            responses[1].json()["data"]["climb_id"],
+            responses[0].json()["data"]["climb_id"],
+        )
+        self.assertEqual(TestModel.objects.count(), 1)
+
+    def test_idempotency_expiry(self):
+        """
+        Test that an expired Idempotency-Key can be used again, and that expired keys are removed.
+        """
+
+        key = uuid.uuid4().hex
+        payload = copy.deepcopy(default_payload)
+
+        with override_settings(IDEMPOTENCY={"TTL": 0, "LOCK_TIMEOUT": 60}):
+            response = self.client.post(
+                self.endpoint, data=payload, headers={"Idempotency-Key": key}
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            # The key has expired, so the request is not replayed
+            payload["run_name"] = "run-expired"
+            response = self.client.post(
+                self.endpoint, data=payload, headers={"Idempotency-Key": key}
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(response.has_header("Idempotent-Replayed"))
+            self.assertEqual(TestModel.objects.count(), 2)
+
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        call_command("idempotency", quiet=True)
+        self.assertEqual(IdempotencyKey.objects.count(), 0)
+
     def test_nested_choice_constraint(self):
         """
         Test that a payload which violates a nested choice constraint fails.
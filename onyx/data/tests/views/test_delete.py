@@ -1,7 +1,7 @@
 from rest_framework import status
 from rest_framework.reverse import reverse
 from ..utils import OnyxTestCase, generate_test_data
-from projects.testproject.models import TestModel
+from projects.testproject.models import TestModel, TestModelRecord
 
 
 # TODO: Tests for delete endpoint
@@ -34,3 +34,92 @@ class TestDeleteView(OnyxTestCase):
         response = self.client.delete(self.endpoint(self.climb_id))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(TestModel.objects.filter(climb_id=self.climb_id).exists())
+
+
+class TestBulkDeleteView(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions and create test records.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.delete", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+        response = self.client.post(
+            reverse("project.testproject.bulk", kwargs={"code": "testproject"}),
+            data=generate_test_data(n=20, nested=True),
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_query(self):
+        """
+        Test deletion of records that match a query, along with their nested records.
+        """
+
+        climb_ids = set(
+            TestModel.objects.filter(country="eng").values_list("climb_id", flat=True)
+        )
+        response = self.client.post(self.endpoint, data={"query": {"country": "eng"}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], len(climb_ids))
+        self.assertEqual(
+            {result["climb_id"] for result in response.json()["data"]["deleted"]},
+            climb_ids,
+        )
+        self.assertFalse(TestModel.objects.filter(climb_id__in=climb_ids).exists())
+        self.assertEqual(TestModel.objects.count(), 20 - len(climb_ids))
+        self.assertEqual(TestModelRecord.objects.count(), 2 * (20 - len(climb_ids)))
+
+        # A historical record is created for each deletion
+        self.assertEqual(
+            TestModel.history.filter(history_type="-").count(),  # type: ignore
+            len(climb_ids),
+        )
+        self.assertEqual(
+            TestModelRecord.history.filter(history_type="-").count(),  # type: ignore
+            2 * len(climb_ids),
+        )
+
+    def test_climb_ids(self):
+        """
+        Test deletion of records from a list of CLIMB IDs.
+        """
+
+        climb_ids = list(TestModel.objects.values_list("climb_id", flat=True)[:5])
+        response = self.client.post(self.endpoint, data={"climb_ids": climb_ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], 5)
+        self.assertEqual(TestModel.objects.count(), 15)
+
+    def test_dry_run(self):
+        """
+        Test that a dry run returns the records that would be deleted, without deleting them.
+        """
+
+        response = self.client.post(
+            self.endpoint + "?dry_run=true", data={"query": {"tests": 2}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["count"], 20)
+        self.assertEqual(TestModel.objects.count(), 20)
+
+    def test_bad_request(self):
+        """
+        Test that a request without exactly one of a query or a list of CLIMB IDs fails.
+        """
+
+        for data in [
+            {},
+            {"query": {"tests": 2}, "climb_ids": ["C-0123456789"]},
+            {"query": {}},
+            {"climb_ids": []},
+            {"query": {"hello": "world"}},
+        ]:
+            response = self.client.post(self.endpoint, data=data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(TestModel.objects.count(), 20)
@@ -490,3 +490,43 @@ class TestFilterView(OnyxTestCase):
 
         response = self.client.get(self.endpoint, data={"records": 1})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_relation_filter_nested(self):
+        """
+        Test filtering a relation field, with the nested records also filtered.
+        """
+
+        response = self.client.get(
+            self.endpoint, data={"records__test_pass": True, "filter_nested": True}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqualClimbIDs(
+            response.json()["data"],
+            TestModel.objects.filter(records__test_pass=True),
+        )
+        for record in response.json()["data"]:
+            self.assertTrue(record["records"])
+            self.assertTrue(all(r["test_pass"] for r in record["records"]))
+
+        # Without filter_nested, all nested records are returned
+        response = self.client.get(self.endpoint, data={"records__test_pass": True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sum(len(record["records"]) for record in response.json()["data"]),
+            sum(
+                instance.records.count()
+                for instance in TestModel.objects.filter(
+                    records__test_pass=True
+                ).distinct()
+            ),
+        )
+
+    def test_relation_filter_nested_invalid(self):
+        """
+        Test that an invalid filter_nested value fails.
+        """
+
+        response = self.client.get(
+            self.endpoint, data={"records__test_pass": True, "filter_nested": "hi"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,8 @@
+from django.db.models import Q
 from rest_framework import status
 from rest_framework.reverse import reverse
 from ..utils import OnyxTestCase, generate_test_data
+from projects.testproject.models import TestModel, TestModelRecord
 
 
 # TODO: Tests for query endpoint
@@ -25,3 +27,113 @@ class TestQueryView(OnyxTestCase):
                 data=payload,
             )
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def assertNestedRecords(self, response, qs, predicate):
+        """
+        Assert that the parents in the response match the queryset, and that each parent
+        has exactly the nested records that satisfy the `predicate`.
+        """
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(record["climb_id"] for record in response.json()["data"]),
+            sorted(qs.distinct().values_list("climb_id", flat=True)),
+        )
+        for record in response.json()["data"]:
+            self.assertEqual(
+                sorted(r["test_id"] for r in record["records"]),
+                sorted(
+                    r.test_id
+                    for r in TestModelRecord.objects.filter(
+                        link__climb_id=record["climb_id"]
+                    )
+                    if predicate(r)
+                ),
+            )
+
+    def test_filter_nested(self):
+        """
+        Test querying with the nested records also filtered.
+        """
+
+        endpoint = self.endpoint + "?filter_nested=true"
+
+        # Nested records are filtered by the parts of the query that apply to them
+        response = self.client.post(
+            endpoint,
+            data={
+                "&": [
+                    {"records__test_pass": True},
+                    {"|": [{"records__test_id": 1}, {"records__score_b__gt": 21}]},
+                ]
+            },
+        )
+        self.assertNestedRecords(
+            response,
+            TestModel.objects.filter(
+                Q(records__test_pass=True)
+                & (Q(records__test_id=1) | Q(records__score_b__gt=21))
+            ),
+            lambda r: r.test_pass
+            and (r.test_id == 1 or (r.score_b is not None and r.score_b > 21)),
+        )
+        for record in response.json()["data"]:
+            self.assertTrue(record["records"])
+
+        response = self.client.post(
+            endpoint,
+            data={
+                "|": [
+                    {"&": [{"records__test_pass": True}, {"records__test_id": 1}]},
+                    {"&": [{"records__test_pass": False}, {"records__test_id": 2}]},
+                ]
+            },
+        )
+        self.assertNestedRecords(
+            response,
+            TestModel.objects.filter(
+                Q(records__test_pass=True, records__test_id=1)
+                | Q(records__test_pass=False, records__test_id=2)
+            ),
+            lambda r: (r.test_pass and r.test_id == 1)
+            or (not r.test_pass and r.test_id == 2),
+        )
+
+        # Parent instances without any matching nested records are returned with an empty list
+        payload = generate_test_data(n=1)[0]
+        payload["sample_id"] = "sample-no-records"
+        payload.pop("records", None)
+        response = self.client.post(
+            reverse("project.testproject", kwargs={"code": "testproject"}),
+            data=payload,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        climb_id = response.json()["data"]["climb_id"]
+
+        response = self.client.post(
+            endpoint,
+            data={"~": {"records__test_pass": True}},
+        )
+        self.assertNestedRecords(
+            response,
+            TestModel.objects.filter(~Q(records__test_pass=True)),
+            lambda r: not r.test_pass,
+        )
+        [record] = [
+            record
+            for record in response.json()["data"]
+            if record["climb_id"] == climb_id
+        ]
+        self.assertEqual(record["records"], [])
+
+        # Parent instances matched by parts of the query that do not apply
+        # to the nested records have all of their nested records returned
+        response = self.client.post(
+            endpoint,
+            data={"|": [{"records__test_pass": True}, {"tests": 2}]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sum(len(record["records"]) for record in response.json()["data"]),
+            TestModelRecord.objects.count(),
+        )
@@ -1,7 +1,8 @@
+import uuid
 from rest_framework import status
 from rest_framework.reverse import reverse
 from ..utils import OnyxTestCase, generate_test_data
-from projects.testproject.models import TestModel
+from projects.testproject.models import TestModel, TestModelRecord
 
 
 # TODO: Tests for update endpoint
@@ -45,6 +46,138 @@ class TestUpdateView(OnyxTestCase):
             updated_instance.text_option_2, updated_values["text_option_2"]
         )
 
+    def test_no_op(self):
+        """
+        Test that an update which changes nothing does not write to the record or its history.
+        """
+
+        instance = TestModel.objects.get(climb_id=self.climb_id)
+        history_count = TestModel.history.count()  # type: ignore
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={"tests": instance.tests, "text_option_2": instance.text_option_2},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updated_instance = TestModel.objects.get(climb_id=self.climb_id)
+        self.assertEqual(updated_instance.last_modified, instance.last_modified)
+        self.assertEqual(TestModel.history.count(), history_count)  # type: ignore
+
+        # Only a changed field results in a write
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={"tests": instance.tests + 1, "text_option_2": instance.text_option_2},  # type: ignore
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updated_instance = TestModel.objects.get(climb_id=self.climb_id)
+        self.assertEqual(updated_instance.tests, instance.tests + 1)  # type: ignore
+        self.assertGreater(updated_instance.last_modified, instance.last_modified)
+        self.assertEqual(TestModel.history.count(), history_count + 1)  # type: ignore
+
+    def test_if_match(self):
+        """
+        Test that an update with an If-Match header is rejected if the record has been modified.
+        """
+
+        response = self.client.get(self.endpoint(self.climb_id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        instance = TestModel.objects.get(climb_id=self.climb_id)
+
+        # The current version is matched
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={"tests": instance.tests + 1},  # type: ignore
+            headers={"If-Match": etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        new_etag = response["ETag"]
+
+        # The previous version is stale
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={"tests": instance.tests + 2},  # type: ignore
+            headers={"If-Match": etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        updated_instance = TestModel.objects.get(climb_id=self.climb_id)
+        self.assertEqual(updated_instance.tests, instance.tests + 1)  # type: ignore
+
+        # A wildcard matches any version
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={"tests": instance.tests + 2},  # type: ignore
+            headers={"If-Match": "*"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # A conditional update fails if the record is modified after it was retrieved
+        self.assertFalse(updated_instance.touch_if_unmodified(instance.last_modified))
+        self.assertNotEqual(response["ETag"], new_etag)
+
+    def test_idempotency(self):
+        """
+        Test that a repeated update with the same Idempotency-Key replays the first response.
+        """
+
+        key = uuid.uuid4().hex
+        instance = TestModel.objects.get(climb_id=self.climb_id)
+        history_count = instance.history.count()  # type: ignore
+        data = {"tests": instance.tests + 1}  # type: ignore
+
+        response = self.client.patch(
+            self.endpoint(self.climb_id), data=data, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        response = self.client.patch(
+            self.endpoint(self.climb_id), data=data, headers={"Idempotency-Key": key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["data"]["climb_id"], self.climb_id)
+        self.assertEqual(instance.history.count(), history_count + 1)  # type: ignore
+
+    def test_nested(self):
+        """
+        Test update of existing nested records, alongside creation of a new nested record.
+        """
+
+        records = generate_test_data(n=1, nested=True)[0]["records"]
+        response = self.client.patch(
+            self.endpoint(self.climb_id), data={"records": records}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        new_record = dict(records[0], test_id=3)
+        history_count = TestModelRecord.history.count()  # type: ignore
+        response = self.client.patch(
+            self.endpoint(self.climb_id),
+            data={
+                "records": [
+                    {"test_id": 1, "test_result": "updated"},
+                    {"test_id": 2, "test_result": "updated"},
+                    new_record,
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        instance = TestModel.objects.get(climb_id=self.climb_id)
+        self.assertEqual(instance.records.count(), 3)
+        self.assertEqual(
+            sorted(instance.records.values_list("test_id", "test_result")),
+            [(1, "updated"), (2, "updated"), (3, new_record["test_result"])],
+        )
+
+        # A historical record is created for each updated and created nested record
+        history = TestModelRecord.history.order_by("history_id")[history_count:]  # type: ignore
+        self.assertEqual(
+            sorted(history.values_list("test_id", "history_type")),
+            [(1, "~"), (2, "~"), (3, "+")],
+        )
+
     def test_basic_test(self):
         """
         Test the test update of a record by CLIMB ID.
@@ -0,0 +1,142 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+from ..utils import OnyxTestCase, generate_test_data
+from data.models import Anonymiser
+from projects.testproject.models import TestModel, TestModelRecord
+
+
+class TestUpsertView(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.upsert", kwargs={"code": "testproject"}
+        )
+        self.bulk_endpoint = reverse(
+            "project.testproject.bulk.upsert", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+        self.payload = generate_test_data(n=4, nested=True)
+        for i, data in enumerate(self.payload):
+            data["run_name"] = f"run-{i}"
+
+    def test_basic(self):
+        """
+        Test that an upsert creates a record, and then updates it.
+        """
+
+        response = self.client.post(self.endpoint, data=self.payload[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        climb_id = response.json()["data"]["climb_id"]
+        self.assertEqual(TestModel.objects.count(), 1)
+
+        data = dict(self.payload[0])
+        data["tests"] = data["tests"] + 1
+        data["records"] = [{"test_id": 1, "test_result": "updated"}]
+        response = self.client.post(self.endpoint, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["climb_id"], climb_id)
+
+        instance = TestModel.objects.get(climb_id=climb_id)
+        self.assertEqual(TestModel.objects.count(), 1)
+        self.assertEqual(instance.tests, data["tests"])
+        self.assertEqual(instance.records.get(test_id=1).test_result, "updated")
+        self.assertEqual(instance.history.count(), 2)  # type: ignore
+        self.assertEqual(Anonymiser.objects.filter(field="sample_id").count(), 1)
+
+    def test_bulk(self):
+        """
+        Test that a bulk upsert creates and updates records in one request.
+        """
+
+        response = self.client.post(self.bulk_endpoint, data=self.payload[:2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["data"]
+        self.assertEqual([result["code"] for result in results], [201, 201])
+
+        self.payload[1]["tests"] = self.payload[1]["tests"] + 1
+        response = self.client.post(self.bulk_endpoint, data=self.payload[1:])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updated = response.json()["data"]
+        self.assertEqual([result["code"] for result in updated], [200, 201, 201])
+        self.assertEqual(updated[0]["data"]["climb_id"], results[1]["data"]["climb_id"])
+        self.assertEqual(
+            TestModel.objects.get(climb_id=results[1]["data"]["climb_id"]).tests,
+            self.payload[1]["tests"],
+        )
+        self.assertEqual(TestModel.objects.count(), 4)
+        self.assertEqual(TestModelRecord.objects.count(), 8)
+
+    def test_invalid(self):
+        """
+        Test that a bulk upsert with an invalid record fails, without creating or updating any records.
+        """
+
+        response = self.client.post(self.endpoint, data=self.payload[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        instance = TestModel.objects.get()
+
+        self.payload[0]["tests"] = "hello"
+        response = self.client.post(self.bulk_endpoint, data=self.payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["0"])
+        self.assertIn("tests", response.json()["messages"]["0"])
+        self.assertEqual(TestModel.objects.count(), 1)
+        self.assertEqual(TestModel.objects.get().last_modified, instance.last_modified)
+
+        # A single upsert returns the errors of the record without an index
+        response = self.client.post(self.endpoint, data=self.payload[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tests", response.json()["messages"])
+
+    def test_identifiers(self):
+        """
+        Test that upserts require the identifiers, and that these are unique within a batch.
+        """
+
+        data = dict(self.payload[0])
+        data.pop("run_name")
+        response = self.client.post(self.endpoint, data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("run_name", response.json()["messages"])
+
+        # Records created within the batch
+        self.payload[1]["sample_id"] = self.payload[0]["sample_id"]
+        self.payload[1]["run_name"] = self.payload[0]["run_name"]
+        response = self.client.post(self.bulk_endpoint, data=self.payload[:2])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["1"])
+
+        # Records updated within the batch
+        response = self.client.post(self.endpoint, data=self.payload[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.bulk_endpoint, data=self.payload[:2])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["messages"].keys()), ["1"])
+        self.assertEqual(TestModel.objects.count(), 1)
+
+    def test_non_scalar_identifiers(self):
+        """
+        Test that upserts reject identifiers that are lists or objects.
+        """
+
+        for value in [["a"], {"a": "b"}]:
+            data = dict(self.payload[0])
+            data["sample_id"] = value
+            response = self.client.post(self.endpoint, data=data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("sample_id", response.json()["messages"])
+
+            response = self.client.post(
+                self.bulk_endpoint, data=[self.payload[1], data]
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(list(response.json()["messages"].keys()), ["1"])
+            self.assertIn("sample_id", response.json()["messages"]["1"])
+
+        self.assertEqual(TestModel.objects.count(), 0)
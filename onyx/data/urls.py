@@ -3,7 +3,6 @@ from django.urls.resolvers import URLPattern
 from . import views
 from .serializers import ProjectRecordSerializer
 
-
 urlpatterns = [
     path(
         "",
@@ -42,6 +41,36 @@ def generate_project_urls(
             name=f"project.{code}.climb_id",
             kwargs={"code": code, "serializer_class": serializer_class},
         ),
+        re_path(
+            r"^bulk/$",
+            views.ProjectRecordsViewSet.as_view({"post": "bulk_create"}),
+            name=f"project.{code}.bulk",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
+        re_path(
+            r"^upsert/$",
+            views.ProjectRecordsViewSet.as_view({"post": "upsert"}),
+            name=f"project.{code}.upsert",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
+        re_path(
+            r"^bulk/upsert/$",
+            views.ProjectRecordsViewSet.as_view({"post": "bulk_upsert"}),
+            name=f"project.{code}.bulk.upsert",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
+        re_path(
+            r"^update/$",
+            views.ProjectRecordsViewSet.as_view({"patch": "bulk_update"}),
+            name=f"project.{code}.update",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
+        re_path(
+            r"^delete/$",
+            views.ProjectRecordsViewSet.as_view({"post": "bulk_destroy"}),
+            name=f"project.{code}.delete",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
         re_path(
             r"^test/$",
             views.ProjectRecordsViewSet.as_view({"post": "create"}),
@@ -54,6 +83,24 @@ def generate_project_urls(
             name=f"project.{code}.test.climb_id",
             kwargs={"code": code, "serializer_class": serializer_class, "test": True},
         ),
+        re_path(
+            r"^test/bulk/$",
+            views.ProjectRecordsViewSet.as_view({"post": "bulk_create"}),
+            name=f"project.{code}.test.bulk",
+            kwargs={"code": code, "serializer_class": serializer_class, "test": True},
+        ),
+        re_path(
+            r"^test/validate/$",
+            views.ProjectRecordsViewSet.as_view({"post": "bulk_validate"}),
+            name=f"project.{code}.test.validate",
+            kwargs={"code": code, "serializer_class": serializer_class},
+        ),
+        re_path(
+            r"^test/update/$",
+            views.ProjectRecordsViewSet.as_view({"patch": "bulk_update"}),
+            name=f"project.{code}.test.update",
+            kwargs={"code": code, "serializer_class": serializer_class, "test": True},
+        ),
         re_path(
             r"^query/$",
             views.ProjectRecordsViewSet.as_view({"post": "list"}),
@@ -1,11 +1,25 @@
 from typing import Any
+from django.core.signals import request_started
 from django.db import models
+from django.db.models import F
+from django.dispatch import receiver
 from datetime import datetime
-from .models import Choice
-
+from .models import Project, Choice
 
 EMPTY_VALUES = [None, ""]
 
+# Compiled choice constraint graphs, cached for each project within the process
+# Each graph is stored with the version it was compiled for
+_choice_constraint_graphs: dict[str, tuple[int, dict]] = {}
+
+# Versions of the choice constraints of each project, read from the database at most once per request
+_choice_constraints_versions: dict[str, int] = {}
+
+
+@receiver(request_started)
+def clear_choice_constraints_versions(**kwargs):
+    _choice_constraints_versions.clear()
+
 
 # TODO: Move validator logic into DRF class-based validator format
 # Then they can be attached to serializers in a more standard way
@@ -125,6 +139,99 @@ def validate_identifiers(
             errors.setdefault(identifier, []).append("This field is required.")
 
 
+def get_choice_constraints_version(project: str) -> int | None:
+    """
+    Get the version of the choice constraints of a `project`.
+
+    The version is read from the database once per request (and then reused within the request),
+    so that changes made by other processes are seen by the next request.
+    """
+
+    if project not in _choice_constraints_versions:
+        _choice_constraints_versions[project] = (
+            Project.objects.filter(code=project)
+            .values_list("choice_constraints_version", flat=True)
+            .first()
+        )
+
+    return _choice_constraints_versions[project]
+
+
+def invalidate_choice_constraint_graph(project: str) -> None:
+    """
+    Invalidate the compiled choice constraint graph of a `project`.
+
+    This increments the version of the choice constraints in the database,
+    so that any process holding a compiled graph for the old version recompiles it.
+    """
+
+    Project.objects.filter(code=project).update(
+        choice_constraints_version=F("choice_constraints_version") + 1
+    )
+    _choice_constraints_versions.pop(project, None)
+    _choice_constraint_graphs.pop(project, None)
+
+
+def compile_choice_constraint_graph(
+    project: str,
+) -> dict[tuple[str, str], frozenset[tuple[str, str]]]:
+    """
+    Compile the choice constraints of a `project` into a graph, using a single query.
+
+    Args:
+        project: The code of the project.
+
+    Returns:
+        Dictionary mapping each `(field_x, field_y)` pair to the set of `(choice_x, choice_y)` pairs that are allowed to occur together.
+    """
+
+    # Each constraint is stored as an edge from one choice to another
+    edges = set(
+        Choice.constraints.through.objects.filter(
+            from_choice__project_id=project
+        ).values_list(
+            "from_choice__field",
+            "from_choice__choice",
+            "to_choice__field",
+            "to_choice__choice",
+        )
+    )
+
+    # A pair of choices is only compatible if each choice is a constraint of the other
+    graph = {}
+    for field_x, choice_x, field_y, choice_y in edges:
+        if (field_y, choice_y, field_x, choice_x) in edges:
+            graph.setdefault((field_x, field_y), set()).add((choice_x, choice_y))
+
+    return {field_pair: frozenset(pairs) for field_pair, pairs in graph.items()}
+
+
+def get_choice_constraint_graph(
+    project: str,
+) -> dict[tuple[str, str], frozenset[tuple[str, str]]]:
+    """
+    Get the compiled choice constraint graph of a `project`.
+
+    The graph is compiled once per process, and is recompiled when the `project` command updates the constraints.
+    This is detected from the version of the constraints in the database, so applies across all processes.
+
+    Args:
+        project: The code of the project.
+
+    Returns:
+        Dictionary mapping each `(field_x, field_y)` pair to the set of `(choice_x, choice_y)` pairs that are allowed to occur together.
+    """
+
+    version = get_choice_constraints_version(project)
+    compiled = _choice_constraint_graphs.get(project)
+    if compiled and compiled[0] == version:
+        return compiled[1]
+
+    graph = compile_choice_constraint_graph(project)
+    _choice_constraint_graphs[project] = (version, graph)
+    return graph
+
+
 def validate_choice_constraints(
     errors: dict[str, list[str]],
     data: dict[str, Any],
@@ -136,24 +243,11 @@ def validate_choice_constraints(
     Ensure all choices are compatible with each other.
     """
 
-    # Getting a little bit gnarly
-    # This is a mapping from tuples of (field_x, choice_x)
-    # to all (field_y, choice_y) tuples that are allowed to occur with said tuple
-    constraints = {
-        (choice.field, choice.choice): {
-            (constraint.field, constraint.choice)
-            for constraint in choice.constraints.all()
-        }
-        for choice in Choice.objects.prefetch_related("constraints")
-        .filter(project_id=project)
-        .filter(
-            field__in=set(
-                field
-                for constraint_group in choice_constraints
-                for field in constraint_group
-            )
-        )
-    }
+    if not choice_constraints:
+        return
+
+    # Mapping from (field_x, field_y) to the (choice_x, choice_y) pairs that are allowed to occur together
+    constraints = get_choice_constraint_graph(project)
 
     for choice_x, choice_y in choice_constraints:
         if instance:
@@ -168,16 +262,8 @@ def validate_choice_constraints(
             and choice_y_value is not None
             and choice_x_value not in EMPTY_VALUES
             and choice_y_value not in EMPTY_VALUES
-            and (
-                (
-                    (choice_y, choice_y_value)
-                    not in constraints[(choice_x, choice_x_value)]
-                )
-                or (
-                    (choice_x, choice_x_value)
-                    not in constraints[(choice_y, choice_y_value)]
-                )
-            )
+            and (choice_x_value, choice_y_value)
+            not in constraints.get((choice_x, choice_y), frozenset())
         ):
             errors.setdefault("non_field_errors", []).append(
                 f"Choices for fields {choice_x}, {choice_y} are incompatible."
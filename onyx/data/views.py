@@ -1,23 +1,41 @@
 from __future__ import annotations
+import copy
+import functools
 import hashlib
+import operator
 from collections import namedtuple
 from pydantic import RootModel, ValidationError as PydanticValidationError
-from django.db.models import Count
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction, IntegrityError
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Q, QuerySet, prefetch_related_objects
 from rest_framework import status, exceptions
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.viewsets import ViewSetMixin
-from utils.functions import parse_permission
+from utils.functions import get_permission, parse_permission, strtobool
+from utils.validators import OnyxUniqueTogetherValidator
+from accounts.models import Site
 from accounts.permissions import Approved, ProjectApproved, IsSiteMember
+from internal.renderers import OnyxJSONRenderer
+from internal.metrics import count_records
+from internal.slowlog import get_timings, timed
 from .models import Project, Choice, ProjectRecord, Anonymiser
 from .serializers import SerializerNode, SummarySerializer, IdentifierSerializer
-from .exceptions import ClimbIDNotFound, IdentifierNotFound
+from .exceptions import (
+    ClimbIDNotFound,
+    IdentifierNotFound,
+    PreconditionFailed,
+    UpsertConflict,
+)
 from .query import make_atoms, validate_atoms, make_query
 from .queryset import init_project_queryset, prefetch_nested
 from .types import OnyxType
 from .actions import Actions
+from .bulk import validate_bulk
+from .idempotency import idempotent
 from .fields import (
     FieldHandler,
     generate_fields_spec,
@@ -32,9 +50,24 @@ class RequestBody(RootModel):
     Generic structure for the body of a request.
 
     This is used to validate the body of POST and PATCH requests.
+
+    Lists of strings are allowed for identifiers (e.g. the CLIMB IDs of a bulk delete).
+    """
+
+    root: dict[
+        str,
+        RequestBody | list[RequestBody] | list[str] | str | int | float | bool | None,
+    ]
+
+
+class BulkRequestBody(RootModel):
+    """
+    Generic structure for the body of a bulk request.
+
+    This is used to validate the body of bulk POST requests.
     """
 
-    root: dict[str, RequestBody | list[RequestBody] | str | int | float | bool | None]
+    root: list[RequestBody]
 
 
 class ProjectAPIView(APIView):
@@ -42,6 +75,9 @@ class ProjectAPIView(APIView):
     `APIView` with some additional initial setup for working with a specific project.
     """
 
+    # Whether the request body is a list of objects, rather than a single object
+    bulk = False
+
     def initial(self, request: Request, *args, **kwargs):
         """
         Initial setup for working with project data.
@@ -74,7 +110,8 @@ class ProjectAPIView(APIView):
             {field: value}
             for field in request.query_params
             for value in request.query_params.getlist(field)
-            if field not in {"cursor", "include", "exclude", "summarise"}
+            if field
+            not in {"cursor", "include", "exclude", "summarise", "filter_nested"}
         ]
 
         # Build extra query parameters
@@ -90,9 +127,20 @@ class ProjectAPIView(APIView):
         # Summary aggregate in filter/query
         self.summarise = list(request.query_params.getlist("summarise"))
 
+        # Filter nested fields in output of filter/query
+        try:
+            self.filter_nested = strtobool(
+                request.query_params.get("filter_nested", "false")
+            )
+        except ValueError:
+            raise exceptions.ValidationError(
+                {"filter_nested": ["Must be a valid boolean."]}
+            )
+
         # Build request body
+        request_body = BulkRequestBody if self.bulk else RequestBody
         try:
-            self.request_data = RequestBody.model_validate(request.data).model_dump(
+            self.request_data = request_body.model_validate(request.data).model_dump(
                 mode="python"
             )
         except PydanticValidationError as e:
@@ -309,6 +357,17 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
             case ("POST", "create"):
                 self.project_action = "add"
 
+            case ("POST", "bulk_create") | ("POST", "bulk_validate"):
+                self.project_action = "add"
+                self.bulk = True
+
+            case ("POST", "upsert"):
+                self.project_action = "add"
+
+            case ("POST", "bulk_upsert"):
+                self.project_action = "add"
+                self.bulk = True
+
             case ("POST", "list"):
                 self.project_action = "list"
 
@@ -318,10 +377,10 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
             case ("GET", "list") | ("HEAD", "list"):
                 self.project_action = "list"
 
-            case ("PATCH", "partial_update"):
+            case ("PATCH", "partial_update") | ("PATCH", "bulk_update"):
                 self.project_action = "change"
 
-            case ("DELETE", "destroy"):
+            case ("DELETE", "destroy") | ("POST", "bulk_destroy"):
                 self.project_action = "delete"
 
             case ("OPTIONS", "metadata"):
@@ -332,6 +391,7 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
 
         super().initial(request, *args, **kwargs)
 
+    @idempotent
     def create(self, request: Request, code: str, test: bool = False) -> Response:
         """
         Create an instance for the given project `code`.
@@ -356,6 +416,7 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         if not test:
             # Create the instance
             instance = node.save()
+            count_records(self.project.code, "created")
 
             # Set of fields to return in response
             # This includes the climb_id and any anonymised fields
@@ -375,6 +436,189 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         # Return response indicating creation
         return Response(data, status=status.HTTP_201_CREATED)
 
+    def bulk_create(self, request: Request, code: str, test: bool = False) -> Response:
+        """
+        Create a list of instances for the given project `code`.
+
+        By default, either all instances are created, or none of them are.
+
+        If the query parameter `atomic = false` is provided, each instance is created independently,
+        and a result is returned for each instance.
+        """
+
+        try:
+            atomic = strtobool(request.query_params.get("atomic", "true"))
+        except ValueError:
+            raise exceptions.ValidationError({"atomic": ["Must be a valid boolean."]})
+
+        if not self.request_data:
+            raise exceptions.ValidationError(
+                {"non_field_errors": ["Expected at least one item."]}
+            )
+
+        # Validate the request data fields
+        self.handler.resolve_fields(flatten_fields(self.request_data))
+
+        # The context is shared by all nodes, so is used to cache choices and sites
+        # It also marks the nodes as bulk, so uniqueness is checked across the whole batch
+        context = {
+            "project": self.project,
+            "request": self.request,
+            "bulk": True,
+        }
+
+        # Validate the data for each instance
+        nodes = {}
+        errors = {}
+        for i, data in enumerate(self.request_data):
+            try:
+                node = SerializerNode(
+                    self.serializer_cls,
+                    data=data,
+                    context=context,
+                )
+            except exceptions.ValidationError as e:
+                errors[i] = e.args[0]
+                continue
+
+            if node.is_valid():
+                nodes[i] = node
+            else:
+                errors[i] = node.errors
+
+        # Anonymise fields across the batch
+        # This happens before checking uniqueness, as anonymised fields may be unique together
+        self.serializer_cls.anonymise_batch(
+            [node.serializer for node in nodes.values()],
+            project=self.project,
+        )
+
+        # Check uniqueness across the batch, and against existing instances
+        for validator in getattr(self.serializer_cls.Meta, "validators", []):
+            if isinstance(validator, OnyxUniqueTogetherValidator):
+                batch_errors = validator.validate_batch(
+                    {i: node.serializer.validated_data for i, node in nodes.items()}
+                )
+
+                for i, error in batch_errors.items():
+                    errors.setdefault(i, {}).setdefault("non_field_errors", []).append(
+                        error
+                    )
+                    nodes.pop(i)
+
+        if atomic and errors:
+            raise exceptions.ValidationError(errors)
+
+        # Set of fields to return in response
+        # This includes the climb_id and any anonymised fields
+        identifier_fields = unflatten_fields(
+            ["climb_id"] + list(self.serializer_cls.OnyxMeta.anonymised_fields.keys())
+        )
+
+        if not test:
+            # Create the instances
+            instances = dict(
+                zip(
+                    nodes.keys(),
+                    SerializerNode.bulk_save(list(nodes.values()), atomic=atomic),
+                )
+            )
+        else:
+            instances = {}
+
+        count_records(
+            self.project.code,
+            "created",
+            sum(instance is not None for instance in instances.values()),
+        )
+
+        if atomic:
+            # Serialize the results
+            if not test:
+                serializer = self.serializer_cls(
+                    list(instances.values()),
+                    many=True,
+                    fields=identifier_fields,
+                )
+                data = serializer.data
+            else:
+                data = []
+
+            # Return response indicating creation
+            return Response(data, status=status.HTTP_201_CREATED)
+
+        # Build a result for each instance
+        results = []
+        for i in range(len(self.request_data)):
+            if i in errors:
+                results.append(
+                    {
+                        "status": "fail",
+                        "code": status.HTTP_400_BAD_REQUEST,
+                        "messages": errors[i],
+                    }
+                )
+            elif not test and instances[i] is None:
+                results.append(
+                    {
+                        "status": "fail",
+                        "code": status.HTTP_400_BAD_REQUEST,
+                        "messages": nodes[i].errors,
+                    }
+                )
+            else:
+                if not test:
+                    data = self.serializer_cls(
+                        instances[i],
+                        fields=identifier_fields,
+                    ).data
+                else:
+                    data = {}
+
+                results.append(
+                    {
+                        "status": "success",
+                        "code": status.HTTP_201_CREATED,
+                        "data": data,
+                    }
+                )
+
+        # Return response indicating creation if every instance succeeded
+        # Otherwise, indicate the mixture of results
+        if all(result["status"] == "success" for result in results):
+            return Response(results, status=status.HTTP_201_CREATED)
+        else:
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+
+    def bulk_validate(self, request: Request, code: str) -> StreamingHttpResponse:
+        """
+        Validate a list of instances for creation for the given project `code`, without creating them.
+
+        The instances are validated in chunks, and a result is streamed for each instance as
+        newline-delimited JSON, in the order they were provided.
+        """
+
+        if not self.request_data:
+            raise exceptions.ValidationError(
+                {"non_field_errors": ["Expected at least one item."]}
+            )
+
+        # Validate the request data fields
+        self.handler.resolve_fields(flatten_fields(self.request_data))
+
+        renderer = OnyxJSONRenderer()
+        results = validate_bulk(
+            project=self.project,
+            serializer_class=self.serializer_cls,
+            data=self.request_data,
+            request=self.request,
+        )
+
+        return StreamingHttpResponse(
+            (renderer.dumps(result) + b"\n" for result in results),
+            content_type="application/x-ndjson",
+        )
+
     def retrieve(self, request: Request, code: str, climb_id: str) -> Response:
         """
         Use the `climb_id` to retrieve an instance for the given project `code`.
@@ -410,8 +654,14 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
             fields=unflatten_fields(fields),
         )
 
+        count_records(self.project.code, "returned")
+
         # Return response with data
-        return Response(serializer.data)
+        # The ETag identifies the version of the instance, for conditional updates
+        return Response(
+            serializer.data,
+            headers={"ETag": f'"{instance.get_version_token()}"'},
+        )
 
     def list(self, request: Request, code: str) -> Response:
         """
@@ -427,6 +677,12 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         else:
             query = self.request_data
 
+        # Record the query, if the request is being timed for the slow request log
+        # The query is copied, as its values are replaced by QueryAtom objects when making atoms
+        timings = get_timings(request)
+        if timings is not None:
+            timings.query = copy.deepcopy(query)
+
         # If a query was provided
         # Turn the value of each key-value pair in query into a 'QueryAtom' object
         # A list of QueryAtoms is returned
@@ -514,7 +770,13 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         )
 
         # Prefetch nested fields returned in response
-        qs = prefetch_nested(qs, unflatten_fields(fields))
+        # If filter_nested = True, these are also filtered by the query
+        qs = prefetch_nested(
+            qs,
+            unflatten_fields(fields),
+            query=query if self.filter_nested else None,  # type: ignore
+            onyx_fields=filter_fields,
+        )
 
         # If data was provided, then it has now been validated
         # So we form the Q object, and filter the queryset with it
@@ -532,19 +794,24 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         if self.summarise:
             summary_values = qs.values(*summary_fields.keys())
 
-            # Reject summary if it would return too many distinct values
-            if summary_values.distinct().count() > 100000:
-                raise exceptions.ValidationError(
-                    {
-                        "detail": "The current summary would return too many distinct values."
-                    }
+            with timed(request, "query", capture=True):
+                # Reject summary if it would return too many distinct values
+                if summary_values.distinct().count() > 100000:
+                    raise exceptions.ValidationError(
+                        {
+                            "detail": "The current summary would return too many distinct values."
+                        }
+                    )
+
+                summary = list(
+                    summary_values.annotate(count=Count("*")).order_by(
+                        *summary_fields.keys()
+                    )
                 )
 
             # Serialize the results
             serializer = SummarySerializer(
-                summary_values.annotate(count=Count("*")).order_by(
-                    *summary_fields.keys()
-                ),
+                summary,
                 onyx_fields=summary_fields,
                 many=True,
             )
@@ -554,7 +821,15 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
             self.paginator.ordering = "created"
 
             # Paginate the response
-            result_page = self.paginator.paginate_queryset(qs, request)
+            # Nested fields are prefetched separately from the page, so that each can be timed
+            prefetch_lookups = qs._prefetch_related_lookups  # type: ignore
+            with timed(request, "query", capture=True):
+                result_page = self.paginator.paginate_queryset(
+                    qs.prefetch_related(None), request
+                )
+
+            with timed(request, "prefetch"):
+                prefetch_related_objects(result_page, *prefetch_lookups)  # type: ignore
 
             # Serialize the results
             serializer = self.serializer_cls(
@@ -563,9 +838,15 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
                 fields=unflatten_fields(fields),
             )
 
+        with timed(request, "serialisation"):
+            data = serializer.data
+
+        count_records(self.project.code, "returned", len(data))
+
         # Return response with either filtered set of data, or summarised values
-        return Response(serializer.data)
+        return Response(data)
 
+    @idempotent
     def partial_update(
         self, request: Request, code: str, climb_id: str, test: bool = False
     ) -> Response:
@@ -593,6 +874,13 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         # Check permissions to update the instance
         self.check_object_permissions(request, instance)
 
+        # If an If-Match header was provided, check the instance has not been modified
+        # If a specific version was required, the update is made conditional on that version
+        if self.check_if_match(request, instance):
+            last_modified = instance.last_modified
+        else:
+            last_modified = None
+
         # Validate the data
         node = SerializerNode(
             self.serializer_cls,
@@ -606,9 +894,12 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
         if not node.is_valid(instance=instance):
             raise exceptions.ValidationError(node.errors)
 
+        headers = {}
         if not test:
             # Update the instance
-            instance = node.save()
+            instance = node.save(last_modified=last_modified)
+            count_records(self.project.code, "updated")
+            headers["ETag"] = f'"{instance.get_version_token()}"'
 
             # Set of fields to return in response
             # This includes the climb_id and any anonymised fields
@@ -626,7 +917,635 @@ class ProjectRecordsViewSet(ViewSetMixin, ProjectAPIView):
             data = {}
 
         # Return response indicating update
-        return Response(data)
+        return Response(data, headers=headers)
+
+    def bulk_update(self, request: Request, code: str, test: bool = False) -> Response:
+        """
+        Update all instances matching a query for the given project `code`.
+
+        The request body contains the `query` (in the same format as the query endpoint),
+        and the field values to `update` on each matching instance.
+
+        Either all matching instances are updated, or none of them are.
+        """
+
+        query = self.request_data.get("query")
+        update = self.request_data.get("update")
+
+        errors = {}
+        if not isinstance(query, dict) or not query:
+            errors["query"] = ["Expected a non-empty query."]
+
+        if not isinstance(update, dict) or not update:
+            errors["update"] = ["Expected at least one field to update."]
+
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        assert isinstance(query, dict) and isinstance(update, dict)
+
+        # Validate the update fields
+        # These are restricted to fields the user can change
+        onyx_fields = self.handler.resolve_fields(list(update.keys()))
+
+        # Fields that identify records, or that are nested, cannot be updated in bulk
+        unique_fields = {
+            field
+            for validator in getattr(self.serializer_cls.Meta, "validators", [])
+            if isinstance(validator, OnyxUniqueTogetherValidator)
+            for field in validator.fields
+        }
+        for field, onyx_field in onyx_fields.items():
+            if (
+                onyx_field.onyx_type == OnyxType.RELATION
+                or field == "climb_id"
+                or field in self.serializer_cls.OnyxMeta.anonymised_fields
+                or field in unique_fields
+            ):
+                errors.setdefault(field, []).append(
+                    "This field cannot be updated in bulk."
+                )
+
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        # Validate the update values once
+        # Uniqueness and anonymisation are not applied, as these fields cannot be updated in bulk
+        serializer = self.serializer_cls(
+            data=update,
+            partial=True,
+            context={
+                "project": self.project,
+                "request": self.request,
+                "bulk": True,
+            },
+        )
+
+        if not serializer.is_valid():
+            raise exceptions.ValidationError(serializer.errors)
+
+        values = dict(serializer.validated_data)  # type: ignore
+
+        # Get the instances matching the query, that the user can change
+        qs = self.filter_by_query(
+            init_project_queryset(
+                model=self.model,
+                user=request.user,
+                fields=self.handler.get_fields(),
+            ),
+            query,
+        )
+
+        if not request.user.is_staff:
+            qs = qs.filter(site=request.user.site)
+
+        pks = list(qs.order_by("pk").values_list("pk", flat=True))
+
+        # Update the instances in batches, with a single transaction
+        batch_size = 1000
+        updated = []
+        row_errors = {}
+
+        with transaction.atomic():
+            for i in range(0, len(pks), batch_size):
+                instances = list(
+                    self.model.objects.select_for_update()
+                    .filter(pk__in=pks[i : i + batch_size])
+                    .order_by("pk")
+                )
+
+                # Validate the update against each instance
+                # e.g. to check orderings and choice constraints that involve existing values
+                changed = []
+                for instance in instances:
+                    serializer.instance = instance
+
+                    try:
+                        serializer.validate(dict(values))
+                    except exceptions.ValidationError as e:
+                        row_errors[instance.climb_id] = e.detail
+                        continue
+
+                    # Instances that would not change are not updated
+                    if any(
+                        getattr(instance, field) != value
+                        for field, value in values.items()
+                    ):
+                        changed.append(instance)
+
+                if row_errors or test:
+                    updated.extend(changed)
+                    continue
+
+                updated.extend(
+                    self.model.bulk_set(changed, values, batch_size=batch_size)
+                )
+
+            # If any instance is invalid, no instances are updated
+            if row_errors:
+                raise exceptions.ValidationError(row_errors)
+
+        if not test:
+            count_records(self.project.code, "updated", len(updated))
+
+        # Return response with the updated CLIMB IDs
+        return Response(
+            {
+                "count": len(updated),
+                "climb_ids": [instance.climb_id for instance in updated],
+            }
+        )
+
+    @idempotent
+    def upsert(self, request: Request, code: str) -> Response:
+        """
+        Create or update an instance for the given project `code`, located by its unique together identifiers.
+
+        If an instance with the identifiers exists, it is updated. Otherwise, an instance is created.
+        """
+
+        try:
+            [(instance, created)] = self.upsert_items([self.request_data])
+        except exceptions.ValidationError as e:
+            # Errors of the item are keyed by its index, which is removed for a single item
+            if isinstance(e.detail, dict) and list(e.detail) == [0]:
+                raise exceptions.ValidationError(e.detail[0])
+            raise
+
+        # Serialize the result
+        serializer = self.serializer_cls(
+            instance,
+            fields=self.get_identifier_fields(),
+        )
+
+        count_records(self.project.code, "created" if created else "updated")
+
+        # Return response indicating creation or update
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @idempotent
+    def bulk_upsert(self, request: Request, code: str) -> Response:
+        """
+        Create or update a list of instances for the given project `code`, located by their unique together identifiers.
+
+        Either all instances are created or updated, or none of them are.
+        """
+
+        if not self.request_data:
+            raise exceptions.ValidationError(
+                {"non_field_errors": ["Expected at least one item."]}
+            )
+
+        results = self.upsert_items(self.request_data)
+        created = sum(created for _, created in results)
+        count_records(self.project.code, "created", created)
+        count_records(self.project.code, "updated", len(results) - created)
+
+        # Serialize the results
+        serializer = self.serializer_cls(
+            [instance for instance, _ in results],
+            many=True,
+            fields=self.get_identifier_fields(),
+        )
+
+        # Return a result for each instance, indicating whether it was created or updated
+        return Response(
+            [
+                {
+                    "status": "success",
+                    "code": (
+                        status.HTTP_201_CREATED if created else status.HTTP_200_OK
+                    ),
+                    "data": data,
+                }
+                for (_, created), data in zip(results, serializer.data)
+            ]
+        )
+
+    def get_identifier_fields(self) -> dict:
+        """
+        Get the fields returned in the response of a write, which are the climb_id and any anonymised fields.
+        """
+
+        return unflatten_fields(
+            ["climb_id"] + list(self.serializer_cls.OnyxMeta.anonymised_fields.keys())
+        )
+
+    def upsert_items(
+        self, items: list[dict], batch_size: int = 500
+    ) -> list[tuple[ProjectRecord, bool]]:
+        """
+        Create or update a list of `items`, within a single transaction.
+
+        Each item is located by the fields of the project's `OnyxUniqueTogetherValidator`.
+        Located items are validated for update (using the fields the user can change),
+        and the remaining items are validated for creation.
+
+        Returns:
+            The list of `(instance, created)` results, in the same order as the `items`.
+
+        Raises:
+            ValidationError: If any item is invalid, with the errors of each item keyed by its index.
+        """
+
+        validator = next(
+            (
+                validator
+                for validator in getattr(self.serializer_cls.Meta, "validators", [])
+                if isinstance(validator, OnyxUniqueTogetherValidator)
+            ),
+            None,
+        )
+        if validator is None:
+            raise exceptions.ValidationError(
+                {"non_field_errors": ["This project does not support upserts."]}
+            )
+
+        # Updating requires permission to change the project, as well as to add to it
+        change_permission = get_permission(
+            app_label=self.project.content_type.app_label,
+            action="change",
+            code=self.project.code,
+        )
+        if not self.request.user.has_perm(change_permission):
+            raise exceptions.PermissionDenied(
+                f"You do not have permission to change on the {self.project.name} project."
+            )
+
+        # Each identifier must be a single, non-empty value, to locate the instance
+        errors = {}
+        for i, data in enumerate(items):
+            for field in validator.fields:
+                value = data.get(field)
+
+                if value is None or value == "":
+                    errors.setdefault(i, {})[field] = [
+                        "This field is required to upsert a record."
+                    ]
+                elif isinstance(value, (dict, list)):
+                    errors.setdefault(i, {})[field] = [
+                        "This field must be a single value to upsert a record."
+                    ]
+
+        if errors:
+            raise exceptions.ValidationError(errors)
+
+        # Validate the request data fields for creation
+        self.handler.resolve_fields(flatten_fields(items))
+        change_handler = FieldHandler(
+            project=self.project,
+            action="change",
+            user=self.request.user,
+        )
+
+        # The serializer context is shared by all nodes, so is used to cache choices and sites
+        # Uniqueness of created instances is checked across the whole batch
+        context = {
+            "project": self.project,
+            "request": self.request,
+            "bulk": True,
+        }
+
+        try:
+            with transaction.atomic():
+                # Locate and lock the existing instances, that the user can change
+                existing = self.get_upsert_instances(
+                    items,
+                    validator.fields,
+                    qs=init_project_queryset(
+                        model=self.model,
+                        user=self.request.user,
+                        fields=change_handler.get_fields(),
+                    ).select_for_update(of=("self",)),
+                    batch_size=batch_size,
+                )
+
+                # Validate each item for update of its instance, or for creation
+                nodes = {}
+                created = {}
+                located = {}
+                for i, data in enumerate(items):
+                    instance = existing.get(i)
+
+                    if instance is not None:
+                        if instance.pk in located:
+                            errors[i] = {
+                                "non_field_errors": [
+                                    f"This record has the same {', '.join(validator.fields)} as record {located[instance.pk]}."
+                                ]
+                            }
+                            continue
+
+                        located[instance.pk] = i
+                        self.check_object_permissions(self.request, instance)
+
+                        # The identifiers (and site) locate the instance, so are not updated
+                        data = {
+                            field: value
+                            for field, value in data.items()
+                            if field not in validator.fields and field != "site"
+                        }
+
+                        try:
+                            change_handler.resolve_fields(flatten_fields(data))
+                        except exceptions.ValidationError as e:
+                            errors[i] = e.detail
+                            continue
+
+                    try:
+                        node = SerializerNode(
+                            self.serializer_cls,
+                            data=data,
+                            context=context,
+                        )
+                    except exceptions.ValidationError as e:
+                        errors[i] = e.args[0]
+                        continue
+
+                    if node.is_valid(instance=instance):
+                        nodes[i] = node
+                        if instance is None:
+                            created[i] = node
+                    else:
+                        errors[i] = node.errors
+
+                # Anonymise fields and check uniqueness across the created instances
+                self.serializer_cls.anonymise_batch(
+                    [node.serializer for node in created.values()],
+                    project=self.project,
+                )
+                for i, error in validator.validate_batch(
+                    {i: node.serializer.validated_data for i, node in created.items()}
+                ).items():
+                    errors.setdefault(i, {}).setdefault("non_field_errors", []).append(
+                        error
+                    )
+
+                if errors:
+                    raise exceptions.ValidationError(errors)
+
+                instances = SerializerNode.bulk_save(
+                    list(nodes.values()), batch_size=batch_size
+                )
+
+        except IntegrityError:
+            # An instance with the same identifiers was created by a concurrent request
+            raise UpsertConflict
+
+        return [(instance, i in created) for i, instance in zip(nodes, instances)]  # type: ignore
+
+    def get_upsert_instances(
+        self,
+        items: list[dict],
+        fields: list[str],
+        qs: QuerySet,
+        batch_size: int = 500,
+    ) -> dict[int, ProjectRecord]:
+        """
+        Locate the existing instances of a list of `items`, by the values of their unique together `fields`.
+
+        Anonymised fields are compared by their existing identifiers. No identifiers are created,
+        so an item with an anonymised value that does not have an identifier yet does not exist.
+
+        Returns:
+            Dictionary mapping the index of each item that exists to its instance.
+        """
+
+        sites = {
+            site.code: site
+            for site in Site.objects.filter(
+                code__in={
+                    str(data.get("site") or self.request.user.site.code)
+                    for data in items
+                }
+            )
+        }
+        serializer = self.serializer_cls()
+        model_fields = {field: self.model._meta.get_field(field) for field in fields}
+
+        # Determine the values of each item, and the anonymiser entries needed to resolve them
+        values = {}
+        targets = []
+        entries = []
+        for i, data in enumerate(items):
+            site = sites.get(str(data.get("site") or self.request.user.site.code))
+
+            # Items with an unknown site or invalid values do not exist, so are left for validation
+            if site is None:
+                continue
+
+            try:
+                values[i] = {
+                    field: model_fields[field].to_python(data[field])
+                    for field in fields
+                }
+            except DjangoValidationError:
+                continue
+
+            anonymised = {
+                field: value
+                for field, value in values[i].items()
+                if field in self.serializer_cls.OnyxMeta.anonymised_fields
+            }
+            if not all(isinstance(value, str) for value in anonymised.values()):
+                values.pop(i)
+                continue
+
+            for field, entry in serializer.get_anonymiser_entries(
+                anonymised | {"site": site}
+            ).items():
+                targets.append((i, field))
+                entries.append(entry)
+
+        for (i, field), identifier in zip(
+            targets, Anonymiser.lookup(project=self.project, entries=entries)
+        ):
+            if identifier is None:
+                values.pop(i, None)
+            elif i in values:
+                values[i][field] = model_fields[field].to_python(identifier)
+
+        # Retrieve the existing instances with the values, for each batch of items
+        keys = {
+            i: tuple(value[field] for field in fields) for i, value in values.items()
+        }
+        unique_keys = list(set(keys.values()))
+        instances = {}
+        for j in range(0, len(unique_keys), batch_size):
+            q_object = functools.reduce(
+                operator.or_,
+                [
+                    Q(**dict(zip(fields, key)))
+                    for key in unique_keys[j : j + batch_size]
+                ],
+            )
+            for instance in qs.filter(q_object):
+                instances[
+                    tuple(
+                        model_fields[field].to_python(getattr(instance, field))
+                        for field in fields
+                    )
+                ] = instance
+
+        return {i: instances[key] for i, key in keys.items() if key in instances}
+
+    def bulk_destroy(self, request: Request, code: str) -> Response:
+        """
+        Permanently delete all instances matching a query, or a list of CLIMB IDs, for the given project `code`.
+
+        The request body contains either the `query` (in the same format as the query endpoint),
+        or a list of `climb_ids`.
+
+        If the query parameter `dry_run = true` is provided, the instances that would be deleted are returned,
+        without deleting them.
+        """
+
+        try:
+            dry_run = strtobool(request.query_params.get("dry_run", "false"))
+        except ValueError:
+            raise exceptions.ValidationError({"dry_run": ["Must be a valid boolean."]})
+
+        query = self.request_data.get("query")
+        climb_ids = self.request_data.get("climb_ids")
+
+        if (query is None) == (climb_ids is None):
+            raise exceptions.ValidationError(
+                {
+                    "non_field_errors": [
+                        "Expected either a query or a list of climb_ids."
+                    ]
+                }
+            )
+
+        # Initial queryset
+        qs = init_project_queryset(
+            model=self.model,
+            user=request.user,
+            fields=self.handler.get_fields(),
+        )
+
+        if query is not None:
+            if not isinstance(query, dict) or not query:
+                raise exceptions.ValidationError(
+                    {"query": ["Expected a non-empty query."]}
+                )
+
+            qs = self.filter_by_query(qs, query)
+        else:
+            if (
+                not isinstance(climb_ids, list)
+                or not climb_ids
+                or not all(isinstance(climb_id, str) for climb_id in climb_ids)
+            ):
+                raise exceptions.ValidationError(
+                    {"climb_ids": ["Expected a non-empty list of CLIMB IDs."]}
+                )
+
+            qs = qs.filter(climb_id__in=[climb_id.upper() for climb_id in climb_ids])
+
+        # Users can only delete instances from their own site
+        if not request.user.is_staff:
+            qs = qs.filter(site=request.user.site)
+
+        # Serialize the identifiers of the instances, before they are deleted
+        # This includes the climb_id and any anonymised fields
+        identifier_fields = ["climb_id"] + list(
+            self.serializer_cls.OnyxMeta.anonymised_fields.keys()
+        )
+        instances = list(qs.order_by("pk"))
+        data = self.serializer_cls(
+            instances,
+            many=True,
+            fields=unflatten_fields(identifier_fields),
+        ).data
+
+        if not dry_run:
+            # Delete the instances in batches, with a single transaction
+            with transaction.atomic():
+                self.model.bulk_delete(
+                    [instance.pk for instance in instances],
+                    batch_size=1000,
+                )
+
+        # Return response with the identifiers of the deleted instances
+        return Response({"count": len(instances), "deleted": data})
+
+    def filter_by_query(self, qs: QuerySet, query: dict) -> QuerySet:
+        """
+        Validate a `query` (in the same format as the body of the query endpoint), and filter the queryset `qs` with it.
+
+        Args:
+            qs: The queryset to filter.
+            query: The query.
+
+        Returns:
+            The filtered queryset.
+        """
+
+        atoms = make_atoms(query)  # type: ignore
+        filter_fields = {}
+        field_errors = {}
+        filter_handler = FieldHandler(
+            project=self.project,
+            action="filter",
+            user=self.request.user,
+        )
+
+        # Validate filter fields and determine OnyxField objects
+        for atom in atoms:
+            try:
+                # Lookups are allowed for filter fields
+                filter_fields[atom.key] = filter_handler.resolve_field(
+                    atom.key, allow_lookup=True
+                )
+
+            except exceptions.ValidationError as e:
+                field_errors.setdefault(atom.key, []).append(e.args[0])
+
+        if field_errors:
+            raise exceptions.ValidationError(field_errors)
+
+        # Validate and clean the provided key-value pairs
+        validate_atoms(self.model, atoms, filter_fields)
+
+        # As with the query endpoint, a call to distinct is necessary
+        return qs.filter(make_query(query)).distinct()  # type: ignore
+
+    def check_if_match(self, request: Request, instance: ProjectRecord) -> bool:
+        """
+        Check the `If-Match` header of the `request` against the version of the `instance`.
+
+        Weak entity tags are compared by their token, as the version of an instance
+        is independent of how the response was encoded (e.g. compressed).
+
+        Args:
+            request: The request.
+            instance: The instance being updated.
+
+        Returns:
+            `True` if a specific version of the instance was required, otherwise `False`.
+        """
+
+        if_match = request.headers.get("If-Match")
+
+        if if_match is None:
+            return False
+
+        tokens = {
+            tag.strip().removeprefix("W/").strip('"') for tag in if_match.split(",")
+        }
+
+        # A wildcard matches any version of an existing instance
+        if "*" in tokens:
+            return False
+
+        if instance.get_version_token() not in tokens:
+            raise PreconditionFailed
+
+        return True
 
     def destroy(self, request: Request, code: str, climb_id: str) -> Response:
         """
@@ -0,0 +1,192 @@
+import timeit
+import uuid
+import random
+from decimal import Decimal
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.management import base
+from django.db import transaction
+from rest_framework import renderers
+from data.models import Project
+from data.history import deferred_history
+from ...renderers import OnyxJSONRenderer
+
+
+def generate_page(rows: int, nested: int) -> list[dict]:
+    """
+    Generate a page of serialized records, with the shape of typical project data.
+
+    Args:
+        rows: The number of records in the page.
+        nested: The number of nested records within each record.
+
+    Returns:
+        The page of records.
+    """
+
+    page = []
+
+    for i in range(rows):
+        record = {
+            "climb_id": f"C-{i:010d}",
+            "uuid": uuid.uuid4(),
+            "created": datetime.now(timezone.utc),
+            "last_modified": datetime.now(timezone.utc),
+            "is_published": True,
+            "published_date": "2024-01-01",
+            "is_suppressed": False,
+            "site": "site",
+            "sample_id": f"S-{i:010d}",
+            "run_name": f"R-{i:010d}",
+            "collection_month": "2023-01",
+            "received_month": "2023-02",
+            "country": random.choice(["eng", "scot", "wales", "ni"]),
+            "tests": random.randint(0, 100),
+            "score": random.random() * 100,
+            "amount": Decimal("42.50"),
+            "text": "X" * random.randint(0, 50),
+            "records": [
+                {
+                    "test_id": j,
+                    "test_pass": random.choice([True, False]),
+                    "test_start": "2023-01",
+                    "test_end": "2023-02",
+                    "score_a": random.random() * 100,
+                    "score_b": None,
+                    "test_result": "details",
+                }
+                for j in range(nested)
+            ],
+        }
+        page.append(record)
+
+    return page
+
+
+class Command(base.BaseCommand):
+    help = "Benchmark internal components of Onyx."
+
+    def add_arguments(self, parser):
+        command = parser.add_subparsers(
+            dest="command", metavar="{command}", required=True
+        )
+
+        # BENCHMARK JSON RENDERING
+        renderer_parser = command.add_parser(
+            "renderer", help="Benchmark JSON rendering of a page of records."
+        )
+        renderer_parser.add_argument(
+            "--rows", type=int, default=settings.REST_FRAMEWORK["PAGE_SIZE"]
+        )
+        renderer_parser.add_argument("--nested", type=int, default=5)
+        renderer_parser.add_argument("--repeats", type=int, default=20)
+        renderer_parser.add_argument("--quiet", action="store_true")
+
+        # BENCHMARK HISTORY WRITING
+        history_parser = command.add_parser(
+            "history",
+            help="Benchmark saving existing records of a project, with and without deferred history.",
+        )
+        history_parser.add_argument("project")
+        history_parser.add_argument("--rows", type=int, default=500)
+        history_parser.add_argument("--repeats", type=int, default=5)
+        history_parser.add_argument("--quiet", action="store_true")
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+
+        if options["command"] == "renderer":
+            self.benchmark_renderer(
+                rows=options["rows"],
+                nested=options["nested"],
+                repeats=options["repeats"],
+            )
+
+        elif options["command"] == "history":
+            self.benchmark_history(
+                code=options["project"],
+                rows=options["rows"],
+                repeats=options["repeats"],
+            )
+
+    def benchmark_renderer(self, rows: int, nested: int, repeats: int):
+        """
+        Compare rendering a page of records using the stdlib and Onyx JSON renderers.
+        """
+
+        page = generate_page(rows, nested)
+
+        # The envelope is applied by the Onyx renderer, so apply it for the stdlib renderer too
+        envelope = {"status": "success", "code": 200, "data": page}
+
+        stdlib_renderer = renderers.JSONRenderer()
+        onyx_renderer = OnyxJSONRenderer()
+
+        stdlib_time = min(
+            timeit.repeat(
+                lambda: stdlib_renderer.render(envelope),
+                number=1,
+                repeat=repeats,
+            )
+        )
+        onyx_time = min(
+            timeit.repeat(
+                lambda: onyx_renderer.dumps(envelope),
+                number=1,
+                repeat=repeats,
+            )
+        )
+        size = len(onyx_renderer.dumps(envelope))
+
+        self.print(f"Rows: {rows}")
+        self.print(f"Nested records per row: {nested}")
+        self.print(f"Rendered size: {size / 1024:.1f} KiB")
+        self.print(f"stdlib renderer: {stdlib_time * 1000:.2f} ms")
+        self.print(f"Onyx renderer: {onyx_time * 1000:.2f} ms")
+        self.print(f"Speedup: {stdlib_time / onyx_time:.1f}x")
+
+    def benchmark_history(self, code: str, rows: int, repeats: int):
+        """
+        Compare the per-record cost of saving records, with immediate and deferred history.
+
+        Each run is made in a transaction that is rolled back, so no changes are kept.
+        """
+
+        try:
+            project = Project.objects.get(code=code)
+        except Project.DoesNotExist:
+            raise base.CommandError(f"Project '{code}' does not exist.")
+
+        model = project.content_type.model_class()
+        assert model is not None
+
+        instances = list(model.objects.all()[:rows])
+        if not instances:
+            raise base.CommandError(f"Project '{code}' has no records to save.")
+
+        def run(deferred: bool):
+            with transaction.atomic():
+                with deferred_history(enabled=deferred):
+                    for instance in instances:
+                        instance.save()
+
+                transaction.set_rollback(True)
+
+        immediate_time = min(
+            timeit.repeat(lambda: run(False), number=1, repeat=repeats)
+        )
+        deferred_time = min(timeit.repeat(lambda: run(True), number=1, repeat=repeats))
+
+        self.print(f"Project: {code}")
+        self.print(f"Records: {len(instances)}")
+        self.print(
+            f"Immediate history: {immediate_time * 1000 / len(instances):.3f} ms per record"
+        )
+        self.print(
+            f"Deferred history: {deferred_time * 1000 / len(instances):.3f} ms per record"
+        )
+        self.print(f"Speedup: {immediate_time / deferred_time:.1f}x")
@@ -0,0 +1,115 @@
+from collections import Counter
+from django.conf import settings
+from django.core.management import base
+from ...models import Profile
+from ...profiler import enable_profiling, disable_profiling
+
+
+def merge_profiles(profiles) -> str:
+    """
+    Merge the stacks of `profiles` in the collapsed stack format.
+
+    Each stack is prefixed with the route of its profile, so that routes are separated in a flamegraph.
+    """
+
+    stacks = Counter()
+
+    for profile in profiles:
+        for line in profile.stacks.splitlines():
+            stack, _, count = line.rpartition(" ")
+            stacks[f"{profile.route};{stack}"] += int(count)
+
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.items())
+
+
+class Command(base.BaseCommand):
+    help = "Profile requests with a sampling profiler, and export the profiles for flamegraph tools."
+
+    def add_arguments(self, parser):
+        command = parser.add_subparsers(
+            dest="command", metavar="{command}", required=True
+        )
+
+        # ENABLE PROFILING
+        enable_parser = command.add_parser(
+            "enable", help="Profile the next N requests."
+        )
+        enable_parser.add_argument("--requests", type=int, required=True)
+        enable_parser.add_argument("--quiet", action="store_true")
+
+        # DISABLE PROFILING
+        disable_parser = command.add_parser("disable", help="Stop profiling requests.")
+        disable_parser.add_argument("--quiet", action="store_true")
+
+        # LIST PROFILES
+        list_parser = command.add_parser("list", help="List the most recent profiles.")
+        list_parser.add_argument("--limit", type=int, default=20)
+        list_parser.add_argument("--quiet", action="store_true")
+
+        # EXPORT PROFILES
+        export_parser = command.add_parser(
+            "export",
+            help="Export profiles in the collapsed stack format, merging them if there are several.",
+        )
+        export_parser.add_argument("ids", nargs="*", type=int)
+        export_parser.add_argument("--route")
+        export_parser.add_argument("--user")
+        export_parser.add_argument("--output", help="File to write the stacks to.")
+        export_parser.add_argument("--quiet", action="store_true")
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+        config = getattr(settings, "PROFILER", {})
+
+        if options["command"] == "enable":
+            if not config.get("ENABLED", False):
+                raise base.CommandError("The profiler is not enabled in the settings.")
+
+            if options["requests"] < 1:
+                raise base.CommandError("The number of requests must be at least 1.")
+
+            requests = min(options["requests"], config.get("MAX_REQUESTS", 100))
+            enable_profiling(requests, config.get("TIMEOUT", 3600))
+            self.print(f"Profiling the next {requests} requests.")
+
+        elif options["command"] == "disable":
+            disable_profiling()
+            self.print("Profiling disabled.")
+
+        elif options["command"] == "list":
+            for profile in Profile.objects.select_related("user").order_by("-date")[
+                : options["limit"]
+            ]:
+                self.print(
+                    f"• {profile.id}: {profile.date:%Y-%m-%d %H:%M:%S} {profile.method} {profile.route} "
+                    f"{profile.status} ({profile.user.username if profile.user else 'anonymous'}) "
+                    f"{profile.exec_time} ms, {profile.samples} samples"
+                )
+
+        elif options["command"] == "export":
+            profiles = Profile.objects.order_by("date")
+
+            if options["ids"]:
+                profiles = profiles.filter(id__in=options["ids"])
+
+            if options["route"]:
+                profiles = profiles.filter(route=options["route"])
+
+            if options["user"]:
+                profiles = profiles.filter(user__username=options["user"])
+
+            if not profiles.exists():
+                raise base.CommandError("No matching profiles.")
+
+            stacks = merge_profiles(profiles)
+
+            if options["output"]:
+                with open(options["output"], "w") as output:
+                    output.write(stacks + "\n")
+                self.print(f"Profiles exported: {profiles.count()}")
+            else:
+                print(stacks)
@@ -0,0 +1,393 @@
+import math
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.management import base
+from django.db import connection, transaction
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from ...models import Request, RequestRollup, RequestRollupState
+
+# Percentiles of execution time stored on each rollup
+PERCENTILES = [50, 90, 95, 99]
+
+# Primary key of the single row of rollup state
+ROLLUP_STATE_ID = 1
+
+# Upper bound of a range partition, as returned by pg_get_expr
+PARTITION_BOUND = re.compile(r"TO \('(?P<bound>[^']+)'\)")
+
+
+def percentile(values: list[int], p: float) -> int | None:
+    """
+    Get the `p`th percentile of a sorted list of `values`, using the nearest-rank method.
+    """
+
+    if not values:
+        return None
+
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def get_endpoint_name(path: str) -> str:
+    """
+    Get the name of the route that handles a `path`, or the `path` itself if it does not resolve to a named route.
+
+    This groups requests to the same route (e.g. for different CLIMB IDs) together.
+    """
+
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return path
+
+    return match.url_name or path
+
+
+def get_partition_name(table: str, day: datetime) -> str:
+    """
+    Get the name of the daily partition of a `table` for a `day`.
+    """
+
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def parse_partition_bound(expression: str) -> datetime | None:
+    """
+    Get the upper bound of a range partition from its bound `expression`, or `None` if it is unbounded.
+    """
+
+    match = PARTITION_BOUND.search(expression)
+
+    if not match:
+        return None
+
+    return datetime.fromisoformat(match.group("bound"))
+
+
+def get_default_partition_name(table: str) -> str:
+    """
+    Get the name of the default partition of a `table`, which holds any rows outside the daily partitions.
+    """
+
+    return f"{table}_default"
+
+
+def get_partitions(table: str) -> list[tuple[str, str]]:
+    """
+    Get the name and bound expression of each partition of a `table`.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchall()
+
+
+def is_partitioned(table: str) -> bool:
+    """
+    Determine whether a `table` is partitioned.
+    """
+
+    if connection.vendor != "postgresql":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+class Command(base.BaseCommand):
+    help = "Manage partitioning, retention and hourly rollups of the request log."
+
+    def add_arguments(self, parser):
+        command = parser.add_subparsers(
+            dest="command", metavar="{command}", required=True
+        )
+
+        # PARTITION THE REQUEST LOG
+        partition_parser = command.add_parser(
+            "partition",
+            help=(
+                "Create daily partitions of the request log for upcoming days (PostgreSQL only). "
+                "This must run daily: requests beyond the last daily partition are held in a default partition, "
+                "which is slower to query and prune."
+            ),
+        )
+        partition_parser.add_argument(
+            "--days-ahead",
+            type=int,
+            default=7,
+            help="The number of days ahead to create partitions for.",
+        )
+        partition_parser.add_argument("--quiet", action="store_true")
+
+        # APPLY RETENTION TO THE REQUEST LOG
+        prune_parser = command.add_parser(
+            "prune",
+            help="Remove requests older than the retention period. Partitions that have expired are dropped.",
+        )
+        prune_parser.add_argument("--retention", type=int, required=True)
+        prune_parser.add_argument("--batch-size", type=int, default=10000)
+        prune_parser.add_argument("--dry-run", action="store_true")
+        prune_parser.add_argument("--quiet", action="store_true")
+
+        # ROLL UP THE REQUEST LOG
+        rollup_parser = command.add_parser(
+            "rollup",
+            help="Roll up each complete hour of requests that has not been rolled up.",
+        )
+        rollup_parser.add_argument(
+            "--delay",
+            type=int,
+            default=15,
+            help="The number of minutes after the end of an hour before it is rolled up, to allow for late writes.",
+        )
+        rollup_parser.add_argument(
+            "--recompute",
+            type=int,
+            default=0,
+            help="The number of most recent rolled up hours to recompute.",
+        )
+        rollup_parser.add_argument("--quiet", action="store_true")
+
+    def print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        self.quiet = options["quiet"]
+
+        if options["command"] == "partition":
+            self.partition(days_ahead=options["days_ahead"])
+
+        elif options["command"] == "prune":
+            self.prune(
+                retention=options["retention"],
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+
+        elif options["command"] == "rollup":
+            self.rollup(delay=options["delay"], recompute=options["recompute"])
+
+    def partition(self, days_ahead: int):
+        """
+        Create the daily partitions of the request log for today and the next `days_ahead` days.
+
+        The request log is partitioned by the `internal` migrations, with a default partition for
+        requests beyond the daily partitions. Partitions are created from the end of the last existing
+        partition, so that they do not overlap it, and so that any days missed (e.g. if this did not run)
+        are moved out of the default partition.
+        """
+
+        if connection.vendor != "postgresql":
+            raise base.CommandError("Partitioning requires PostgreSQL.")
+
+        table = Request._meta.db_table
+
+        if not is_partitioned(table):
+            raise base.CommandError(
+                f"{table} is not partitioned. Apply the internal migrations first."
+            )
+
+        today = (
+            timezone.now()
+            .astimezone(dt_timezone.utc)
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+        )
+        bounds = [
+            bound
+            for _, expression in get_partitions(table)
+            if (bound := parse_partition_bound(expression)) is not None
+        ]
+        day = max(bounds, default=today)
+
+        while day <= today + timedelta(days=days_ahead):
+            self.create_partition(table, day)
+            day += timedelta(days=1)
+
+        self.print(
+            f"Partitions of {table} exist up to {today + timedelta(days=days_ahead + 1):%Y-%m-%d}."
+        )
+
+    def create_partition(self, table: str, day: datetime):
+        """
+        Create the partition of the request log `table` for a `day`.
+
+        Any requests for the day that are held by the default partition are moved into the new partition.
+        """
+
+        name = get_partition_name(table, day)
+        default = get_default_partition_name(table)
+        bounds = [day, day + timedelta(days=1)]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # A partition cannot be created while the default partition holds rows within its bounds
+            # So the partition is created separately, filled from the default partition, and then attached
+            cursor.execute(f'LOCK TABLE "{default}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(
+                f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            )
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE "date" >= %s AND "date" < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                bounds,
+            )
+            cursor.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+                bounds,
+            )
+
+    def prune(self, retention: int, batch_size: int, dry_run: bool):
+        """
+        Remove requests that are older than `retention` days.
+
+        If the request log is partitioned, partitions that are entirely older than the cutoff are dropped.
+        Any remaining expired requests (e.g. in the default partition) are deleted in batches of `batch_size`.
+        """
+
+        table = Request._meta.db_table
+        cutoff = timezone.now() - timedelta(days=retention)
+
+        if is_partitioned(table):
+            self.drop_partitions(table, cutoff=cutoff, dry_run=dry_run)
+
+        expired = Request.objects.filter(date__lt=cutoff)
+
+        if dry_run:
+            self.print(f"Requests to remove: {expired.count()}")
+            return
+
+        total = 0
+        while True:
+            pks = list(expired.order_by("pk").values_list("pk", flat=True)[:batch_size])
+
+            if not pks:
+                break
+
+            Request.objects.filter(pk__in=pks).delete()
+            total += len(pks)
+
+        self.print(f"Requests removed: {total}")
+
+    def drop_partitions(self, table: str, cutoff: datetime, dry_run: bool):
+        """
+        Drop the partitions of the request log `table` that are entirely older than the `cutoff`.
+
+        The default partition is never dropped.
+        """
+
+        expired = []
+        for name, expression in get_partitions(table):
+            bound = parse_partition_bound(expression)
+
+            if bound is not None and bound <= cutoff:
+                expired.append(name)
+
+        for name in sorted(expired):
+            if not dry_run:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                    cursor.execute(f'DROP TABLE "{name}"')
+
+            self.print(f"• {name}: {'to drop' if dry_run else 'dropped'}")
+
+        self.print(f"Partitions expired: {len(expired)}")
+
+    def rollup(self, delay: int, recompute: int):
+        """
+        Roll up each complete hour of requests, from the end of the last rolled up hour (less `recompute` hours).
+
+        An hour is complete once `delay` minutes have passed since it ended.
+        The end of the last rolled up hour is stored, so that hours without requests are not rolled up again.
+        """
+
+        end = (timezone.now() - timedelta(minutes=delay)).replace(
+            minute=0, second=0, microsecond=0
+        )
+
+        state = RequestRollupState.objects.filter(pk=ROLLUP_STATE_ID).first()
+
+        if state is not None:
+            hour = state.end - timedelta(hours=recompute)
+        else:
+            # Without a stored end, continue from the last rollup, or start from the first request
+            last = (
+                RequestRollup.objects.order_by("-hour")
+                .values_list("hour", flat=True)
+                .first()
+            )
+
+            if last is not None:
+                hour = last + timedelta(hours=1) - timedelta(hours=recompute)
+            else:
+                first = (
+                    Request.objects.order_by("date")
+                    .values_list("date", flat=True)
+                    .first()
+                )
+
+                if first is None:
+                    self.print("No requests to roll up.")
+                    return
+
+                hour = first.replace(minute=0, second=0, microsecond=0)
+
+        hours = 0
+        while hour + timedelta(hours=1) <= end:
+            self.rollup_hour(hour)
+            hour += timedelta(hours=1)
+            hours += 1
+
+        if hours and (state is None or hour > state.end):
+            RequestRollupState.objects.update_or_create(
+                pk=ROLLUP_STATE_ID, defaults={"end": hour}
+            )
+
+        self.print(f"Hours rolled up: {hours}")
+
+    def rollup_hour(self, hour: datetime):
+        """
+        Replace the rollups of an `hour` with the aggregates of its requests.
+        """
+
+        groups = {}
+        endpoints = {}
+
+        for endpoint, method, status, user_id, exec_time in (
+            Request.objects.filter(date__gte=hour, date__lt=hour + timedelta(hours=1))
+            .values_list("endpoint", "method", "status", "user_id", "exec_time")
+            .iterator()
+        ):
+            if endpoint not in endpoints:
+                endpoints[endpoint] = get_endpoint_name(endpoint)[:100]
+
+            key = (endpoints[endpoint], method, status, user_id)
+            groups.setdefault(key, []).append(exec_time)
+
+        rollups = []
+        for (endpoint, method, status, user_id), exec_times in groups.items():
+            times = sorted(t for t in exec_times if t is not None)
+            rollups.append(
+                RequestRollup(
+                    hour=hour,
+                    endpoint=endpoint,
+                    method=method,
+                    status=status,
+                    user_id=user_id,
+                    count=len(exec_times),
+                    exec_time_total=sum(times),
+                    exec_time_max=times[-1] if times else None,
+                    **{f"exec_time_p{p}": percentile(times, p) for p in PERCENTILES},
+                )
+            )
+
+        with transaction.atomic():
+            RequestRollup.objects.filter(hour=hour).delete()
+            RequestRollup.objects.bulk_create(rollups)
@@ -0,0 +1,75 @@
+import os
+import prometheus_client
+from prometheus_client import multiprocess
+from django.conf import settings
+
+REQUEST_DURATION = prometheus_client.Histogram(
+    "onyx_request_duration_seconds",
+    "Duration of requests, by route name, method and status.",
+    ["route", "method", "status"],
+    buckets=getattr(settings, "METRICS", {}).get(
+        "BUCKETS", prometheus_client.Histogram.DEFAULT_BUCKETS
+    ),
+)
+RECORDS = prometheus_client.Counter(
+    "onyx_records",
+    "Number of records created, updated or returned, by project.",
+    ["project", "action"],
+)
+REQUEST_LOG_DROPPED = prometheus_client.Counter(
+    "onyx_request_log_dropped",
+    "Number of request log entries dropped by the request log writer.",
+)
+
+
+def observe_request(route: str, method: str, status: int, duration: float) -> None:
+    """
+    Record the `duration` (in seconds) of a request to a `route`.
+    """
+
+    REQUEST_DURATION.labels(route=route, method=method, status=str(status)).observe(
+        duration
+    )
+
+
+def count_records(project: str, action: str, n: int = 1) -> None:
+    """
+    Count `n` records of a `project` that were created, updated or returned (the `action`).
+    """
+
+    if n <= 0:
+        return
+
+    RECORDS.labels(project=project, action=action).inc(n)
+
+
+def count_dropped_requests(n: int = 1) -> None:
+    """
+    Count `n` request log entries that were dropped.
+    """
+
+    REQUEST_LOG_DROPPED.inc(n)
+
+
+def generate_metrics() -> tuple[bytes, str]:
+    """
+    Generate the metrics in the Prometheus text format.
+
+    If the `PROMETHEUS_MULTIPROC_DIR` environment variable is set, the metrics of all processes
+    (e.g. gunicorn workers) are collected from the directory and aggregated.
+    Otherwise, only the metrics of the current process are generated.
+
+    Returns:
+        The metrics, and their content type.
+    """
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    return (
+        prometheus_client.generate_latest(registry),
+        prometheus_client.CONTENT_TYPE_LATEST,
+    )
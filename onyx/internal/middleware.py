@@ -1,6 +1,31 @@
+import logging
+import random
+import threading
 import time
+import zlib
+import zstandard
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection, transaction, DatabaseError
+from django.utils.cache import patch_vary_headers
 from rest_framework import status
-from .models import Request
+from .models import Request, SlowRequest, Profile
+from .writer import get_request_log_writer
+from .metrics import observe_request, count_dropped_requests
+from .queries import QueryRecorder
+from .slowlog import RequestTimings, explain
+from .profiler import SamplingProfiler, claim_request, enable_profiling
+
+logger = logging.getLogger(__name__)
+
+
+def get_route_name(request) -> str:
+    """
+    Get the name of the route that handled a `request`, or 'unmatched' if it did not resolve to a named route.
+    """
+
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name if match else None) or "unmatched"
 
 
 # Credit to Felix Eklöf for this middleware
@@ -10,6 +35,13 @@ class SaveRequest:
         self.get_response = get_response
         self.prefixes = ["/accounts", "/projects"]
 
+        # If enabled, requests are logged in batches on a background thread
+        config = getattr(settings, "REQUEST_LOG", {})
+        if config.get("ASYNC", False):
+            self.writer = get_request_log_writer(config)
+        else:
+            self.writer = None
+
     def __call__(self, request):
         # Get response from view function, and calculate the execution time (in ms)
         _t = time.time()
@@ -47,8 +79,19 @@ class SaveRequest:
         # Any address beyond that is likely to be rubbish
         address = address[:20]
 
+        # Record the statements executed by the request, if instrumented by the RecordQueries middleware
+        queries = {}
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            queries = {
+                "query_count": recorder.count,
+                "query_time": recorder.time_ms,
+                "repeated_queries": recorder.get_repeated() or None,
+                "n_plus_one": request.n_plus_one,
+            }
+
         # Log the request
-        Request.objects.create(
+        entry = Request(
             endpoint=path,
             method=request.method,
             status=response.status_code,
@@ -56,6 +99,421 @@ class SaveRequest:
             address=address,
             exec_time=_t,
             error_messages=error_messages,
+            **queries,
+        )
+
+        if self.writer is not None:
+            self.writer.put(entry)
+        else:
+            # Failing to log a request should not fail the request itself
+            # The savepoint keeps any surrounding transaction usable if the insert fails
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except DatabaseError:
+                logger.exception("Failed to write request log entry.")
+                count_dropped_requests()
+
+        return response
+
+
+class RecordQueries:
+    """
+    Middleware that records the number, total time and repeated shapes of the statements executed by each request.
+
+    The recorder is attached to the request, for the SaveRequest middleware to store on the request log.
+    Requests where one statement shape is executed at least `N_PLUS_ONE_THRESHOLD` times are flagged (and logged)
+    as a likely N+1 query. If `HEADERS` is enabled, responses to staff include the recorded values as headers.
+
+    Statements executed while a streaming response is consumed are not recorded.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "QUERY_LOG", {})
+        if not config.get("ENABLED", False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.headers = config.get("HEADERS", True)
+        self.threshold = config.get("N_PLUS_ONE_THRESHOLD", 20)
+
+        # A statement shape is only repeated once it has been executed at least twice
+        if self.threshold < 2:
+            raise ImproperlyConfigured(
+                "QUERY_LOG N_PLUS_ONE_THRESHOLD must be at least 2."
+            )
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        request.query_recorder = recorder
+        request.n_plus_one = recorder.max_repeats >= self.threshold
+
+        if request.n_plus_one:
+            [(fingerprint, count)] = recorder.shapes.most_common(1)
+            logger.warning(
+                "Possible N+1 query on %s %s: statement %s executed %d times: %s",
+                request.method,
+                request.path,
+                fingerprint,
+                count,
+                recorder.statements[fingerprint][:200],
+            )
+
+        user = getattr(request, "user", None)
+        if self.headers and user is not None and user.is_staff:
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time"] = str(recorder.time_ms)
+            response["X-Query-Max-Repeats"] = str(recorder.max_repeats)
+
+            if request.n_plus_one:
+                response["X-Query-N-Plus-One"] = fingerprint
+
+        return response
+
+
+class LogSlowRequests:
+    """
+    Middleware that logs requests that take at least `THRESHOLD` milliseconds.
+
+    Timings are attached to the request, which views and renderers record the time spent in each phase into.
+    A slow request is stored with its Onyx query, and the compiled SQL of its main statement.
+    The execution plan of the statement is included for a sample of slow requests (`EXPLAIN_SAMPLE_RATE`).
+    On PostgreSQL this runs `EXPLAIN (ANALYZE, BUFFERS)`, which executes the statement again.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "SLOW_REQUEST_LOG", {})
+        if not config.get("ENABLED", False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.threshold = config.get("THRESHOLD", 1000)
+        self.explain_sample_rate = config.get("EXPLAIN_SAMPLE_RATE", 0)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.timings = timings
+
+        _t = time.perf_counter()
+        response = self.get_response(request)
+        _t = int((time.perf_counter() - _t) * 1000)
+
+        if _t < self.threshold:
+            return response
+
+        # The main statement is the last captured, as any before it (e.g. counts) only support it
+        sql, params = timings.statements[-1] if timings.statements else ("", None)
+
+        plan = ""
+        if sql and random.random() < self.explain_sample_rate:
+            try:
+                plan = explain(sql, params)
+            except DatabaseError:
+                logger.exception("Failed to explain slow request statement.")
+
+        if params is not None:
+            params = [
+                p if isinstance(p, (str, int, float, bool, type(None))) else str(p)
+                for p in params
+            ]
+
+        logger.warning(
+            "Slow request %s %s: %d ms %s",
+            request.method,
+            request.path,
+            _t,
+            timings.get_phases_ms(),
+        )
+
+        user = getattr(request, "user", None)
+        SlowRequest.objects.create(
+            endpoint=request.path[:100],
+            method=request.method,
+            status=response.status_code,
+            user=user if user is not None and not user.is_anonymous else None,
+            exec_time=_t,
+            query=timings.query,
+            sql=sql,
+            params=params,
+            explain=plan,
+            timings=timings.get_phases_ms(),
+        )
+
+        return response
+
+
+class ProfileRequests:
+    """
+    Middleware that profiles requests with a sampling profiler, when profiling has been enabled.
+
+    Profiling is enabled for the next N requests by the `profile` command, or by a staff user
+    sending the `X-Profile-Requests: N` header. The requests are claimed through the database,
+    so profiling applies across workers.
+    Profiles are stored with the route and user of the request.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "PROFILER", {})
+        if not config.get("ENABLED", False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.interval = config.get("INTERVAL", 0.005)
+        self.max_requests = config.get("MAX_REQUESTS", 100)
+        self.timeout = config.get("TIMEOUT", 3600)
+
+    def __call__(self, request):
+        if not claim_request():
+            response = self.get_response(request)
+            self.enable(request)
+            return response
+
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        profiler.start()
+
+        _t = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        _t = int((time.perf_counter() - _t) * 1000)
+
+        user = getattr(request, "user", None)
+        Profile.objects.create(
+            endpoint=request.path[:100],
+            route=get_route_name(request)[:100],
+            method=request.method,
+            status=response.status_code,
+            user=user if user is not None and not user.is_anonymous else None,
+            exec_time=_t,
+            interval=self.interval,
+            samples=profiler.samples,
+            stacks=profiler.collapse(),
+        )
+
+        self.enable(request)
+        return response
+
+    def enable(self, request) -> None:
+        """
+        Enable profiling for the number of requests in the `X-Profile-Requests` header, if sent by a staff user.
+
+        The user is only known once the request has been authenticated by the view, so this is checked after the response.
+        """
+
+        header = request.headers.get("X-Profile-Requests")
+        if not header:
+            return
+
+        user = getattr(request, "user", None)
+        if user is None or not user.is_staff:
+            return
+
+        try:
+            requests = int(header)
+        except ValueError:
+            return
+
+        if requests > 0:
+            enable_profiling(min(requests, self.max_requests), self.timeout)
+
+
+class RecordMetrics:
+    """
+    Middleware that records the duration of each request, by route name, method and status.
+
+    Requests that do not resolve to a named route are recorded under the route name 'unmatched',
+    so that arbitrary paths do not create new metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _t = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - _t
+
+        observe_request(
+            route=get_route_name(request),
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
         )
 
         return response
+
+
+class CompressResponse:
+    """
+    Compress response content using an encoding negotiated from the request's `Accept-Encoding` header.
+
+    Supports `zstd` and `gzip`, preferring `zstd`.
+
+    Non-streaming responses are only compressed if they are at least `MIN_SIZE` bytes.
+    Streaming responses are always compressed, chunk by chunk, as their size is not known in advance.
+    Each chunk is flushed, so that it reaches the client without waiting for the rest of the stream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, "RESPONSE_COMPRESSION", {})
+        self.min_size = options.get("MIN_SIZE", 1024)
+        self.gzip_level = options.get("GZIP_LEVEL", 6)
+        self.zstd_level = options.get("ZSTD_LEVEL", 3)
+
+        # Supported encodings, in order of preference
+        self.encodings = ["zstd", "gzip"]
+
+    def get_encoding(self, accept_encoding: str) -> str | None:
+        """
+        Determine the preferred supported encoding from an `Accept-Encoding` header.
+
+        Args:
+            accept_encoding: The value of the `Accept-Encoding` header.
+
+        Returns:
+            The encoding, or `None` if no supported encoding is acceptable.
+        """
+
+        # Build a mapping of each encoding to its quality value
+        qualities = {}
+        for item in accept_encoding.split(","):
+            encoding, _, params = item.strip().partition(";")
+            encoding = encoding.strip().lower()
+            quality = 1.0
+
+            for param in params.split(";"):
+                name, _, value = param.strip().partition("=")
+                if name.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+
+            if encoding:
+                qualities[encoding] = quality
+
+        # Choose the encoding with the highest quality
+        # In the event of a tie, the encoding that is earliest in order of preference is chosen
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            quality = qualities.get(encoding, qualities.get("*", 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+
+        return best
+
+    def compressor(self, encoding: str):
+        """
+        Create a streaming compressor for the given `encoding`.
+
+        The compressor has a `compress` method for each chunk, and a `flush` method for the end of the stream.
+        """
+
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+        else:
+            # A wbits value of 31 produces output with a gzip header and trailer
+            return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, encoding: str, content: bytes) -> bytes:
+        """
+        Compress the `content` using the given `encoding`.
+        """
+
+        compressor = self.compressor(encoding)
+        return compressor.compress(content) + compressor.flush()
+
+    def compress_chunk(self, encoding: str, compressor, chunk: bytes) -> bytes:
+        """
+        Compress a `chunk` of a stream, flushing the output so the chunk can be decompressed by the client immediately.
+
+        Without this, the compressor holds back its output until its buffer fills, so a slow stream
+        (e.g. of NDJSON results) would only reach the client at the end.
+        """
+
+        if encoding == "zstd":
+            flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            flush_mode = zlib.Z_SYNC_FLUSH
+
+        return compressor.compress(chunk) + compressor.flush(flush_mode)
+
+    def compress_sequence(self, encoding: str, sequence):
+        """
+        Compress an iterator of chunks using the given `encoding`.
+        """
+
+        compressor = self.compressor(encoding)
+
+        for chunk in sequence:
+            data = self.compress_chunk(encoding, compressor, chunk)
+            if data:
+                yield data
+
+        yield compressor.flush()
+
+    async def compress_async_sequence(self, encoding: str, sequence):
+        """
+        Compress an async iterator of chunks using the given `encoding`.
+        """
+
+        compressor = self.compressor(encoding)
+
+        async for chunk in sequence:
+            data = self.compress_chunk(encoding, compressor, chunk)
+            if data:
+                yield data
+
+        yield compressor.flush()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # It's not worth attempting to compress small responses
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # Avoid compressing if the response already has a content encoding
+        if response.has_header("Content-Encoding"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = self.get_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if not encoding:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_sequence(
+                    encoding, response.streaming_content
+                )
+            else:
+                response.streaming_content = self.compress_sequence(
+                    encoding, response.streaming_content
+                )
+
+            # The compressed size is not known until the content is streamed
+            del response.headers["Content-Length"]
+        else:
+            # Only return the compressed content if it's actually smaller
+            compressed_content = self.compress(encoding, response.content)
+            if len(compressed_content) >= len(response.content):
+                return response
+
+            response.content = compressed_content
+            response.headers["Content-Length"] = str(len(response.content))
+
+        # If there is a strong ETag, make it weak, as the content has been transformed
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = encoding
+        return response
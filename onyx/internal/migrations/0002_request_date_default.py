@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="request",
+            name="date",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0002_request_date_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField()),
+                ("endpoint", models.CharField(blank=True, max_length=100)),
+                ("method", models.CharField(blank=True, max_length=10)),
+                ("status", models.PositiveSmallIntegerField()),
+                ("count", models.PositiveIntegerField()),
+                ("exec_time_total", models.BigIntegerField()),
+                ("exec_time_p50", models.IntegerField(null=True)),
+                ("exec_time_p90", models.IntegerField(null=True)),
+                ("exec_time_p95", models.IntegerField(null=True)),
+                ("exec_time_p99", models.IntegerField(null=True)),
+                ("exec_time_max", models.IntegerField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="request",
+            index=models.Index(fields=["date"], name="internal_re_date_f8ecaf_idx"),
+        ),
+        migrations.AddField(
+            model_name="requestrollup",
+            name="user",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="requestrollup",
+            index=models.Index(fields=["hour"], name="internal_re_hour_43a353_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="requestrollup",
+            index=models.Index(
+                fields=["endpoint"], name="internal_re_endpoin_912d73_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0003_request_rollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="request",
+            name="n_plus_one",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="request",
+            name="query_count",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="request",
+            name="query_time",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="request",
+            name="repeated_queries",
+            field=models.JSONField(null=True),
+        ),
+    ]
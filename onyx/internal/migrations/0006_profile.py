@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0005_slow_request"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Profile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateTimeField(default=django.utils.timezone.now)),
+                ("endpoint", models.CharField(blank=True, max_length=100)),
+                ("route", models.CharField(blank=True, max_length=100)),
+                ("method", models.CharField(blank=True, max_length=10)),
+                ("status", models.PositiveSmallIntegerField()),
+                ("exec_time", models.IntegerField()),
+                ("interval", models.FloatField()),
+                ("samples", models.PositiveIntegerField()),
+                ("stacks", models.TextField(blank=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["date"], name="internal_pr_date_9407ae_idx"),
+                    models.Index(fields=["route"], name="internal_pr_route_b58ace_idx"),
+                ],
+            },
+        ),
+    ]
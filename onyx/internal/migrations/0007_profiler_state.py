@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0006_profile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfilerState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("remaining", models.PositiveIntegerField(default=0)),
+                ("expires", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+
+class PostgreSQLRunSQL(migrations.RunSQL):
+    """
+    Run SQL on PostgreSQL only, as partitioning is not supported by other databases.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Convert the request log into a table partitioned by date
+# The existing table is attached as the partition for all requests up to the end of the day of the migration
+# (or of the latest existing request, if later),
+# and a default partition holds any requests beyond the daily partitions created by the requestlog command
+# Primary keys of a partitioned table must include the partition key, so the primary key is (id, date)
+# Identity columns are not supported by partitioned tables, so IDs continue from the existing table using a sequence
+PARTITION_SQL = [
+    'LOCK TABLE "internal_request" IN ACCESS EXCLUSIVE MODE',
+    'ALTER TABLE "internal_request" RENAME TO "internal_request_legacy"',
+    'ALTER TABLE "internal_request_legacy" DROP CONSTRAINT "internal_request_pkey"',
+    'ALTER TABLE "internal_request_legacy" ADD CONSTRAINT "internal_request_legacy_pkey" PRIMARY KEY ("id", "date")',
+    'ALTER INDEX "internal_re_date_f8ecaf_idx" RENAME TO "internal_request_legacy_date_idx"',
+    'ALTER INDEX "internal_request_user_id_82289adc" RENAME TO "internal_request_legacy_user_id_idx"',
+    'ALTER TABLE "internal_request_legacy" ALTER COLUMN "id" DROP IDENTITY IF EXISTS',
+    'CREATE TABLE "internal_request" (LIKE "internal_request_legacy" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ("date")',
+    'ALTER TABLE "internal_request" ADD CONSTRAINT "internal_request_pkey" PRIMARY KEY ("id", "date")',
+    'ALTER TABLE "internal_request" ADD CONSTRAINT "internal_request_user_id_82289adc_fk_accounts_user_id" '
+    'FOREIGN KEY ("user_id") REFERENCES "accounts_user" ("id") DEFERRABLE INITIALLY DEFERRED',
+    'CREATE INDEX "internal_re_date_f8ecaf_idx" ON "internal_request" ("date")',
+    'CREATE INDEX "internal_request_user_id_82289adc" ON "internal_request" ("user_id")',
+    'CREATE SEQUENCE "internal_request_id_seq" OWNED BY "internal_request"."id"',
+    'SELECT setval(\'internal_request_id_seq\', COALESCE((SELECT MAX("id") FROM "internal_request_legacy"), 0) + 1, false)',
+    'ALTER TABLE "internal_request" ALTER COLUMN "id" SET DEFAULT nextval(\'internal_request_id_seq\')',
+    """
+    DO $$
+    BEGIN
+        EXECUTE format(
+            'ALTER TABLE "internal_request" ATTACH PARTITION "internal_request_legacy" FOR VALUES FROM (MINVALUE) TO (%L)',
+            GREATEST(
+                date_trunc('day', now(), 'UTC') + interval '1 day',
+                (SELECT date_trunc('day', MAX("date"), 'UTC') + interval '1 day' FROM "internal_request_legacy")
+            )
+        );
+    END $$
+    """,
+    'CREATE TABLE "internal_request_default" PARTITION OF "internal_request" DEFAULT',
+]
+
+# Convert the request log back into a single table, with an identity column continuing from the existing IDs
+# Dropping the partitioned table also drops its partitions
+UNPARTITION_SQL = [
+    'LOCK TABLE "internal_request" IN ACCESS EXCLUSIVE MODE',
+    'ALTER TABLE "internal_request" RENAME TO "internal_request_partitioned"',
+    'ALTER TABLE "internal_request_partitioned" RENAME CONSTRAINT "internal_request_pkey" TO "internal_request_partitioned_pkey"',
+    'ALTER INDEX "internal_re_date_f8ecaf_idx" RENAME TO "internal_request_partitioned_date_idx"',
+    'ALTER INDEX "internal_request_user_id_82289adc" RENAME TO "internal_request_partitioned_user_id_idx"',
+    'ALTER TABLE "internal_request_partitioned" ALTER COLUMN "id" DROP DEFAULT',
+    'DROP SEQUENCE "internal_request_id_seq"',
+    'CREATE TABLE "internal_request" (LIKE "internal_request_partitioned" INCLUDING CONSTRAINTS)',
+    'ALTER TABLE "internal_request" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY',
+    'INSERT INTO "internal_request" OVERRIDING SYSTEM VALUE SELECT * FROM "internal_request_partitioned"',
+    "SELECT setval(pg_get_serial_sequence('internal_request', 'id'), COALESCE(MAX(\"id\"), 0) + 1, false) FROM \"internal_request\"",
+    'ALTER TABLE "internal_request" ADD CONSTRAINT "internal_request_pkey" PRIMARY KEY ("id")',
+    'ALTER TABLE "internal_request" ADD CONSTRAINT "internal_request_user_id_82289adc_fk_accounts_user_id" '
+    'FOREIGN KEY ("user_id") REFERENCES "accounts_user" ("id") DEFERRABLE INITIALLY DEFERRED',
+    'CREATE INDEX "internal_re_date_f8ecaf_idx" ON "internal_request" ("date")',
+    'CREATE INDEX "internal_request_user_id_82289adc" ON "internal_request" ("user_id")',
+    'DROP TABLE "internal_request_partitioned"',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0007_profiler_state"),
+    ]
+
+    operations = [
+        PostgreSQLRunSQL(PARTITION_SQL, reverse_sql=UNPARTITION_SQL),
+    ]
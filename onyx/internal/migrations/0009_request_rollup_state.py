@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("internal", "0008_partition_request_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestRollupState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("end", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.db.models.fields.related_lookups import RelatedLookupMixin
 from django.db.models.fields.related import ForeignObject
 from accounts.models import User
@@ -71,5 +73,120 @@ class Request(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
     address = models.CharField(max_length=20, blank=True)
     exec_time = models.IntegerField(null=True)
-    date = models.DateTimeField(auto_now=True)
+    date = models.DateTimeField(default=timezone.now)
     error_messages = models.TextField(blank=True)
+    query_count = models.PositiveIntegerField(null=True)
+    query_time = models.IntegerField(null=True)
+    repeated_queries = models.JSONField(null=True)
+    n_plus_one = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
+
+class RequestRollup(models.Model):
+    """
+    Aggregate of the requests to an endpoint within an hour, by method, status and user.
+
+    The endpoint is the name of the route that handled the requests (e.g. `project.<code>.query`),
+    or the path of the requests if they did not resolve to a named route.
+
+    Execution times are in milliseconds.
+    """
+
+    hour = models.DateTimeField()
+    endpoint = models.CharField(max_length=100, blank=True)
+    method = models.CharField(max_length=10, blank=True)
+    status = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
+    count = models.PositiveIntegerField()
+    exec_time_total = models.BigIntegerField()
+    exec_time_p50 = models.IntegerField(null=True)
+    exec_time_p90 = models.IntegerField(null=True)
+    exec_time_p95 = models.IntegerField(null=True)
+    exec_time_p99 = models.IntegerField(null=True)
+    exec_time_max = models.IntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["hour"]),
+            models.Index(fields=["endpoint"]),
+        ]
+
+
+class RequestRollupState(models.Model):
+    """
+    The end of the last hour of requests that was rolled up, from which the next rollup continues.
+
+    There is at most one row. Hours without requests are covered by it, so they are not scanned again.
+    """
+
+    end = models.DateTimeField()
+
+
+class SlowRequest(models.Model):
+    """
+    A request that took longer than the slow request threshold.
+
+    Records the Onyx query of the request, the compiled SQL of its main statement (and optionally its
+    execution plan), and the time spent in each phase of the request (e.g. query, prefetch, serialisation, rendering).
+
+    Times are in milliseconds.
+    """
+
+    date = models.DateTimeField(default=timezone.now)
+    endpoint = models.CharField(max_length=100, blank=True)
+    method = models.CharField(max_length=10, blank=True)
+    status = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
+    exec_time = models.IntegerField()
+    query = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    sql = models.TextField(blank=True)
+    params = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    explain = models.TextField(blank=True)
+    timings = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
+
+class Profile(models.Model):
+    """
+    Samples of the stack of a profiled request, in the collapsed stack format used by flamegraph tools.
+
+    The route is the name of the route that handled the request, or 'unmatched' if it did not resolve to a named route.
+
+    Times are in milliseconds.
+    """
+
+    date = models.DateTimeField(default=timezone.now)
+    endpoint = models.CharField(max_length=100, blank=True)
+    route = models.CharField(max_length=100, blank=True)
+    method = models.CharField(max_length=10, blank=True)
+    status = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
+    exec_time = models.IntegerField()
+    interval = models.FloatField()
+    samples = models.PositiveIntegerField()
+    stacks = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"]),
+            models.Index(fields=["route"]),
+        ]
+
+
+class ProfilerState(models.Model):
+    """
+    The number of requests that remain to be profiled, shared between workers.
+
+    There is at most one row. Profiling expires if the requests are not received before `expires`.
+    """
+
+    remaining = models.PositiveIntegerField(default=0)
+    expires = models.DateTimeField()
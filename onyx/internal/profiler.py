@@ -0,0 +1,113 @@
+import sys
+import threading
+from collections import Counter
+from datetime import timedelta
+from django.db.models import F
+from django.utils import timezone
+from .models import ProfilerState
+
+# Primary key of the single row of profiler state
+PROFILER_STATE_ID = 1
+
+
+def get_frame_name(frame) -> str:
+    """
+    Get the name of a `frame`, as its module and qualified function name.
+    """
+
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_qualname}"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of a thread every `interval` seconds, on a background thread.
+
+    The thread being profiled is not traced, so the overhead on it is limited to the sampling itself.
+    Samples are counted by stack, and can be output in the collapsed stack format used by flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self.run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            if frame is None:
+                return
+
+            stack = []
+            while frame is not None:
+                stack.append(get_frame_name(frame))
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapse(self) -> str:
+        """
+        Get the samples in the collapsed stack format: one line per stack, of semicolon-separated frames and a count.
+        """
+
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+
+def enable_profiling(requests: int, timeout: int) -> None:
+    """
+    Profile the next `requests` requests, on any worker that shares the database.
+
+    Requests that are not received within `timeout` seconds are not profiled.
+    """
+
+    ProfilerState.objects.update_or_create(
+        pk=PROFILER_STATE_ID,
+        defaults={
+            "remaining": requests,
+            "expires": timezone.now() + timedelta(seconds=timeout),
+        },
+    )
+
+
+def disable_profiling() -> None:
+    """
+    Stop profiling requests.
+    """
+
+    ProfilerState.objects.filter(pk=PROFILER_STATE_ID).delete()
+
+
+def claim_request() -> bool:
+    """
+    Claim one of the requests to be profiled, returning whether a request was claimed.
+
+    The count is decremented with a single conditional update, so concurrent claims cannot take it below zero.
+    """
+
+    return bool(
+        ProfilerState.objects.filter(
+            pk=PROFILER_STATE_ID,
+            remaining__gt=0,
+            expires__gt=timezone.now(),
+        ).update(remaining=F("remaining") - 1)
+    )
@@ -0,0 +1,92 @@
+import hashlib
+import re
+import time
+from collections import Counter
+
+# Placeholder lists (e.g. of an IN lookup) and numeric literals, which vary between executions of a statement
+PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def get_statement_shape(sql: str) -> str:
+    """
+    Get the shape of an `sql` statement, by collapsing placeholder lists, numeric literals and whitespace.
+
+    Statements that differ only in their parameters have the same shape.
+    """
+
+    sql = PLACEHOLDER_LIST.sub("(%s...)", sql)
+    sql = NUMBER.sub("?", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def get_fingerprint(shape: str) -> str:
+    """
+    Get a short fingerprint of a statement `shape`.
+    """
+
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+
+
+class QueryRecorder:
+    """
+    Execute wrapper that records the number, total time and shapes of the statements executed on a connection.
+
+    Usage:
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            ...
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.shapes = Counter()
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        _t = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - _t
+            self.count += 1
+
+            shape = get_statement_shape(sql)
+            fingerprint = get_fingerprint(shape)
+            self.shapes[fingerprint] += 1
+            self.statements.setdefault(fingerprint, shape)
+
+    @property
+    def time_ms(self) -> int:
+        """
+        Total time spent executing statements, in milliseconds.
+        """
+
+        return int(self.time * 1000)
+
+    @property
+    def max_repeats(self) -> int:
+        """
+        Number of executions of the most repeated statement shape.
+        """
+
+        return max(self.shapes.values(), default=0)
+
+    def get_repeated(self, limit: int = 5, length: int = 200) -> list[dict]:
+        """
+        Get the most repeated statement shapes (up to `limit`), with their fingerprint and number of executions.
+
+        Statements are truncated to `length` characters.
+        """
+
+        return [
+            {
+                "fingerprint": fingerprint,
+                "count": count,
+                "sql": self.statements[fingerprint][:length],
+            }
+            for fingerprint, count in self.shapes.most_common(limit)
+            if count > 1
+        ]
@@ -1,4 +1,6 @@
+import orjson
 from rest_framework import renderers, status
+from .slowlog import timed
 
 
 class OnyxJSONRenderer(renderers.JSONRenderer):
@@ -6,6 +8,16 @@ class OnyxJSONRenderer(renderers.JSONRenderer):
         """
         Render `data` into JSON, returning a bytestring.
         """
+
+        request = (renderer_context or {}).get("request")
+        with timed(request, "rendering"):
+            return self.render_envelope(data, accepted_media_type, renderer_context)
+
+    def render_envelope(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON within the response envelope, returning a bytestring.
+        """
+
         render_data = {}
         if renderer_context:
             view = renderer_context["view"]
@@ -29,10 +41,41 @@ class OnyxJSONRenderer(renderers.JSONRenderer):
                     render_data["next"] = view.paginator.get_next_link()
                     render_data["previous"] = view.paginator.get_previous_link()
 
+                # The data is referenced by the envelope, not copied into it
                 render_data["data"] = data
 
-        return super().render(
-            render_data,
-            accepted_media_type=accepted_media_type,
-            renderer_context=renderer_context,
+        # orjson only supports an indent of two spaces
+        # So for any requested indentation, fall back to the stdlib encoder
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(
+                render_data,
+                accepted_media_type=accepted_media_type,
+                renderer_context=renderer_context,
+            )
+
+        return self.dumps(render_data)
+
+    def dumps(self, data) -> bytes:
+        """
+        Serialize `data` into JSON using orjson, returning a bytestring.
+
+        Any types that orjson cannot natively serialize (e.g. decimals, lazy strings, querysets)
+        are handled by the default method of the stdlib encoder, so the output matches it.
+        """
+
+        # Non-string keys are needed for e.g. nested errors keyed by list index
+        # And UTC datetimes are rendered with a 'Z' suffix, matching the stdlib encoder
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
         )
+
+        # As with the stdlib encoder, fully escape \u2028 and \u2029
+        # This ensures we output JSON that is a strict javascript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+
+        return ret
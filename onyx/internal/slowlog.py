@@ -0,0 +1,87 @@
+import time
+from contextlib import contextmanager, nullcontext
+from django.db import connection
+
+
+class RequestTimings:
+    """
+    Time spent in each phase of a request, and the statements executed in captured phases.
+
+    Attached to a request by the LogSlowRequests middleware, for views and renderers to record into.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.statements = []
+        self.query = None
+
+    @contextmanager
+    def phase(self, name: str, capture: bool = False):
+        """
+        Time a phase of the request. If `capture` is enabled, the statements executed during the phase are recorded.
+        """
+
+        _t = time.perf_counter()
+        try:
+            if capture:
+                with connection.execute_wrapper(self.capture):
+                    yield
+            else:
+                yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - _t
+
+    def capture(self, execute, sql, params, many, context):
+        self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    def get_phases_ms(self) -> dict[str, int]:
+        """
+        Get the time spent in each phase, in milliseconds.
+        """
+
+        return {name: int(seconds * 1000) for name, seconds in self.phases.items()}
+
+
+def get_timings(request) -> RequestTimings | None:
+    """
+    Get the timings attached to a `request`, or `None` if the request is not being timed.
+    """
+
+    return getattr(request, "timings", None)
+
+
+def timed(request, name: str, capture: bool = False):
+    """
+    Time a phase of a `request`, if the request is being timed.
+    """
+
+    timings = get_timings(request)
+
+    if timings is None:
+        return nullcontext()
+
+    return timings.phase(name, capture=capture)
+
+
+def explain(sql: str, params) -> str:
+    """
+    Get the execution plan of an `sql` statement.
+
+    On PostgreSQL, the statement is executed to include the actual times and buffer usage in the plan.
+    Only SELECT statements are explained.
+    """
+
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+
+    if connection.vendor == "postgresql":
+        prefix = connection.ops.explain_query_prefix(analyze=True, buffers=True)
+    else:
+        prefix = connection.ops.explain_query_prefix()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(
+            " ".join(str(value) for value in row) for row in cursor.fetchall()
+        )
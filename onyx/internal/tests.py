@@ -1,3 +1,1080 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import random
+import tempfile
+import uuid
+from decimal import Decimal
+from datetime import date, datetime, timezone
+from unittest import mock, skipUnless
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, StreamingHttpResponse
+import threading
+import time
+import zlib
+import zstandard
+from datetime import timedelta
+import prometheus_client
+from django.core.management import call_command
+from django.utils import timezone as django_timezone
+from django.db import connection, DatabaseError, OperationalError
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    RequestFactory,
+    override_settings,
+)
+from rest_framework import renderers, status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from data.tests.utils import OnyxTestCase, generate_test_data
+from utils.stats import calculate_fasta_stats, calculate_fasta_stats_python
+from .renderers import OnyxJSONRenderer
+from .middleware import CompressResponse, RecordQueries
+from .queries import QueryRecorder, get_statement_shape
+from .models import Request, RequestRollup, RequestRollupState, SlowRequest, Profile
+from .management.commands import requestlog
+from .management.commands.requestlog import (
+    percentile,
+    parse_partition_bound,
+    get_partition_name,
+    get_default_partition_name,
+    get_partitions,
+    is_partitioned,
+)
+from .writer import RequestLogWriter
+from .profiler import (
+    SamplingProfiler,
+    enable_profiling,
+    disable_profiling,
+    claim_request,
+)
 
-# Create your tests here.
+
+class TestOnyxJSONRenderer(SimpleTestCase):
+    def setUp(self):
+        """
+        Set up the renderers and some data containing non-JSON types.
+        """
+
+        self.stdlib_renderer = renderers.JSONRenderer()
+        self.onyx_renderer = OnyxJSONRenderer()
+        self.data = {
+            "text": "hello world",
+            "integer": 42,
+            "float": 42.5,
+            "boolean": True,
+            "none": None,
+            "date": date(2024, 1, 1),
+            "datetime": datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            "naive_datetime": datetime(2024, 1, 1, 12, 30, 15),
+            "decimal": Decimal("42.50"),
+            "uuid": uuid.uuid4(),
+            "errors": {0: ["This field is required."]},
+            "records": [{"test_id": 1}, {"test_id": 2}],
+        }
+
+    def test_matches_stdlib(self):
+        """
+        Test that the Onyx renderer output matches the stdlib renderer output.
+        """
+
+        self.assertEqual(
+            self.onyx_renderer.dumps(self.data),
+            self.stdlib_renderer.render(self.data),
+        )
+
+    def test_envelope(self):
+        """
+        Test that the Onyx renderer wraps the data in the status envelope.
+        """
+
+        rendered = self.onyx_renderer.render(
+            self.data["records"],
+            renderer_context={"view": object(), "response": Response(status=200)},
+        )
+        self.assertEqual(
+            json.loads(rendered),
+            {"status": "success", "code": 200, "data": self.data["records"]},
+        )
+
+    def test_indent(self):
+        """
+        Test that requesting indentation falls back to the stdlib renderer.
+        """
+
+        renderer_context = {"view": object(), "response": Response(status=200)}
+        rendered = self.onyx_renderer.render(
+            self.data["records"],
+            accepted_media_type="application/json; indent=4",
+            renderer_context=renderer_context,
+        )
+        self.assertEqual(
+            rendered,
+            self.stdlib_renderer.render(
+                {"status": "success", "code": 200, "data": self.data["records"]},
+                accepted_media_type="application/json; indent=4",
+                renderer_context=renderer_context,
+            ),
+        )
+
+
+class TestCompressResponse(SimpleTestCase):
+    def setUp(self):
+        """
+        Set up the request factory and some compressible content.
+        """
+
+        self.factory = RequestFactory()
+        self.content = b"hello world " * 1000
+
+    def get_response(self, response, accept_encoding):
+        """
+        Pass a response through the middleware, for a request with the given `accept_encoding`.
+        """
+
+        middleware = CompressResponse(lambda request: response)
+        request = self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_gzip(self):
+        """
+        Test that a response is compressed with gzip.
+        """
+
+        response = self.get_response(HttpResponse(self.content), "gzip")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(gzip.decompress(response.content), self.content)
+
+    def test_zstd(self):
+        """
+        Test that a response is compressed with zstd, in preference to gzip.
+        """
+
+        response = self.get_response(HttpResponse(self.content), "gzip, zstd")
+        self.assertEqual(response.headers["Content-Encoding"], "zstd")
+        self.assertEqual(
+            zstandard.ZstdDecompressor().decompressobj().decompress(response.content),
+            self.content,
+        )
+
+    def test_quality(self):
+        """
+        Test that encodings are negotiated using their quality values.
+        """
+
+        response = self.get_response(HttpResponse(self.content), "zstd;q=0, gzip;q=0.5")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+
+        response = self.get_response(HttpResponse(self.content), "*")
+        self.assertIn(response.headers["Content-Encoding"], {"gzip", "zstd"})
+
+        for accept_encoding in ["", "identity", "gzip;q=0, zstd;q=0", "br"]:
+            response = self.get_response(HttpResponse(self.content), accept_encoding)
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response.content, self.content)
+
+    def test_min_size(self):
+        """
+        Test that small responses are not compressed.
+        """
+
+        response = self.get_response(HttpResponse(b"hello world"), "gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, b"hello world")
+
+    def test_streaming(self):
+        """
+        Test that a streaming response is compressed.
+        """
+
+        response = self.get_response(
+            StreamingHttpResponse(iter([self.content] * 10)), "gzip"
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), self.content * 10
+        )
+
+    def test_streaming_flush(self):
+        """
+        Test that each chunk of a streaming response can be decompressed as soon as it is received.
+        """
+
+        chunks = [f'{{"index": {i}}}\n'.encode() for i in range(5)]
+        decompressors = {
+            "gzip": lambda: zlib.decompressobj(31),
+            "zstd": lambda: zstandard.ZstdDecompressor().decompressobj(),
+        }
+
+        for encoding, decompressor in decompressors.items():
+            response = self.get_response(StreamingHttpResponse(iter(chunks)), encoding)
+            self.assertEqual(response.headers["Content-Encoding"], encoding)
+
+            d = decompressor()
+            received = [d.decompress(data) for data in response.streaming_content]
+            self.assertEqual(received[: len(chunks)], chunks)
+
+
+class TestRequestLogWriter(TransactionTestCase):
+    def wait_for_count(self, count: int, timeout: float = 5) -> int:
+        """
+        Wait for the number of logged requests to reach `count`, returning the final number.
+        """
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # SQLite may report the table as locked while the writer thread is inserting
+            try:
+                if Request.objects.count() >= count:
+                    break
+            except OperationalError:
+                pass
+
+            time.sleep(0.01)
+
+        return Request.objects.count()
+
+    def entry(self) -> Request:
+        """
+        Create an unsaved request log entry.
+        """
+
+        return Request(endpoint="/projects/", method="GET", status=200)
+
+    def test_batch_size(self):
+        """
+        Test that entries are written once a batch is full.
+        """
+
+        writer = RequestLogWriter(batch_size=3, flush_interval=60, queue_size=100)
+        self.addCleanup(writer.stop)
+
+        for _ in range(2):
+            writer.put(self.entry())
+
+        time.sleep(0.1)
+        self.assertEqual(Request.objects.count(), 0)
+
+        writer.put(self.entry())
+        self.assertEqual(self.wait_for_count(3), 3)
+
+    def test_flush_interval(self):
+        """
+        Test that a partial batch is written after the flush interval.
+        """
+
+        writer = RequestLogWriter(batch_size=100, flush_interval=0.1, queue_size=100)
+        self.addCleanup(writer.stop)
+
+        writer.put(self.entry())
+        self.assertEqual(self.wait_for_count(1), 1)
+
+    def test_flush_and_stop(self):
+        """
+        Test that queued entries are written on flush, and on stop.
+        """
+
+        writer = RequestLogWriter(batch_size=100, flush_interval=60, queue_size=100)
+
+        writer.put(self.entry())
+        writer.flush()
+        self.assertEqual(Request.objects.count(), 1)
+
+        writer.put(self.entry())
+        writer.stop()
+        self.assertEqual(Request.objects.count(), 2)
+        self.assertEqual(writer.written, 2)
+
+    def test_dropped(self):
+        """
+        Test that entries are dropped and counted when the queue is full.
+        """
+
+        writing = threading.Event()
+        release = threading.Event()
+
+        class BlockedWriter(RequestLogWriter):
+            def write(self, batch):
+                writing.set()
+                release.wait(5)
+                super().write(batch)
+
+        writer = BlockedWriter(batch_size=1, flush_interval=60, queue_size=1)
+        self.addCleanup(writer.stop)
+        self.addCleanup(release.set)
+
+        # The first entry is taken by the writer, which blocks
+        self.assertTrue(writer.put(self.entry()))
+        self.assertTrue(writing.wait(5))
+
+        # The second entry fills the queue, so the third is dropped
+        self.assertTrue(writer.put(self.entry()))
+        self.assertFalse(writer.put(self.entry()))
+        self.assertEqual(writer.dropped, 1)
+
+        release.set()
+        writer.flush()
+        self.assertEqual(Request.objects.count(), 2)
+
+
+class TestRequestLogCommand(TestCase):
+    def setUp(self):
+        """
+        Create requests within a complete hour, and an old request.
+        """
+
+        self.hour = (django_timezone.now() - timedelta(hours=3)).replace(
+            minute=0, second=0, microsecond=0
+        )
+
+        requests = []
+        for i in range(1, 101):
+            requests.append(
+                Request(
+                    endpoint=f"/projects/testproject/C-{i:010d}/",
+                    method="GET",
+                    status=200,
+                    exec_time=i,
+                    date=self.hour + timedelta(seconds=i),
+                )
+            )
+        requests.append(
+            Request(
+                endpoint="/unknown/",
+                method="POST",
+                status=404,
+                exec_time=5,
+                date=self.hour + timedelta(minutes=30),
+            )
+        )
+        requests.append(
+            Request(
+                endpoint="/unknown/",
+                method="GET",
+                status=200,
+                exec_time=5,
+                date=self.hour - timedelta(days=30),
+            )
+        )
+        Request.objects.bulk_create(requests)
+
+    def test_percentile(self):
+        """
+        Test the nearest-rank percentile, and parsing of partition bounds.
+        """
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+        self.assertEqual(
+            parse_partition_bound(
+                "FOR VALUES FROM ('2024-01-01 00:00:00+00') TO ('2024-01-02 00:00:00+00')"
+            ),
+            datetime(2024, 1, 2, tzinfo=timezone.utc),
+        )
+        self.assertIsNone(parse_partition_bound("DEFAULT"))
+
+    def test_rollup(self):
+        """
+        Test that complete hours of requests are rolled up by endpoint, method, status and user.
+        """
+
+        call_command("requestlog", "rollup", "--quiet")
+
+        rollup = RequestRollup.objects.get(
+            hour=self.hour, endpoint="project.testproject.climb_id"
+        )
+        self.assertEqual(rollup.method, "GET")
+        self.assertEqual(rollup.count, 100)
+        self.assertEqual(rollup.exec_time_total, 5050)
+        self.assertEqual(rollup.exec_time_p50, 50)
+        self.assertEqual(rollup.exec_time_p99, 99)
+        self.assertEqual(rollup.exec_time_max, 100)
+        self.assertTrue(
+            RequestRollup.objects.filter(
+                hour=self.hour, endpoint="/unknown/", status=404
+            ).exists()
+        )
+        self.assertEqual(RequestRollup.objects.filter(hour=self.hour).count(), 2)
+
+        # Rolled up hours are not rolled up again, unless recomputed
+        Request.objects.create(
+            endpoint="/unknown/",
+            method="POST",
+            status=404,
+            exec_time=5,
+            date=self.hour + timedelta(minutes=45),
+        )
+        call_command("requestlog", "rollup", "--quiet")
+        self.assertEqual(
+            RequestRollup.objects.get(hour=self.hour, endpoint="/unknown/").count, 1
+        )
+
+        call_command("requestlog", "rollup", "--recompute", "4", "--quiet")
+        self.assertEqual(
+            RequestRollup.objects.get(hour=self.hour, endpoint="/unknown/").count, 2
+        )
+
+    def test_rollup_state(self):
+        """
+        Test that rollups continue from the end of the last rolled up hour, without rescanning hours without requests.
+        """
+
+        now = django_timezone.now()
+        end = (now - timedelta(minutes=15)).replace(minute=0, second=0, microsecond=0)
+
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            call_command("requestlog", "rollup", "--quiet")
+        self.assertEqual(RequestRollupState.objects.get().end, end)
+
+        # Only the hours since the last rollup are rolled up, although the hours before them had no requests
+        with mock.patch(
+            "django.utils.timezone.now", return_value=now + timedelta(hours=3)
+        ), mock.patch.object(requestlog.Command, "rollup_hour") as rollup_hour:
+            call_command("requestlog", "rollup", "--quiet")
+        self.assertEqual(
+            [call.args[0] for call in rollup_hour.call_args_list],
+            [end + timedelta(hours=i) for i in range(3)],
+        )
+        self.assertEqual(RequestRollupState.objects.get().end, end + timedelta(hours=3))
+
+    def test_prune(self):
+        """
+        Test that requests older than the retention period are removed.
+        """
+
+        call_command("requestlog", "prune", "--retention", "7", "--dry-run", "--quiet")
+        self.assertEqual(Request.objects.count(), 102)
+
+        call_command("requestlog", "prune", "--retention", "7", "--quiet")
+        self.assertEqual(Request.objects.count(), 101)
+
+    def get_partition(self, request: Request) -> str:
+        """
+        Get the name of the partition of the request log that holds a `request`.
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM "{Request._meta.db_table}" WHERE "id" = %s',
+                [request.pk],
+            )
+            return cursor.fetchone()[0]
+
+    @skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+    def test_partition(self):
+        """
+        Test that daily partitions are created, and that requests for them are moved out of the default partition.
+        """
+
+        table = Request._meta.db_table
+        default = get_default_partition_name(table)
+        self.assertTrue(is_partitioned(table))
+
+        date = django_timezone.now() + timedelta(days=3)
+        request = Request.objects.create(
+            endpoint="/unknown/", method="GET", status=200, date=date
+        )
+        self.assertEqual(self.get_partition(request), default)
+
+        call_command("requestlog", "partition", "--days-ahead", "5", "--quiet")
+        day = date.astimezone(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        self.assertEqual(self.get_partition(request), get_partition_name(table, day))
+
+        # Partitions are only created beyond the last existing partition
+        partitions = get_partitions(table)
+        call_command("requestlog", "partition", "--days-ahead", "5", "--quiet")
+        self.assertEqual(len(get_partitions(table)), len(partitions))
+
+    @skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+    def test_prune_partitions(self):
+        """
+        Test that expired partitions are dropped, and that expired requests in the default partition are removed.
+        """
+
+        table = Request._meta.db_table
+        default = get_default_partition_name(table)
+        now = django_timezone.now()
+        call_command("requestlog", "partition", "--days-ahead", "2", "--quiet")
+        Request.objects.create(
+            endpoint="/unknown/",
+            method="GET",
+            status=200,
+            date=now + timedelta(days=4),
+        )
+        kept = Request.objects.create(
+            endpoint="/unknown/",
+            method="GET",
+            status=200,
+            date=now + timedelta(days=6),
+        )
+
+        # Partitions cannot be dropped with deferred foreign key checks pending within the test transaction
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        with mock.patch(
+            "django.utils.timezone.now", return_value=now + timedelta(days=10)
+        ):
+            call_command("requestlog", "prune", "--retention", "5", "--quiet")
+
+        self.assertEqual([name for name, _ in get_partitions(table)], [default])
+        self.assertEqual(list(Request.objects.all()), [kept])
+
+
+class TestMetrics(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse("metrics")
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def get_sample(self, name: str, labels: dict) -> float:
+        """
+        Get the current value of a metric sample, or zero if it has not been recorded.
+        """
+
+        value = prometheus_client.REGISTRY.get_sample_value(name, labels)  # type: ignore
+        return value or 0
+
+    def test_requests(self):
+        """
+        Test that request durations are recorded by route name, method and status.
+        """
+
+        labels = {"route": "project.testproject", "method": "POST", "status": "201"}
+        before = self.get_sample("onyx_request_duration_seconds_count", labels)
+
+        response = self.client.post(
+            reverse("project.testproject", kwargs={"code": "testproject"}),
+            data=generate_test_data(n=1)[0],
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.get_sample("onyx_request_duration_seconds_count", labels), before + 1
+        )
+
+        # Paths that do not resolve are grouped together
+        labels = {"route": "unmatched", "method": "GET", "status": "404"}
+        before = self.get_sample("onyx_request_duration_seconds_count", labels)
+        self.client.get("/does/not/exist/")
+        self.assertEqual(
+            self.get_sample("onyx_request_duration_seconds_count", labels), before + 1
+        )
+
+    def test_records(self):
+        """
+        Test that records created and returned are counted by project.
+        """
+
+        created = {"project": "testproject", "action": "created"}
+        returned = {"project": "testproject", "action": "returned"}
+        before_created = self.get_sample("onyx_records_total", created)
+        before_returned = self.get_sample("onyx_records_total", returned)
+
+        for data in generate_test_data(n=3):
+            response = self.client.post(
+                reverse("project.testproject", kwargs={"code": "testproject"}),
+                data=data,
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(
+            reverse("project.testproject", kwargs={"code": "testproject"})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_sample("onyx_records_total", created), before_created + 3
+        )
+        self.assertEqual(
+            self.get_sample("onyx_records_total", returned), before_returned + 3
+        )
+
+    def test_endpoint(self):
+        """
+        Test that the metrics endpoint returns the metrics to admins only.
+        """
+
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"onyx_request_duration_seconds", response.content)
+
+        self.user.is_staff = False
+        self.client.force_authenticate(self.user)  # type: ignore
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestSaveRequest(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse("project.testproject", kwargs={"code": "testproject"})
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def test_failed_insert(self):
+        """
+        Test that a request is still successful if it cannot be logged (e.g. if there is no partition for it).
+        """
+
+        with mock.patch.object(
+            Request, "save", side_effect=DatabaseError("no partition")
+        ):
+            response = self.client.get(self.endpoint)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Request.objects.exists())
+
+        # The connection remains usable for later requests
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Request.objects.count(), 1)
+
+
+class TestQueryRecorder(TestCase):
+    def test_statement_shape(self):
+        """
+        Test that statements differing only in their parameters have the same shape.
+        """
+
+        self.assertEqual(
+            get_statement_shape('SELECT * FROM "t1" WHERE "id" IN (%s, %s)  LIMIT 21'),
+            get_statement_shape('SELECT * FROM "t1" WHERE "id" IN (%s) LIMIT 1'),
+        )
+        self.assertNotEqual(
+            get_statement_shape('SELECT * FROM "t1" WHERE "id" = %s'),
+            get_statement_shape('SELECT * FROM "t2" WHERE "id" = %s'),
+        )
+
+    def test_recorder(self):
+        """
+        Test that the recorder counts statements, and the repeats of each statement shape.
+        """
+
+        recorder = QueryRecorder()
+
+        with connection.execute_wrapper(recorder):
+            for i in range(3):
+                Request.objects.filter(status=200 + i).exists()
+            Request.objects.count()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.max_repeats, 3)
+        self.assertGreaterEqual(recorder.time_ms, 0)
+
+        [repeated] = recorder.get_repeated()
+        self.assertEqual(repeated["count"], 3)
+        self.assertIn("internal_request", repeated["sql"])
+
+
+class TestRecordQueries(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse("project.testproject", kwargs={"code": "testproject"})
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    @override_settings(QUERY_LOG={"ENABLED": True, "N_PLUS_ONE_THRESHOLD": 1000})
+    def test_request_log(self):
+        """
+        Test that the statements of a request are stored on the request log, and returned as headers to staff.
+        """
+
+        response = self.client.post(self.endpoint, data=generate_test_data(n=1)[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertIn("X-Query-Time", response)
+        self.assertNotIn("X-Query-N-Plus-One", response)
+
+        entry = Request.objects.latest("id")
+        self.assertEqual(entry.query_count, int(response["X-Query-Count"]))
+        self.assertEqual(entry.query_time, int(response["X-Query-Time"]))
+        self.assertFalse(entry.n_plus_one)
+
+        # Headers are only returned to staff
+        self.user.is_staff = False
+        self.client.force_authenticate(self.user)  # type: ignore
+        response = self.client.get(self.endpoint)
+        self.assertNotIn("X-Query-Count", response)
+        self.assertIsNotNone(Request.objects.latest("id").query_count)
+
+    @override_settings(QUERY_LOG={"ENABLED": True, "N_PLUS_ONE_THRESHOLD": 2})
+    def test_n_plus_one(self):
+        """
+        Test that requests repeating a statement shape above the threshold are flagged.
+        """
+
+        response = self.client.post(self.endpoint, data=generate_test_data(n=1)[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("X-Query-N-Plus-One", response)
+
+        entry = Request.objects.latest("id")
+        self.assertTrue(entry.n_plus_one)
+        self.assertEqual(
+            entry.repeated_queries[0]["fingerprint"], response["X-Query-N-Plus-One"]
+        )
+
+    def test_threshold(self):
+        """
+        Test that a threshold below 2 is rejected, as a statement is only repeated once executed twice.
+        """
+
+        for threshold in [0, 1]:
+            with override_settings(
+                QUERY_LOG={"ENABLED": True, "N_PLUS_ONE_THRESHOLD": threshold}
+            ):
+                with self.assertRaises(ImproperlyConfigured):
+                    RecordQueries(lambda request: None)
+
+    def test_disabled(self):
+        """
+        Test that statements are not recorded by default.
+        """
+
+        response = self.client.post(self.endpoint, data=generate_test_data(n=1)[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("X-Query-Count", response)
+        self.assertIsNone(Request.objects.latest("id").query_count)
+
+
+class TestLogSlowRequests(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        self.endpoint = reverse(
+            "project.testproject.query", kwargs={"code": "testproject"}
+        )
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def create_records(self, n: int = 3):
+        """
+        Create some records to query.
+
+        This is done within each test, as the middleware is loaded by the first request of the test client.
+        """
+
+        for data in generate_test_data(n=n, nested=True):
+            response = self.client.post(
+                reverse("project.testproject", kwargs={"code": "testproject"}),
+                data=data,
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(
+        SLOW_REQUEST_LOG={"ENABLED": True, "THRESHOLD": 0, "EXPLAIN_SAMPLE_RATE": 1}
+    )
+    def test_slow_request(self):
+        """
+        Test that a slow query is logged with its query, SQL, plan and the time spent in each phase.
+        """
+
+        self.create_records()
+        query = {"tests__gte": 0}
+        response = self.client.post(self.endpoint, data=query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["data"]), 3)
+
+        entry = SlowRequest.objects.get(endpoint=self.endpoint)
+        self.assertEqual(entry.query, query)
+        self.assertEqual(entry.user, self.user)
+        self.assertTrue(entry.sql.lstrip().upper().startswith("SELECT"))
+        self.assertIsNotNone(entry.params)
+        self.assertTrue(entry.explain)
+        self.assertEqual(
+            set(entry.timings), {"query", "prefetch", "serialisation", "rendering"}
+        )
+
+    @override_settings(
+        SLOW_REQUEST_LOG={"ENABLED": True, "THRESHOLD": 0, "EXPLAIN_SAMPLE_RATE": 0}
+    )
+    def test_summarise(self):
+        """
+        Test that a slow summary is logged with its summary statement, without a plan.
+        """
+
+        self.create_records()
+        response = self.client.post(
+            self.endpoint + "?summarise=country", data={"tests__gte": 0}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        entry = SlowRequest.objects.get(endpoint=self.endpoint)
+        self.assertIn("COUNT", entry.sql.upper())
+        self.assertFalse(entry.explain)
+        self.assertIn("query", entry.timings)
+
+    @override_settings(
+        SLOW_REQUEST_LOG={"ENABLED": True, "THRESHOLD": 60000, "EXPLAIN_SAMPLE_RATE": 1}
+    )
+    def test_threshold(self):
+        """
+        Test that requests faster than the threshold are not logged.
+        """
+
+        self.create_records()
+        response = self.client.post(self.endpoint, data={"tests__gte": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(SlowRequest.objects.exists())
+
+
+def busy(seconds: float):
+    """
+    Keep the current thread busy for a number of `seconds`.
+    """
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestSamplingProfiler(SimpleTestCase):
+    def test_samples(self):
+        """
+        Test that the profiler samples the stack of the profiled thread.
+        """
+
+        profiler = SamplingProfiler(threading.get_ident(), interval=0.001)
+        profiler.start()
+        busy(0.1)
+        profiler.stop()
+
+        self.assertGreater(profiler.samples, 0)
+        lines = profiler.collapse().splitlines()
+        self.assertEqual(len(lines), len(profiler.stacks))
+
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("internal.tests.busy" in line for line in lines))
+
+
+@override_settings(
+    PROFILER={
+        "ENABLED": True,
+        "INTERVAL": 0.001,
+        "MAX_REQUESTS": 2,
+        "TIMEOUT": 60,
+    }
+)
+class TestProfileRequests(OnyxTestCase):
+    def setUp(self):
+        """
+        Create a user with the required permissions.
+        """
+
+        super().setUp()
+        disable_profiling()
+        self.endpoint = reverse("project.testproject", kwargs={"code": "testproject"})
+        self.user = self.setup_user(
+            "testuser", roles=["is_staff"], groups=["testproject.admin"]
+        )
+
+    def tearDown(self):
+        disable_profiling()
+
+    def test_header(self):
+        """
+        Test that the header enables profiling of the next requests (up to the maximum), for staff only.
+        """
+
+        self.user.is_staff = False
+        self.client.force_authenticate(self.user)  # type: ignore
+        self.client.get(self.endpoint, HTTP_X_PROFILE_REQUESTS="5")
+        self.client.get(self.endpoint)
+        self.assertFalse(Profile.objects.exists())
+
+        self.user.is_staff = True
+        self.client.force_authenticate(self.user)  # type: ignore
+        response = self.client.get(self.endpoint, HTTP_X_PROFILE_REQUESTS="5")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Profile.objects.exists())
+
+        for _ in range(3):
+            self.client.get(self.endpoint)
+
+        self.assertEqual(Profile.objects.count(), 2)
+        profile = Profile.objects.first()
+        assert profile is not None
+        self.assertEqual(profile.route, "project.testproject")
+        self.assertEqual(profile.user, self.user)
+        self.assertEqual(profile.status, status.HTTP_200_OK)
+
+    def test_claim(self):
+        """
+        Test that requests are claimed until none remain, and that profiling expires.
+        """
+
+        enable_profiling(2, 60)
+        self.assertEqual([claim_request() for _ in range(3)], [True, True, False])
+
+        enable_profiling(2, 0)
+        self.assertFalse(claim_request())
+
+        enable_profiling(2, 60)
+        disable_profiling()
+        self.assertFalse(claim_request())
+
+    def test_command_across_caches(self):
+        """
+        Test that profiling enabled by the command applies to requests handled with a separate cache (e.g. by a worker).
+        """
+
+        def cache(location: str) -> dict:
+            return {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": location,
+                }
+            }
+
+        with override_settings(CACHES=cache("command")):
+            call_command("profile", "enable", "--requests", "1", quiet=True)
+
+        with override_settings(CACHES=cache("worker")):
+            self.client.get(self.endpoint)
+
+        self.assertEqual(Profile.objects.count(), 1)
+
+    def test_command(self):
+        """
+        Test that the profile command enables profiling, and exports the profiles.
+        """
+
+        call_command("profile", "enable", "--requests", "1", quiet=True)
+        self.client.get(self.endpoint)
+        self.client.get(self.endpoint)
+        self.assertEqual(Profile.objects.count(), 1)
+
+        # Stacks are prefixed with the route of their profile
+        profile = Profile.objects.get()
+        profile.stacks = "a;b 2\na;c 1"
+        profile.save()
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "stacks.txt")
+            call_command(
+                "profile",
+                "export",
+                "--route",
+                profile.route,
+                "--output",
+                output,
+                quiet=True,
+            )
+            with open(output) as f:
+                self.assertEqual(
+                    f.read().splitlines(),
+                    ["project.testproject;a;b 2", "project.testproject;a;c 1"],
+                )
+
+
+class TestCalculateFastaStats(SimpleTestCase):
+    def setUp(self):
+        """
+        Create a temporary directory for FASTA files.
+        """
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.random = random.Random(42)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_fasta(self, seqs: list[str]) -> str:
+        """
+        Write `seqs` to a FASTA file, wrapping lines at 60 characters, and return its path.
+        """
+
+        path = os.path.join(self.directory.name, "seqs.fasta")
+        with open(path, "w") as fasta:
+            for i, seq in enumerate(seqs):
+                fasta.write(f">seq-{i} description\n")
+                for j in range(0, len(seq), 60):
+                    fasta.write(seq[j : j + 60] + "\n")
+
+        return path
+
+    def random_seq(self, length: int) -> str:
+        """
+        Generate a random sequence of runs of bases, including ambiguous, masked, gap and invalid characters.
+        """
+
+        alphabets = ["ACGT", "acgt", "GC", "WSMKRY", "BDHV", "NX", "n", "-", "?*é", "ſ"]
+        seq = []
+        while len(seq) < length:
+            alphabet = self.random.choice(alphabets)
+            run = self.random.choice([1, 2, 5, 20, 100])
+            seq.extend(self.random.choice(alphabet) for _ in range(run))
+
+        return "".join(seq[:length])
+
+    def test_matches_python(self):
+        """
+        Test that the vectorised stats match those calculated base-by-base, on random sequences.
+        """
+
+        for _ in range(50):
+            seqs = [
+                self.random_seq(self.random.choice([0, 1, 10, 200, 1000]))
+                for _ in range(self.random.randint(1, 5))
+            ]
+            path = self.write_fasta(seqs)
+
+            for decimal_places in [None, 2]:
+                self.assertEqual(
+                    calculate_fasta_stats(path, decimal_places=decimal_places),
+                    calculate_fasta_stats_python(path, decimal_places=decimal_places),
+                )
+
+    def test_runs_across_seqs(self):
+        """
+        Test that runs continue across sequences, and that gaps only count once they end.
+        """
+
+        path = self.write_fasta(["ACGTNN", "", "NNACGT", "ACN", "NNNNNNNN"])
+        stats = calculate_fasta_stats(path)
+        self.assertEqual(stats, calculate_fasta_stats_python(path))
+        self.assertEqual(stats["longest_acgt"], 6)
+        self.assertEqual(stats["longest_masked"], 9)
+        self.assertEqual(stats["longest_gap"], 4)
+        self.assertEqual(stats["longest_ungap"], 6)
+
+    def test_empty(self):
+        """
+        Test the stats of a FASTA file without any bases.
+        """
+
+        path = self.write_fasta([])
+        self.assertEqual(
+            calculate_fasta_stats(path), calculate_fasta_stats_python(path)
+        )
@@ -1,5 +1,9 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.views import APIView
+from accounts.permissions import Admin
+from .metrics import generate_metrics
 
 
 def custom_page_not_found_view(*args, **kwargs):
@@ -44,3 +48,15 @@ def custom_bad_request_view(*args, **kwargs):
         },
         status=status.HTTP_400_BAD_REQUEST,
     )
+
+
+class MetricsView(APIView):
+    permission_classes = Admin
+
+    def get(self, request: Request) -> HttpResponse:
+        """
+        Get the request and record metrics of Onyx, in the Prometheus text format.
+        """
+
+        content, content_type = generate_metrics()
+        return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,195 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from django.db import close_old_connections, connections
+from .models import Request
+from .metrics import count_dropped_requests
+
+logger = logging.getLogger(__name__)
+
+# Sentinels placed on the queue to wake the background thread
+_FLUSH = object()
+_STOP = object()
+
+
+class RequestLogWriter:
+    """
+    Writes request log entries from a bounded queue, using bulk inserts on a background thread.
+
+    Entries are inserted every `batch_size` entries, or every `flush_interval` seconds, whichever comes first.
+    If the queue is full, entries are dropped (and counted) rather than blocking the request.
+    Any queued entries are written when the process exits.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, queue_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self) -> None:
+        """
+        Start the background thread, if it is not already running in this process.
+
+        The thread is (re)started in each process, as threads do not survive a fork (e.g. of a gunicorn worker).
+        """
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+
+            if self._pid is None:
+                atexit.register(self.stop)
+
+            # Entries queued before a fork belong to the parent process
+            if self._pid is not None:
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self.run, name="request-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def put(self, entry: Request) -> bool:
+        """
+        Queue an `entry` to be written, without blocking.
+
+        Returns:
+            Whether the entry was queued. If the queue is full, the entry is dropped.
+        """
+
+        self.start()
+
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+
+            count_dropped_requests()
+
+            # Log the first drop, and then every 1000 drops, to avoid flooding the logs
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(
+                    "Request log queue is full. %d entries dropped so far.", dropped
+                )
+            return False
+
+        return True
+
+    def flush(self) -> None:
+        """
+        Block until all queued entries have been written.
+        """
+
+        if self._thread is None or self._pid != os.getpid():
+            return
+
+        self.queue.put(_FLUSH)
+        self.queue.join()
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Write any queued entries and stop the background thread, waiting for up to `timeout` seconds.
+        """
+
+        if self._thread is None or self._pid != os.getpid():
+            return
+
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run(self) -> None:
+        """
+        Collect entries from the queue into batches, and write each batch.
+        """
+
+        batch = []
+        received = 0
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                received += 1
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, Request):
+                batch.append(item)
+
+                if len(batch) < self.batch_size:
+                    continue
+
+            # The batch is full, the interval has elapsed, or a flush/stop was requested
+            if batch:
+                self.write(batch)
+
+            for _ in range(received):
+                self.queue.task_done()
+
+            batch = []
+            received = 0
+            deadline = time.monotonic() + self.flush_interval
+
+            if item is _STOP:
+                connections.close_all()
+                return
+
+    def write(self, batch: list[Request]) -> None:
+        """
+        Insert a `batch` of entries. If the insert fails, the entries are dropped.
+        """
+
+        # The thread's connection is reused between batches, unless it has expired or errored
+        close_old_connections()
+
+        try:
+            Request.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Failed to write %d request log entries.", len(batch))
+            connections.close_all()
+
+            with self._lock:
+                self.dropped += len(batch)
+
+            count_dropped_requests(len(batch))
+        else:
+            with self._lock:
+                self.written += len(batch)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_request_log_writer(config: dict) -> RequestLogWriter:
+    """
+    Get the request log writer of the process, creating it with the given `config` if required.
+    """
+
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = RequestLogWriter(
+                batch_size=config.get("BATCH_SIZE", 100),
+                flush_interval=config.get("FLUSH_INTERVAL", 5),
+                queue_size=config.get("QUEUE_SIZE", 10000),
+            )
+
+    return _writer
@@ -20,3 +20,21 @@ errorlog = os.path.join(chdir, "../error.log")
 capture_output = True  # Redirect stdout/stderr to errorlog
 
 daemon = True  # Run process in the background
+
+
+def on_starting(server):
+    # Remove metrics left over from previous runs, when collecting metrics across workers
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    # Mark the metrics of exited workers as dead, when collecting metrics across workers
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -60,6 +60,9 @@ AUTHENTICATION_BACKENDS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "internal.middleware.RecordMetrics",
+    "internal.middleware.ProfileRequests",
+    "internal.middleware.CompressResponse",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -67,6 +70,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "internal.middleware.SaveRequest",
+    "internal.middleware.LogSlowRequests",
+    "internal.middleware.RecordQueries",
 ]
 
 ROOT_URLCONF = "onyx.urls"
@@ -179,6 +184,80 @@ REST_KNOX = {
     "TOKEN_LIMIT_PER_USER": None,
 }
 
+# Compression of response content, negotiated via the Accept-Encoding header
+# Non-streaming responses smaller than MIN_SIZE (in bytes) are not compressed
+# Responses are compressed with zstd or gzip, preferring zstd
+RESPONSE_COMPRESSION = {
+    "MIN_SIZE": 1024,
+    "GZIP_LEVEL": 6,
+    "ZSTD_LEVEL": 3,
+}
+
+# Deferral of historical records for saves made through the API
+# If enabled, the historical records of a transaction are bulk inserted (in batches of BATCH_SIZE) when it completes
+DEFERRED_HISTORY = {
+    "ENABLED": False,
+    "BATCH_SIZE": 500,
+}
+
+# Bulk validation through the test/validate endpoint and the validate command
+# Items are validated in chunks of CHUNK_SIZE, and the results of each chunk are streamed as it completes
+BULK_VALIDATION = {
+    "CHUNK_SIZE": 500,
+}
+
+# Idempotency keys for create and update requests, stored in the database so that they apply across workers
+# Responses are replayed for TTL seconds, and in progress requests hold their key for up to LOCK_TIMEOUT seconds
+# Expired keys are removed by the idempotency command, which should be run regularly (e.g. daily)
+IDEMPOTENCY = {
+    "TTL": 86400,
+    "LOCK_TIMEOUT": 60,
+}
+
+# Logging of requests by the SaveRequest middleware
+# If ASYNC is enabled, requests are queued (up to QUEUE_SIZE, beyond which they are dropped)
+# and bulk inserted on a background thread every BATCH_SIZE requests or FLUSH_INTERVAL seconds
+REQUEST_LOG = {
+    "ASYNC": False,
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 5,
+    "QUEUE_SIZE": 10000,
+}
+
+# Instrumentation of the statements executed by each request, stored on the request log
+# Requests that execute one statement shape at least N_PLUS_ONE_THRESHOLD times are flagged as a likely N+1 query
+# If HEADERS is enabled, responses to staff include the query count, time (in ms) and maximum repeats as headers
+QUERY_LOG = {
+    "ENABLED": False,
+    "HEADERS": True,
+    "N_PLUS_ONE_THRESHOLD": 20,
+}
+
+# Logging of requests that take at least THRESHOLD ms, with their query, compiled SQL and time spent in each phase
+# The execution plan of the main statement is included for a sample (EXPLAIN_SAMPLE_RATE, from 0 to 1) of slow requests
+# NOTE: On PostgreSQL, the plan is from EXPLAIN (ANALYZE, BUFFERS), which executes the statement again
+SLOW_REQUEST_LOG = {
+    "ENABLED": False,
+    "THRESHOLD": 1000,
+    "EXPLAIN_SAMPLE_RATE": 0,
+}
+
+# Sampling profiler for the next N requests, enabled by the profile command or the X-Profile-Requests header (staff only)
+# Stacks are sampled every INTERVAL seconds, and profiling expires if the requests are not received within TIMEOUT seconds
+PROFILER = {
+    "ENABLED": False,
+    "INTERVAL": 0.005,
+    "MAX_REQUESTS": 100,
+    "TIMEOUT": 3600,
+}
+
+# Prometheus metrics, exposed on the metrics endpoint
+# BUCKETS are the upper bounds (in seconds) of the request duration histogram
+# To aggregate metrics across gunicorn workers, set the PROMETHEUS_MULTIPROC_DIR environment variable
+METRICS = {
+    "BUCKETS": [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+}
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
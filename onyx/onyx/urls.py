@@ -18,12 +18,13 @@ import os
 
 # from django.contrib import admin
 from django.urls import path, include
-
+from internal.views import MetricsView
 
 urlpatterns = [
     # path("admin/", admin.site.urls),
     path("accounts/", include("accounts.urls")),
     path("projects/", include("data.urls")),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ] + [
     path(f"projects/{project}/", include(f"projects.{project}.urls"))
     for project in os.environ["ONYX_PROJECTS"].split(",")
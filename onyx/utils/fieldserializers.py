@@ -30,16 +30,21 @@ class ChoiceField(serializers.ChoiceField):
     def to_internal_value(self, data):
         data = str(data).strip().lower()
 
-        self.choices = list(
-            Choice.objects.filter(
-                project_id=self.context["project"],
-                field=self.field,
-                is_active=True,
-            ).values_list(
-                "choice",
-                flat=True,
+        # Choices are cached on the serializer context
+        # This means they are only retrieved once per request, rather than per value
+        choices_cache = self.context.setdefault("choices", {})
+        if self.field not in choices_cache:
+            choices_cache[self.field] = list(
+                Choice.objects.filter(
+                    project_id=self.context["project"],
+                    field=self.field,
+                    is_active=True,
+                ).values_list(
+                    "choice",
+                    flat=True,
+                )
             )
-        )
+        self.choices = choices_cache[self.field]
         self.choice_map = {choice.lower().strip(): choice for choice in self.choices}
 
         if data in self.choice_map:
@@ -73,12 +78,18 @@ class SiteField(ChoiceField):
 
     def to_internal_value(self, data):
         value = super().to_internal_value(data)
-        try:
-            return Site.objects.get(code=value)
-        except Site.DoesNotExist:
-            self.fail("does_not_exist", value=value)
-        except (TypeError, ValueError):
-            self.fail("invalid")
+
+        # Sites are cached on the serializer context, in the same way as choices
+        sites_cache = self.context.setdefault("sites", {})
+        if value not in sites_cache:
+            try:
+                sites_cache[value] = Site.objects.get(code=value)
+            except Site.DoesNotExist:
+                self.fail("does_not_exist", value=value)
+            except (TypeError, ValueError):
+                self.fail("invalid")
+
+        return sites_cache[value]
 
     def to_representation(self, site):
         return site.code
@@ -1,4 +1,5 @@
 # import basecount
+import numpy as np
 
 
 # This function was written by Heng Li
@@ -40,7 +41,7 @@ def readfq(fp):  # this is a generator function
 
 # The stats generated by this function are based heavily on a program written by Sam Nicholls
 # https://github.com/SamStudio8/swell
-def calculate_fasta_stats(fasta_path, decimal_places=None):
+def calculate_fasta_stats_python(fasta_path, decimal_places=None):
     if decimal_places is None:
         decimal_places = 5
 
@@ -185,6 +186,187 @@ def calculate_fasta_stats(fasta_path, decimal_places=None):
     }
 
 
+# Classes of base, as determined by classify_base
+AT, GC, AMBIG_2, AMBIG_3, MASKED, INVALID = range(6)
+
+
+def classify_base(base):
+    """
+    Classify a `base`, matching the tests made by calculate_fasta_stats_python.
+    """
+
+    base = base.upper()
+
+    if base in "ACGT":
+        return GC if base in "GC" else AT
+    elif base in "WSMKRYBDHV":
+        return AMBIG_2 if base in "WSMKRY" else AMBIG_3
+    elif base in "NX":
+        return MASKED
+    else:
+        return INVALID
+
+
+if np is not None:
+    # Lookup table of the class of each ASCII character
+    ASCII_CLASSES = np.array(
+        [classify_base(chr(i)) for i in range(128)], dtype=np.uint8
+    )
+
+
+def classify_seq(seq):
+    """
+    Classify each base of a `seq`, returning an array of classes.
+    """
+
+    if seq.isascii():
+        return ASCII_CLASSES[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)]
+
+    # Non-ASCII characters are rare, so are classified individually
+    codes = np.frombuffer(seq.encode("utf-32-le"), dtype=np.uint32)
+    is_ascii = codes < 128
+    classes = np.empty(len(codes), dtype=np.uint8)
+    classes[is_ascii] = ASCII_CLASSES[codes[is_ascii]]
+
+    other = codes[~is_ascii]
+    unique, inverse = np.unique(other, return_inverse=True)
+    classes[~is_ascii] = np.array(
+        [classify_base(chr(code)) for code in unique.tolist()], dtype=np.uint8
+    )[inverse]
+
+    return classes
+
+
+def run_lengths(mask):
+    """
+    Get the start positions and lengths of the runs of `True` in a boolean `mask`.
+    """
+
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts = edges[::2]
+    return starts, edges[1::2] - starts
+
+
+class LongestRun:
+    """
+    Tracks the longest run of bases across consecutive sequences, as runs continue from one sequence to the next.
+
+    If `include_open` is disabled, a run only counts once it has ended (i.e. it is followed by a base outside the run).
+    """
+
+    def __init__(self, include_open=True):
+        self.include_open = include_open
+        self.current = 0
+        self.longest = 0
+
+    def update(self, mask):
+        """
+        Update the runs with the `mask` of the bases of a (non-empty) sequence that are in the run.
+        """
+
+        starts, lengths = run_lengths(mask)
+
+        # The current run either continues into the sequence, or has ended before it
+        if self.current:
+            if len(starts) and starts[0] == 0:
+                lengths[0] += self.current
+            else:
+                self.longest = max(self.longest, self.current)
+
+        # The last run remains open if it reaches the end of the sequence
+        if mask[-1]:
+            self.current = int(lengths[-1])
+            lengths = lengths[:-1]
+        else:
+            self.current = 0
+
+        if len(lengths):
+            self.longest = max(self.longest, int(lengths.max()))
+
+        if self.include_open:
+            self.longest = max(self.longest, self.current)
+
+
+def calculate_fasta_stats(fasta_path, decimal_places=None):
+    """
+    Calculate stats of the sequences in a FASTA file.
+
+    The bases of each sequence are classified using a lookup table, and runs are found from the edges of each class.
+    This returns the same stats as calculate_fasta_stats_python, which calculates them base-by-base.
+    """
+
+    if decimal_places is None:
+        decimal_places = 5
+
+    num_seqs = 0
+    counts = np.zeros(6, dtype=np.int64)
+    acgt = LongestRun()
+    masked = LongestRun()
+    invalid = LongestRun()
+    ambig = LongestRun()
+
+    # Gaps and ungapped runs only count once they have ended
+    gap = LongestRun(include_open=False)
+    ungap = LongestRun(include_open=False)
+
+    with open(fasta_path) as fasta:
+        for name, seq, qual in readfq(fasta):
+            num_seqs += 1
+
+            if not seq:
+                continue
+
+            classes = classify_seq(seq)
+            counts += np.bincount(classes, minlength=6)
+
+            acgt.update(classes <= GC)
+            ambig.update((classes == AMBIG_2) | (classes == AMBIG_3))
+            masked.update(classes == MASKED)
+            invalid.update(classes == INVALID)
+            gap.update(classes >= MASKED)
+            ungap.update(classes < MASKED)
+
+    counts = counts.tolist()
+    num_bases = sum(counts)
+    num = {
+        "acgt": counts[AT] + counts[GC],
+        "gc": counts[GC],
+        "masked": counts[MASKED],
+        "invalid": counts[INVALID],
+        "ambig": counts[AMBIG_2] + counts[AMBIG_3],
+        "ambig_2": counts[AMBIG_2],
+        "ambig_3": counts[AMBIG_3],
+    }
+
+    if num_bases > 0:
+        pc = {
+            key: round(value / num_bases * 100.0, decimal_places)
+            for key, value in num.items()
+        }
+    else:
+        pc = {key: 0 for key in num}
+        pc["invalid"] = round(100.0, decimal_places)
+
+    return {
+        "num_seqs": num_seqs,
+        "num_bases": num_bases,
+        "pc_acgt": pc["acgt"],
+        "gc_content": pc["gc"],
+        "pc_masked": pc["masked"],
+        "pc_invalid": pc["invalid"],
+        "pc_ambig": pc["ambig"],
+        "pc_ambig_2": pc["ambig_2"],
+        "pc_ambig_3": pc["ambig_3"],
+        "longest_acgt": acgt.longest,
+        "longest_masked": masked.longest,
+        "longest_invalid": invalid.longest,
+        "longest_ambig": ambig.longest,
+        "longest_gap": gap.longest,
+        "longest_ungap": ungap.longest,
+    }
+
+
 # def calculate_bam_stats(bam_path, decimal_places=None):
 #     if decimal_places is None:
 #         decimal_places = 5
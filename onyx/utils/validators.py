@@ -1,6 +1,94 @@
+import functools
+import operator
+from typing import Any
+from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework.validators import UniqueTogetherValidator
 
 
 class OnyxUniqueTogetherValidator(UniqueTogetherValidator):
     message = _("This combination of {field_names} already exists.")
+
+    def __call__(self, attrs, serializer):
+        # In bulk operations, uniqueness is checked across the whole batch at once
+        # This is done using the validate_batch method, after each item is validated
+        if serializer.context.get("bulk"):
+            return
+
+        super().__call__(attrs, serializer)
+
+    def normalise(self, field: str, value: Any) -> Any:
+        """
+        Normalise a `value` for a `field`, so that it can be compared with a value from the database.
+        """
+
+        model_field = self.queryset.model._meta.get_field(field)  # type: ignore
+
+        if isinstance(value, models.Model):
+            return getattr(value, model_field.target_field.attname)  # type: ignore
+
+        return model_field.to_python(value)
+
+    def validate_batch(
+        self,
+        batch: dict[Any, dict[str, Any]],
+        batch_size: int = 500,
+        seen: set | None = None,
+    ) -> dict[Any, str]:
+        """
+        Check uniqueness across a batch of validated data, using a set-based query.
+
+        Args:
+            batch: Dictionary mapping keys (e.g. indexes) to the validated data of each item.
+            batch_size: The number of items to check in each query.
+            seen: Set of unique values from earlier batches, which is updated with the values of this batch.
+                This allows uniqueness to be checked across a sequence of batches.
+
+        Returns:
+            Dictionary mapping keys of items that are not unique to an error message.
+        """
+
+        message = self.message.format(field_names=", ".join(self.fields))
+        errors = {}
+
+        # Determine the unique values of each item
+        # If any of the values are missing or null, the item is not checked
+        # This matches the behaviour of the validator for a single item
+        values = {}
+        if seen is None:
+            seen = set()
+        for key, attrs in batch.items():
+            if any(attrs.get(field) is None for field in self.fields):
+                continue
+
+            value = tuple(self.normalise(field, attrs[field]) for field in self.fields)
+
+            # Items with the same values as an earlier item in the batch are not unique
+            if value in seen:
+                errors[key] = message
+            else:
+                values[key] = value
+                seen.add(value)
+
+        # Retrieve the existing values from the database, for each batch of values
+        unique_values = list(values.values())
+        existing = set()
+        for i in range(0, len(unique_values), batch_size):
+            q_object = functools.reduce(
+                operator.or_,
+                [
+                    Q(**dict(zip(self.fields, value)))
+                    for value in unique_values[i : i + batch_size]
+                ],
+            )
+            existing.update(
+                tuple(self.normalise(field, v) for field, v in zip(self.fields, value))
+                for value in self.queryset.filter(q_object).values_list(*self.fields)  # type: ignore
+            )
+
+        for key, value in values.items():
+            if value in existing:
+                errors[key] = message
+
+        return errors